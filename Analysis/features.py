@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+
+class SentimentFeatures:
+    def __init__(self, windows: tuple = (5, 20), spans: tuple = (5, 20), score_column: str = "bodyComp",
+                 count_column: str = "articleCount", price_column: str = "Close"):
+        """
+        :param windows: Window sizes (in bars) of the rolling features.
+        :param spans: Spans (in bars) of the exponentially weighted means.
+        :param score_column: The sentiment column the features are built from.
+        :param count_column: The column holding the number of articles of each bar.
+        :param price_column: The price column returns are computed from.
+
+        Description: Builds time-series features from the per-bar output of "merge_price_sentiment". For every window:
+                     "sentMean<w>" (rolling mean), "sentZ<w>" (z-score of the bar's sentiment against the window),
+                     "countMomentum<w>" (articles in the window divided by the window before it, minus 1) and
+                     "sentRetCorr<w>" (rolling correlation of sentiment with returns). For every span: "sentEwm<s>".
+                     After "compute", "update" adds new bars in time proportional to the new bars, not the history.
+        """
+        self.windows = list(windows)
+        self.spans = list(spans)
+        self.score_column = score_column
+        self.count_column = count_column
+        self.price_column = price_column
+
+        # The longest look-back of any feature. Count momentum looks back two windows, returns need one extra bar.
+        self.history_size = 2 * max(self.windows) + 1
+        self.tail = None
+        self.last_ewm = {}
+    '''-----------------------------------'''
+    def compute(self, bars_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        :param bars_df: Dataframe with a row per bar, sorted by "Date".
+        :returns: Dataframe of the features, with a "Date" column and a row per bar.
+        """
+        self.tail = None
+        self.last_ewm = {}
+        return self.update(bars_df)
+    '''-----------------------------------'''
+    def update(self, new_bars_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        :param new_bars_df: Dataframe of bars dated after the bars already seen, sorted by "Date".
+        :returns: Dataframe of the features of the new bars only.
+        """
+        new_inputs = self.select_inputs(new_bars_df)
+        if self.tail is None:
+            inputs = new_inputs
+        else:
+            inputs = pd.concat([self.tail, new_inputs], ignore_index=True)
+        new_rows = slice(len(inputs) - len(new_inputs), len(inputs))
+
+        score = inputs["score"]
+        counts = inputs["count"]
+        returns = inputs["price"].pct_change(fill_method=None)
+
+        features = pd.DataFrame({"Date": inputs["Date"]})
+        for window in self.windows:
+            rolling_score = score.rolling(window, min_periods=1)
+            mean = rolling_score.mean()
+            std = score.rolling(window, min_periods=2).std()
+            features[f"sentMean{window}"] = mean
+            features[f"sentZ{window}"] = (score - mean) / std.replace(0, np.nan)
+
+            window_counts = counts.rolling(window, min_periods=1).sum()
+            previous_counts = window_counts.shift(window)
+            features[f"countMomentum{window}"] = window_counts / previous_counts.replace(0, np.nan) - 1
+
+            features[f"sentRetCorr{window}"] = score.rolling(window, min_periods=3).corr(returns)
+
+        for span in self.spans:
+            features[f"sentEwm{span}"] = self.continue_ewm(span, score, new_rows)
+
+        self.tail = inputs.iloc[-self.history_size:].reset_index(drop=True)
+        return features.iloc[new_rows].reset_index(drop=True)
+    '''-----------------------------------'''
+    def continue_ewm(self, span: int, score: pd.Series, new_rows: slice) -> pd.Series:
+        """
+        Continues the exponentially weighted mean from where the last update left off, so earlier bars never need to be
+        recomputed. Bars without a score carry the mean forward.
+        """
+        alpha = 2 / (span + 1)
+        new_scores = score.iloc[new_rows]
+        previous = self.last_ewm.get(span)
+
+        if previous is None:
+            ewm = new_scores.ewm(alpha=alpha, adjust=False, ignore_na=True).mean()
+        else:
+            # Start the recursion from the last mean. The first value of the result is that mean, so drop it.
+            seeded = pd.concat([pd.Series([previous]), new_scores], ignore_index=True)
+            ewm = seeded.ewm(alpha=alpha, adjust=False, ignore_na=True).mean().iloc[1:]
+
+        if len(ewm) > 0 and not np.isnan(ewm.iloc[-1]):
+            self.last_ewm[span] = float(ewm.iloc[-1])
+
+        result = pd.Series(np.nan, index=score.index)
+        result.iloc[new_rows] = ewm.to_numpy()
+        return result
+    '''-----------------------------------'''
+    def select_inputs(self, bars_df: pd.DataFrame) -> pd.DataFrame:
+        inputs = pd.DataFrame({
+            "Date": pd.to_datetime(bars_df["Date"]).to_numpy(),
+            "score": bars_df[self.score_column].to_numpy(dtype=np.float64)
+        })
+        if self.count_column in bars_df.columns:
+            inputs["count"] = bars_df[self.count_column].fillna(0).to_numpy(dtype=np.float64)
+        else:
+            inputs["count"] = 1.0
+        inputs["price"] = bars_df[self.price_column].to_numpy(dtype=np.float64)
+        return inputs
+
+
+'''-----------------------------------'''
+def add_sentiment_features(bars_df: pd.DataFrame, **kwargs) -> pd.DataFrame:
+    """
+    :param bars_df: Dataframe with a row per bar, as returned by "merge_price_sentiment".
+    :param kwargs: Passed through to "SentimentFeatures".
+
+    :returns: A copy of "bars_df" with the feature columns added.
+    """
+    features_df = SentimentFeatures(**kwargs).compute(bars_df)
+    merged_df = bars_df.reset_index(drop=True).copy()
+    for column in features_df.columns:
+        if column != "Date":
+            merged_df[column] = features_df[column].to_numpy()
+    return merged_df
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+# Import storage.
+from Storage.datasets import score_columns
+
+
+# Price columns carried over from the price dataframe.
+price_columns = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+
+'''-----------------------------------'''
+def article_sessions(articles_df: pd.DataFrame, market_timezone: str = "America/New_York", market_close: str = "16:00") -> pd.Series:
+    """
+    :param articles_df: Dataframe of articles with a "publishDate" column, and optionally a "publishTime" column (UTC).
+    :param market_timezone: The timezone of the exchange the asset trades on.
+    :param market_close: The time (in the market's timezone) the regular session closes.
+
+    :returns: Series with the first session date each article can affect. Articles published after the close count towards
+              the next day. This does not skip weekends or holidays, the as-of merge moves them to the next trading session.
+    """
+    dates = pd.to_datetime(articles_df["publishDate"])
+    if "publishTime" not in articles_df.columns:
+        return dates.dt.normalize()
+
+    times = pd.to_timedelta(articles_df["publishTime"].astype(str), errors="coerce").fillna(pd.Timedelta(0))
+    local_stamps = (dates.dt.normalize() + times).dt.tz_localize("UTC").dt.tz_convert(market_timezone).dt.tz_localize(None)
+    local_dates = local_stamps.dt.normalize()
+
+    after_close = (local_stamps - local_dates) >= pd.Timedelta(f"{market_close}:00")
+    return local_dates + pd.to_timedelta(after_close.astype(np.int64), unit="D")
+
+'''-----------------------------------'''
+def merge_sentiment_asof(articles_df: pd.DataFrame, price_df: pd.DataFrame, aggregate: bool = True, columns: list = None,
+                         weight_column: str = "", ticker_column: str = "", cluster_column: str = "clusterId",
+                         market_timezone: str = "America/New_York", market_close: str = "16:00") -> pd.DataFrame:
+    """
+    :param articles_df: Dataframe of articles with sentiment scores, as returned by "get_articles_sentiment".
+    :param price_df: Dataframe of price bars with a "Date" column, as returned by "get_price_data".
+    :param aggregate: If True, return one row per price bar with the articles' scores combined. If False, return a row per
+                      article with the price bar it was matched to.
+    :param columns: The score columns to carry over. Defaults to every sentiment score column in "articles_df".
+    :param weight_column: Optional column of "articles_df" to weight the per-bar mean by. An unweighted mean is used if empty.
+    :param ticker_column: Optional column present in both dataframes, so many tickers can be merged in one pass.
+    :param cluster_column: Column of near-duplicate cluster ids (see Scrapers.dedup). When aggregating, each cluster only counts
+                           once per bar, so a story republished by many outlets does not outweigh the rest. Ignored if the
+                           column is missing or empty.
+    :param market_timezone: The timezone of the exchange the asset trades on.
+    :param market_close: The time (in the market's timezone) the regular session closes.
+
+    :returns: The merged dataframe. Aggregated rows have the price columns, the mean of each score column, and "articleCount".
+
+    Description: Every article is matched to the first trading session on or after the session it was published for, so
+                 articles from weekends, holidays and after the close count towards the next trading day instead of being
+                 dropped. Neither input dataframe is modified.
+    """
+    if columns is None:
+        columns = [column for column in score_columns if column in articles_df.columns]
+    by = [ticker_column] if ticker_column != "" else []
+
+    # Build slim frames holding only the columns the merge needs. The caller's frames are left untouched.
+    left = pd.DataFrame({"session": article_sessions(articles_df, market_timezone=market_timezone, market_close=market_close)})
+    for column in by + list(columns):
+        left[column] = articles_df[column].to_numpy()
+    if weight_column != "":
+        left["weight"] = articles_df[weight_column].to_numpy(dtype=np.float64)
+    if not aggregate:
+        left["articleRow"] = np.arange(len(articles_df))
+    use_clusters = aggregate and cluster_column != "" and cluster_column in articles_df.columns
+    if use_clusters:
+        # Articles without a cluster id are their own cluster.
+        clusters = articles_df[cluster_column].to_numpy(dtype=object)
+        missing = pd.isna(clusters)
+        clusters[missing] = [f"row{row}" for row in np.flatnonzero(missing)]
+        left["cluster"] = clusters
+
+    right_columns = by + [column for column in price_columns if column in price_df.columns]
+    right = pd.DataFrame({"Date": pd.to_datetime(price_df["Date"]).to_numpy()})
+    for column in right_columns:
+        right[column] = price_df[column].to_numpy()
+
+    # The as-of merge needs both sides sorted on the key. Only sort when they are not sorted already.
+    if not left["session"].is_monotonic_increasing:
+        left = left.sort_values("session", kind="stable")
+    if not right["Date"].is_monotonic_increasing:
+        right = right.sort_values("Date", kind="stable")
+
+    merged_df = pd.merge_asof(left, right, left_on="session", right_on="Date", by=by or None, direction="forward")
+    # Articles published after the last stored bar have no session to count towards yet.
+    merged_df = merged_df[merged_df["Date"].notna()]
+
+    if not aggregate:
+        article_columns = articles_df.iloc[merged_df["articleRow"].to_numpy()].reset_index(drop=True)
+        bar_columns = merged_df[["Date"] + [column for column in right_columns if column not in by]].reset_index(drop=True)
+        return pd.concat([article_columns, bar_columns], axis=1)
+
+    if use_clusters:
+        merged_df = merged_df.drop_duplicates(subset=by + ["Date", "cluster"])
+
+    group_keys = by + ["Date"]
+    grouped = merged_df.groupby(group_keys, sort=True)
+    bars_df = grouped[[column for column in right_columns if column not in by]].first()
+
+    if weight_column != "":
+        weights = merged_df["weight"]
+        weighted_sums = merged_df[columns].multiply(weights, axis=0).groupby([merged_df[key] for key in group_keys]).sum()
+        weight_sums = weights.groupby([merged_df[key] for key in group_keys]).sum()
+        scores_df = weighted_sums.divide(weight_sums.replace(0, np.nan), axis=0)
+    else:
+        scores_df = grouped[list(columns)].mean()
+
+    bars_df = bars_df.join(scores_df)
+    bars_df["articleCount"] = grouped.size()
+    return bars_df.reset_index()
@@ -1,11 +1,14 @@
 import os 
 
-# Yahoo Finance imports
-import yfinance as yf 
-
 # Pandas imports 
 import pandas as pd
 
+# Import storage. 
+from Storage.datasets import CsvStorage, filter_date_range
+
+# Import price providers. Yahoo Finance is the default, a fixture provider can be swapped in to work offline. 
+from AssetData.price_providers import YahooPriceProvider
+
 
 cwd = os.getcwd()
 
@@ -14,26 +17,51 @@ storage_folder = f"{cwd}\\AssetData\\Storage"
 
 
 class AssetData:
-    def __init__(self, ticker: str):
+    def __init__(self, ticker: str, storage=None, provider=None):
+        """
+        :param storage: Where the price data is stored (see Storage.datasets). Defaults to the CSV files in the storage folder. 
+        :param provider: Where new price data is downloaded from (see AssetData.price_providers). Defaults to Yahoo Finance. 
+        """
         self.ticker = ticker.upper()
+        self.storage = storage if storage is not None else CsvStorage()
+        self.provider = provider if provider is not None else YahooPriceProvider()
     
     '''-----------------------------------'''
     '''-----------------------------------'''
-    def get_price_data(self) -> pd.DataFrame:
-        csv_file_path = f"{storage_folder}\\{self.ticker}.csv"
+    def get_price_data(self, refresh: bool = False, start=None, end=None, columns: list = None) -> pd.DataFrame:
+        """
+        :param refresh: If True, the days missing since the last stored bar are downloaded and stored first. 
+        :param start: Only return bars dated on or after this date. 
+        :param end: Only return bars dated on or before this date. 
+        :param columns: The columns to return. All columns are returned if not passed. 
+
+        :returns: Dataframe of the stored price data, with a "Date" column. Only the requested range and columns are loaded. 
+        """
+        if refresh:
+            self.update_price_data()
 
         try:
-            df = pd.read_csv(csv_file_path)
-            print(f"[Price Data] Price data retrieved from local csv file: {csv_file_path}")
+            df = self.storage.read("prices", self.ticker, columns=columns, start=start, end=end)
+            print(f"[Price Data] Price data retrieved from local storage.")
         except FileNotFoundError:
             print(f"[Price Data] Price data retrieved from Yahoo Finance.")
-            df = yf.download(self.ticker, period="max")
-            # In this case we want to write the index, because Yahoo Finance dataframes put the date as the index. And we want to write the date. 
-            df.to_csv(csv_file_path, index=True)
-            # Reset the index, so that the df will be returned in a similar state to as if it was read from the csv. 
-            df = df.reset_index()
+            df = self.provider.download([self.ticker]).get(self.ticker, pd.DataFrame())
+            if not df.empty:
+                self.storage.write("prices", self.ticker, df)
+                df = filter_date_range(df, "Date", start, end)
+                if columns is not None:
+                    df = df[list(columns)]
         return df
     '''-----------------------------------'''
+    def update_price_data(self) -> pd.DataFrame:
+        """
+        :returns: Dataframe of the bars that were added to storage. 
+
+        Description: Only the bars from the last stored one to today are downloaded. The last stored bar is replaced, and the 
+                     newer ones are appended to storage. 
+        """
+        return update_price_data_many([self.ticker], storage=self.storage, provider=self.provider).get(self.ticker, pd.DataFrame())
+    '''-----------------------------------'''
     '''-----------------------------------'''
     '''-----------------------------------'''
     '''-----------------------------------'''
@@ -41,4 +69,112 @@ class AssetData:
     '''-----------------------------------'''
     '''-----------------------------------'''
     '''-----------------------------------'''
-    '''-----------------------------------'''
\ No newline at end of file
+    '''-----------------------------------'''
+
+
+
+'''-----------------------------------'''
+def get_last_stored_date(ticker: str, storage):
+    """
+    :returns: The date of the last stored bar of the ticker, or None if nothing is stored. 
+    """
+    if not storage.exists("prices", ticker):
+        return None
+    dates = pd.to_datetime(storage.read("prices", ticker, columns=["Date"])["Date"])
+    if dates.empty:
+        return None
+    return dates.max()
+
+'''-----------------------------------'''
+def store_top_up(ticker: str, ticker_df: pd.DataFrame, last_date, storage) -> pd.DataFrame:
+    """
+    :param ticker_df: The downloaded bars, dated on or after "last_date". 
+    :param last_date: The date of the last stored bar. 
+
+    :returns: The bars that were added or replaced. 
+
+    Description: If the downloaded bar of "last_date" matches the stored one, only the newer bars are appended. Otherwise 
+                 the stored bar is replaced, which rewrites the ticker's prices. 
+    """
+    dates = pd.to_datetime(ticker_df["Date"])
+    stored_last = storage.read("prices", ticker, start=last_date)
+    downloaded_last = ticker_df[dates == last_date]
+    columns = [column for column in stored_last.columns if column != "Date" and column in downloaded_last.columns]
+    if downloaded_last.empty or (len(stored_last) == len(downloaded_last) and
+                                 stored_last[columns].reset_index(drop=True).equals(downloaded_last[columns].reset_index(drop=True))):
+        new_df = ticker_df[dates > last_date]
+        if not new_df.empty:
+            storage.append("prices", ticker, new_df)
+        return new_df.reset_index(drop=True)
+
+    stored_df = storage.read("prices", ticker)
+    stored_df = stored_df[pd.to_datetime(stored_df["Date"]) < last_date]
+    storage.write("prices", ticker, pd.concat([stored_df, ticker_df], ignore_index=True))
+    return ticker_df
+
+'''-----------------------------------'''
+def update_price_data_many(tickers: list, storage=None, provider=None) -> dict:
+    """
+    :param tickers: The tickers to refresh. 
+    :param storage: Where the price data is stored (see Storage.datasets). Defaults to the CSV files in the storage folder. 
+    :param provider: Where new price data is downloaded from. Defaults to Yahoo Finance. 
+
+    :returns: Dictionary of {ticker: dataframe of the bars that were added or replaced}. 
+
+    Description: Tickers without stored data are downloaded in full in one call. Every other ticker is topped up from its 
+                 last stored bar, with one call per distinct last date. Each ticker's last stored bar is 
+                 replaced by the downloaded one, so a bar stored before the close is completed, and the newer bars are 
+                 appended. Empty downloads are not written. 
+    """
+    storage = storage if storage is not None else CsvStorage()
+    provider = provider if provider is not None else YahooPriceProvider()
+    tickers = [ticker.upper() for ticker in tickers]
+
+    last_dates = {ticker: get_last_stored_date(ticker, storage) for ticker in tickers}
+    new_tickers = [ticker for ticker, last_date in last_dates.items() if last_date is None]
+    stored_tickers = [ticker for ticker, last_date in last_dates.items() if last_date is not None]
+
+    added = {}
+    if new_tickers:
+        print(f"[Price Data] Downloading the full history of {len(new_tickers)} tickers.")
+        for ticker, ticker_df in provider.download(new_tickers).items():
+            if ticker_df.empty:
+                continue
+            storage.write("prices", ticker, ticker_df)
+            added[ticker] = ticker_df
+
+    # The last stored bar is downloaded again, since it may be a partial bar stored during the session. Tickers are grouped 
+    # by their last date, so one stale ticker does not make the rest of the watchlist download its whole gap. 
+    groups = {}
+    for ticker in stored_tickers:
+        groups.setdefault(last_dates[ticker], []).append(ticker)
+    for start, group in sorted(groups.items()):
+        print(f"[Price Data] Topping up {len(group)} tickers from {start.date()}.")
+        for ticker, ticker_df in provider.download(group, start=start).items():
+            ticker_df = ticker_df[pd.to_datetime(ticker_df["Date"]) >= last_dates[ticker]].reset_index(drop=True)
+            if ticker_df.empty:
+                continue
+            added[ticker] = store_top_up(ticker, ticker_df, last_dates[ticker], storage)
+
+    return added
+
+'''-----------------------------------'''
+def get_price_data_many(tickers: list, storage=None, provider=None, refresh: bool = True) -> dict:
+    """
+    :param tickers: The tickers to get price data for. 
+    :param storage: Where the price data is stored (see Storage.datasets). The Parquet storage keeps prices compact and typed. 
+    :param provider: Where new price data is downloaded from. Defaults to Yahoo Finance. 
+    :param refresh: If True, missing and stale tickers are downloaded (in batched calls) before reading. 
+
+    :returns: Dictionary of {ticker: dataframe of the stored price data}. Tickers without any data are left out. 
+    """
+    storage = storage if storage is not None else CsvStorage()
+    tickers = [ticker.upper() for ticker in tickers]
+    if refresh:
+        update_price_data_many(tickers, storage=storage, provider=provider)
+
+    price_data = {}
+    for ticker in tickers:
+        if storage.exists("prices", ticker):
+            price_data[ticker] = storage.read("prices", ticker)
+    return price_data
@@ -0,0 +1,73 @@
+import os
+
+# Pandas imports
+import pandas as pd
+
+
+'''-----------------------------------'''
+def split_download(data: pd.DataFrame, tickers: list) -> dict:
+    """
+    :param data: Dataframe returned by a multi-ticker download, with (ticker, field) columns and the date as the index.
+    :param tickers: The tickers that were downloaded.
+
+    :returns: Dictionary of {ticker: dataframe}, each with a "Date" column and one column per field.
+    """
+    price_data = {}
+    for ticker in tickers:
+        if isinstance(data.columns, pd.MultiIndex):
+            if ticker not in data.columns.get_level_values(0):
+                continue
+            ticker_df = data[ticker]
+        else:
+            ticker_df = data
+        # Tickers with a shorter history than the others are padded with empty rows.
+        ticker_df = ticker_df.dropna(how="all")
+        ticker_df = ticker_df.rename_axis("Date").reset_index()
+        ticker_df.columns.name = None
+        price_data[ticker] = ticker_df
+    return price_data
+
+
+class YahooPriceProvider:
+    """
+    Downloads daily price bars from Yahoo Finance. Many tickers are fetched in a single download call.
+    """
+    '''-----------------------------------'''
+    def download(self, tickers: list, start=None) -> dict:
+        """
+        :param tickers: The tickers to download.
+        :param start: Only download bars dated on or after this date. The full history is downloaded if not passed.
+
+        :returns: Dictionary of {ticker: dataframe}, each with a "Date" column. Tickers without data are left out.
+        """
+        # Imported here, so reading stored prices does not need it.
+        import yfinance as yf
+
+        if start is None:
+            data = yf.download(tickers, period="max", group_by="ticker", auto_adjust=False, threads=True, progress=False)
+        else:
+            data = yf.download(tickers, start=pd.Timestamp(start).strftime("%Y-%m-%d"), group_by="ticker", auto_adjust=False,
+                               threads=True, progress=False)
+        return split_download(data, tickers)
+
+
+class FixturePriceProvider:
+    """
+    Serves price bars from local "<TICKER>.csv" files instead of the network. Used to test the refresh logic offline.
+    """
+    def __init__(self, folder_path: str):
+        self.folder_path = folder_path
+        self.calls = []
+    '''-----------------------------------'''
+    def download(self, tickers: list, start=None) -> dict:
+        self.calls.append((list(tickers), start))
+        price_data = {}
+        for ticker in tickers:
+            csv_file_path = os.path.join(self.folder_path, f"{ticker}.csv")
+            if not os.path.exists(csv_file_path):
+                continue
+            ticker_df = pd.read_csv(csv_file_path, parse_dates=["Date"])
+            if start is not None:
+                ticker_df = ticker_df[ticker_df["Date"] >= pd.Timestamp(start)].reset_index(drop=True)
+            price_data[ticker] = ticker_df
+        return price_data
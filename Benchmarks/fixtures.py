@@ -0,0 +1,346 @@
+import json
+import threading
+import datetime as dt
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+# Import storage.
+from Storage.datasets import date_columns, filter_date_range
+
+
+# Words the synthetic articles are drawn from. Mixed in tone, so the scores are not all neutral.
+vocabulary = ("the company shares stock market investors quarter revenue earnings growth profit loss decline rally surge "
+              "analysts expect guidance outlook strong weak record beat miss forecast demand supply costs margin sales "
+              "report said according to percent year billion million new deal lawsuit upgrade downgrade risk rates "
+              "inflation fed economy jobs crypto bitcoin trading volume price target buy sell hold ceo plans cut raise").split()
+
+
+'''-----------------------------------'''
+def make_corpus(size: int, mean_words: int = 400, length_sigma: float = 0.6, seed: int = 0) -> list:
+    """
+    :param size: The number of texts.
+    :param mean_words: The median number of words per text.
+    :param length_sigma: The sigma of the log-normal text length distribution. 0 makes every text "mean_words" long.
+    :param seed: Seed of the generator, so the same corpus is produced on every run.
+
+    :returns: List of synthetic texts. Real article lengths are roughly log-normal, with a long tail past the model's window.
+    """
+    generator = np.random.default_rng(seed)
+    lengths = np.maximum(1, generator.lognormal(np.log(mean_words), length_sigma, size=size).astype(np.int64))
+    words = np.array(vocabulary)
+    texts = []
+    for length in lengths:
+        sentence = words[generator.integers(0, len(words), size=length)]
+        texts.append(" ".join(sentence) + ".")
+    return texts
+
+'''-----------------------------------'''
+def make_articles_df(size: int, start: str = "2022-01-03", days: int = 365, mean_words: int = 400, length_sigma: float = 0.6,
+                     seed: int = 0, base_url: str = "https://example.com") -> pd.DataFrame:
+    """
+    :param size: The number of articles.
+    :param start: The date of the first day articles are published on.
+    :param days: The number of days the articles are spread over.
+    :param base_url: The url the article links are built on.
+
+    :returns: Dataframe of synthetic articles, in the format returned by "query_search", sorted by publish date.
+    """
+    generator = np.random.default_rng(seed)
+    stamps = pd.Timestamp(start) + pd.to_timedelta(np.sort(generator.uniform(0, days * 86400, size=size)), unit="s")
+    titles = make_corpus(size, mean_words=12, length_sigma=0.3, seed=seed + 1)
+    bodies = make_corpus(size, mean_words=mean_words, length_sigma=length_sigma, seed=seed + 2)
+    return pd.DataFrame({
+        "title": titles,
+        "publishDate": stamps.date,
+        "publishTime": stamps.time,
+        "body": bodies,
+        "summary": [body[:200] for body in bodies],
+        "url": [f"{base_url}/article/{index}" for index in range(size)],
+        "bodyStatus": "fetched"
+    })
+
+'''-----------------------------------'''
+def make_sentiment_df(articles_df: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """
+    :returns: Dataframe of random (but valid) sentiment scores for the articles, in the format returned by "get_articles_sentiment".
+    """
+    generator = np.random.default_rng(seed)
+    sentiment_df = pd.DataFrame({"publishDate": articles_df["publishDate"], "publishTime": articles_df["publishTime"],
+                                 "title": articles_df["title"], "url": articles_df["url"]})
+    for field in ["title", "body"]:
+        scores = generator.dirichlet([1, 3, 1], size=len(articles_df)).astype(np.float32)
+        sentiment_df[f"{field}Neg"] = scores[:, 0]
+        sentiment_df[f"{field}Neu"] = scores[:, 1]
+        sentiment_df[f"{field}Pos"] = scores[:, 2]
+        sentiment_df[f"{field}Comp"] = scores[:, 2] - scores[:, 0]
+    return sentiment_df
+
+'''-----------------------------------'''
+def make_price_df(start: str = "2022-01-03", days: int = 365, start_price: float = 100, seed: int = 0) -> pd.DataFrame:
+    """
+    :returns: Dataframe of daily bars on business days (a random walk), in the format returned by "get_price_data".
+    """
+    generator = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=max(1, int(days * 5 / 7)))
+    closes = start_price * np.exp(np.cumsum(generator.normal(0, 0.02, size=len(dates))))
+    opens = np.concatenate([[start_price], closes[:-1]])
+    highs = np.maximum(opens, closes) * (1 + generator.uniform(0, 0.01, size=len(dates)))
+    lows = np.minimum(opens, closes) * (1 - generator.uniform(0, 0.01, size=len(dates)))
+    return pd.DataFrame({
+        "Date": dates,
+        "Open": opens,
+        "High": highs,
+        "Low": lows,
+        "Close": closes,
+        "Adj Close": closes,
+        "Volume": generator.integers(1000000, 10000000, size=len(dates))
+    })
+
+'''-----------------------------------'''
+def make_entries(articles_df: pd.DataFrame, base_url: str = "") -> list:
+    """
+    :param articles_df: The articles, as returned by "make_articles_df".
+    :param base_url: If passed, the links point to article n under this url (e.g. the url of an "ArticleServer").
+
+    :returns: Feed entries (title, link, published) of the articles, in the format of pygooglenews' "search['entries']".
+    """
+    entries = []
+    rows = articles_df[["title", "publishDate", "publishTime", "url"]].itertuples(index=False)
+    for index, (title, publish_date, publish_time, url) in enumerate(rows):
+        stamp = dt.datetime.combine(pd.Timestamp(publish_date).date(), publish_time)
+        link = url if base_url == "" else f"{base_url}/article/{index}"
+        entries.append({"title": title, "link": link, "published": stamp.strftime("%a, %d %b %Y %H:%M:%S GMT")})
+    return entries
+
+
+class MemoryStorage:
+    """
+    Keeps every dataset in memory, with the same interface as the storages in Storage.datasets. Lets benchmarks run the
+    scraper end to end without touching the dataset folders.
+    """
+    def __init__(self):
+        self.datasets = {}
+    '''-----------------------------------'''
+    def exists(self, dataset: str, ticker: str) -> bool:
+        return (dataset, ticker) in self.datasets
+    '''-----------------------------------'''
+    def read(self, dataset: str, ticker: str, columns: list = None, start=None, end=None) -> pd.DataFrame:
+        if (dataset, ticker) not in self.datasets:
+            raise FileNotFoundError(f"[Storage] No {dataset} data stored for {ticker}.")
+        df = filter_date_range(self.datasets[(dataset, ticker)], date_columns[dataset], start, end)
+        if columns is not None:
+            df = df[list(columns)]
+        return df.copy()
+    '''-----------------------------------'''
+    def write(self, dataset: str, ticker: str, df: pd.DataFrame):
+        self.datasets[(dataset, ticker)] = df.reset_index(drop=True).copy()
+    '''-----------------------------------'''
+    def append(self, dataset: str, ticker: str, df: pd.DataFrame):
+        if not self.exists(dataset, ticker):
+            self.write(dataset, ticker, df)
+        else:
+            self.write(dataset, ticker, pd.concat([self.datasets[(dataset, ticker)], df], ignore_index=True))
+
+
+class ArticleServer:
+    def __init__(self, articles_df: pd.DataFrame, latency: float = 0.0, delays: dict = None):
+        """
+        :param articles_df: The articles to serve. Article n is served at "/article/n". Other paths are answered 404.
+        :param latency: Seconds each response is delayed by, to stand in for a remote publisher.
+        :param delays: Dictionary of {article n: seconds}, to delay some articles by more (or less) than "latency".
+
+        Description: Local HTTP stand-in for the publishers' article pages, so the fetch stage can be measured without the
+                     network. Use as a context manager, the url of the server is in "base_url".
+        """
+        pages = [f"<html><head><title>{title}</title></head><body><article><h1>{title}</h1><p>{body}</p></article></body></html>"
+                 for title, body in zip(articles_df["title"], articles_df["body"])]
+        pages = [page.encode("utf-8") for page in pages]
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                try:
+                    index = int(self.path.rstrip("/").split("/")[-1])
+                    page = pages[index]
+                except (ValueError, IndexError):
+                    self.send_error(404)
+                    return
+                delay = delays.get(index, latency) if delays else latency
+                if delay > 0:
+                    threading.Event().wait(delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = None
+    '''-----------------------------------'''
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+    '''-----------------------------------'''
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+'''-----------------------------------'''
+def make_reddit_threads(posts: int, comments_per_post: int = 200, max_depth: int = 8, seed: int = 0,
+                        subreddit: str = "Cryptocurrency") -> list:
+    """
+    :param posts: The number of posts.
+    :param comments_per_post: The number of comments under each post.
+    :param max_depth: The deepest a reply chain may go.
+
+    :returns: List of posts, each a Reddit "t3" data dictionary with its comments as a flat list of "t1" data dictionaries
+              (linked by "parent_id"), in the order they would be listed.
+    """
+    generator = np.random.default_rng(seed)
+    # A title and a selftext per post, and the body of each comment.
+    texts = make_corpus(posts * (comments_per_post + 2), mean_words=40, length_sigma=0.8, seed=seed)
+    created = 1700000000
+    threads = []
+    for post_index in range(posts):
+        post_id = f"p{post_index}"
+        post = {"id": post_id, "name": f"t3_{post_id}", "title": texts.pop(), "selftext": texts.pop(), "subreddit": subreddit,
+                "created_utc": created + post_index * 600, "permalink": f"/r/{subreddit}/comments/{post_id}/",
+                "score": int(generator.integers(0, 5000))}
+        comments = []
+        depths = {}
+        for comment_index in range(comments_per_post):
+            comment_id = f"{post_id}c{comment_index}"
+            # Reply to an earlier comment about half of the time, as long as the chain is not too deep.
+            parents = [comment for comment in comments[-20:] if depths[comment["name"]] < max_depth]
+            if parents and generator.random() < 0.5:
+                parent = parents[int(generator.integers(0, len(parents)))]["name"]
+                depths[f"t1_{comment_id}"] = depths[parent] + 1
+            else:
+                parent = post["name"]
+                depths[f"t1_{comment_id}"] = 1
+            comments.append({"id": comment_id, "name": f"t1_{comment_id}", "parent_id": parent, "link_id": post["name"],
+                             "body": texts.pop(), "created_utc": post["created_utc"] + comment_index * 5,
+                             "permalink": f"/r/{subreddit}/comments/{post_id}/_/{comment_id}/",
+                             "score": int(generator.integers(-10, 500))})
+        threads.append({"post": post, "comments": comments})
+    return threads
+
+
+class RedditServer(ArticleServer):
+    def __init__(self, threads: list, page_size: int = 100, top_level_limit: int = 20, rate_limited: int = 0,
+                 retry_after: str = "0"):
+        """
+        :param threads: The posts and comments to serve, as returned by "make_reddit_threads".
+        :param page_size: The most posts returned per listing page.
+        :param top_level_limit: The number of top level comments returned with a post. The rest (and the replies below
+                                them) are left behind a "more" stub, like Reddit does for large threads.
+        :param rate_limited: The number of requests answered "429 Too Many Requests" before any is served.
+        :param retry_after: The "Retry-After" header of the 429 responses, in seconds or as an HTTP date.
+
+        Description: Local stand-in of the Reddit JSON api: "/r/<subreddit>/<listing>.json" (paged with "after"),
+                     "/comments/<id>.json" and "/api/morechildren.json". The number of requests answered 429 so far is
+                     in "rate_limited_responses".
+        """
+        self.rate_limited_responses = 0
+        rate_lock = threading.Lock()
+        server = self
+
+        def rate_limit() -> bool:
+            with rate_lock:
+                if server.rate_limited_responses >= rate_limited:
+                    return False
+                server.rate_limited_responses += 1
+                return True
+
+        posts = [thread["post"] for thread in threads]
+        comments = {thread["post"]["id"]: thread["comments"] for thread in threads}
+        by_name = {comment["name"]: comment for thread in threads for comment in thread["comments"]}
+        children = {}
+        for thread in threads:
+            for comment in thread["comments"]:
+                children.setdefault(comment["parent_id"], []).append(comment)
+
+        def thing(comment, nested: bool):
+            data = dict(comment)
+            replies = children.get(comment["name"], [])
+            if nested and replies:
+                data["replies"] = {"kind": "Listing", "data": {"children": [thing(reply, True) for reply in replies]}}
+            else:
+                data["replies"] = ""
+            return {"kind": "t1", "data": data}
+
+        def listing(query: dict) -> dict:
+            limit = int(query.get("limit", ["25"])[0])
+            after = query.get("after", [""])[0]
+            start = next((index + 1 for index, post in enumerate(posts) if post["name"] == after), 0)
+            page = posts[start:start + min(limit, page_size)]
+            return {"kind": "Listing", "data": {
+                "after": page[-1]["name"] if page and start + len(page) < len(posts) else None,
+                "children": [{"kind": "t3", "data": post} for post in page]
+            }}
+
+        def post_comments(post_id: str) -> list:
+            post = next(post for post in posts if post["id"] == post_id)
+            top_level = children.get(post["name"], [])
+            things = [thing(comment, True) for comment in top_level[:top_level_limit]]
+            hidden = top_level[top_level_limit:]
+            if hidden:
+                things.append({"kind": "more", "data": {"count": len(hidden), "parent_id": post["name"],
+                                                        "children": [comment["id"] for comment in hidden]}})
+            return [{"kind": "Listing", "data": {"children": [{"kind": "t3", "data": post}]}},
+                    {"kind": "Listing", "data": {"children": things}}]
+
+        def more_children(query: dict) -> dict:
+            # Return the requested comments and every reply below them, flat, like the real api.
+            things = []
+            stack = [by_name[f"t1_{comment_id}"] for comment_id in reversed(query["children"][0].split(","))]
+            while stack:
+                comment = stack.pop()
+                things.append(thing(comment, False))
+                stack.extend(reversed(children.get(comment["name"], [])))
+            return {"json": {"errors": [], "data": {"things": things}}}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if rate_limit():
+                    self.send_response(429)
+                    self.send_header("Retry-After", retry_after)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                parts = url.path.strip("/").split("/")
+                try:
+                    if parts[0] == "r" and len(parts) == 3:
+                        body = listing(query)
+                    elif parts[0] == "comments":
+                        body = post_comments(parts[1].replace(".json", ""))
+                    elif url.path == "/api/morechildren.json":
+                        body = more_children(query)
+                    else:
+                        raise KeyError(url.path)
+                except (KeyError, StopIteration):
+                    self.send_error(404)
+                    return
+                page = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = None
@@ -0,0 +1,205 @@
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+import numpy as np
+
+# Import fixtures.
+from Benchmarks.fixtures import (ArticleServer, MemoryStorage, make_articles_df, make_corpus, make_entries, make_price_df,
+                                 make_sentiment_df)
+
+# Chunking related
+from Models.chunking import bucket_batches
+
+
+'''-----------------------------------'''
+def time_call(function, repeat: int = 3) -> dict:
+    """
+    :param function: Function taking no arguments.
+    :param repeat: How many times to run it.
+
+    :returns: Dictionary of the best and median wall time of the runs, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {"best": min(timings), "median": float(np.median(timings)), "runs": repeat}
+
+'''-----------------------------------'''
+def get_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+'''-----------------------------------'''
+def bench_analyze_text(model, texts: list, repeat: int) -> dict:
+    """
+    Throughput of "analyze_text" one text at a time, and of "analyze_batch", without a score cache.
+    """
+    tokens = sum(sum(len(chunk) for chunk in model.split_tokens(text)) for text in texts)
+    # Load the weights before timing.
+    model.analyze_text(texts[0])
+
+    single = time_call(lambda: [model.analyze_text(text) for text in texts], repeat=repeat)
+    batch = time_call(lambda: model.analyze_batch(texts), repeat=repeat)
+    return {
+        "texts": len(texts),
+        "tokens": tokens,
+        "analyze_text": dict(single, texts_per_second=len(texts) / single["best"], tokens_per_second=tokens / single["best"]),
+        "analyze_batch": dict(batch, texts_per_second=len(texts) / batch["best"], tokens_per_second=tokens / batch["best"])
+    }
+
+'''-----------------------------------'''
+def bench_chunking(model, texts: list, repeat: int) -> dict:
+    """
+    Time spent tokenizing, chunking and bucketing, against the time of the whole "score_chunks" call.
+    """
+    special_tokens = model.tokenizer.num_special_tokens_to_add(pair=False)
+
+    def chunk():
+        lengths = [len(chunk) + special_tokens for text in texts for chunk in model.split_tokens(text)]
+        return bucket_batches(lengths, max_batch_tokens=model.max_batch_tokens, max_batch_size=32)
+
+    chunking = time_call(chunk, repeat=repeat)
+    scoring = time_call(lambda: model.score_chunks(texts), repeat=repeat)
+    chunk_count = sum(len(model.split_tokens(text)) for text in texts)
+    return {
+        "texts": len(texts),
+        "chunks": chunk_count,
+        "chunking": chunking,
+        "score_chunks": scoring,
+        "chunking_share": chunking["best"] / scoring["best"]
+    }
+
+'''-----------------------------------'''
+def bench_fetch(articles_df, latency: float, repeat: int) -> dict:
+    """
+    Time of "ArticleFetcher.fetch_articles" against the local stand-in for the article pages.
+    """
+    from Scrapers.fetcher import ArticleFetcher
+
+    with ArticleServer(articles_df, latency=latency) as server:
+        entries = make_entries(articles_df, base_url=server.base_url)
+        fetcher = ArticleFetcher()
+        try:
+            timing = time_call(lambda: fetcher.fetch_articles(entries), repeat=repeat)
+        finally:
+            # Stops the parse processes.
+            fetcher.close()
+    return dict(timing, articles=len(entries), latency=latency, articles_per_second=len(entries) / timing["best"])
+
+'''-----------------------------------'''
+def bench_subject_sentiment(model, articles_df, repeat: int) -> dict:
+    """
+    End to end time of "get_total_subject_sentiment" on a stored headlines dataset, without a score cache.
+    """
+    from Scrapers.googlenews import GoogleNewsScraper
+
+    storage = MemoryStorage()
+    storage.write("headlines", "BENCH", articles_df)
+    scraper = GoogleNewsScraper(storage=storage, sentiment_model=model)
+    timing = time_call(lambda: scraper.get_total_subject_sentiment("BENCH"), repeat=repeat)
+    return dict(timing, articles=len(articles_df), articles_per_second=len(articles_df) / timing["best"])
+
+'''-----------------------------------'''
+def bench_merge(model, sizes: list, days: int, repeat: int, seed: int) -> list:
+    """
+    Time of "merge_price_sentiment" as the number of articles grows.
+    """
+    price_df = make_price_df(days=days, seed=seed)
+    results = []
+    for size in sizes:
+        articles_df = make_articles_df(size, days=days, mean_words=20, seed=seed)
+        sentiment_df = make_sentiment_df(articles_df, seed=seed)
+        timing = time_call(lambda: model.merge_price_sentiment(sentiment_df, price_df), repeat=repeat)
+        results.append(dict(timing, articles=size, bars=len(price_df)))
+    return results
+
+'''-----------------------------------'''
+def bench_plot(model, sizes: list, repeat: int, seed: int) -> list:
+    """
+    Render time of "DataGraphs.plot_sentiment" as the number of days grows. Rendered off screen.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from Graphing.graphs import DataGraphs
+
+    graph = DataGraphs("BENCH")
+    results = []
+    for days in sizes:
+        price_df = make_price_df(days=days, seed=seed)
+        articles_df = make_articles_df(days * 3, days=days, mean_words=20, seed=seed)
+        merged_df = model.merge_price_sentiment(make_sentiment_df(articles_df, seed=seed), price_df)
+
+        def render():
+            graph.plot_sentiment(df=merged_df, price_df=price_df, show=False)
+            plt.close("all")
+
+        timing = time_call(render, repeat=repeat)
+        results.append(dict(timing, days=days, bars=len(price_df)))
+    return results
+
+'''-----------------------------------'''
+def run_benchmarks(args) -> dict:
+    from Models.sentiment_analysis import SentimentModel
+
+    # No score cache, so every run measures the model.
+    model = SentimentModel(backend=args.backend)
+    texts = make_corpus(args.texts, mean_words=args.mean_words, length_sigma=args.length_sigma, seed=args.seed)
+    articles_df = make_articles_df(args.articles, mean_words=args.mean_words, length_sigma=args.length_sigma, seed=args.seed)
+
+    benchmarks = {
+        "analyze_text": lambda: bench_analyze_text(model, texts, args.repeat),
+        "chunking": lambda: bench_chunking(model, texts, args.repeat),
+        "fetch": lambda: bench_fetch(articles_df, args.latency, args.repeat),
+        "subject_sentiment": lambda: bench_subject_sentiment(model, articles_df, args.repeat),
+        "merge": lambda: bench_merge(model, args.merge_sizes, args.days, args.repeat, args.seed),
+        "plot": lambda: bench_plot(model, args.plot_days, args.repeat, args.seed)
+    }
+    selected = args.only if args.only else list(benchmarks)
+
+    results = {}
+    for name in selected:
+        print(f"[Benchmarks] Running {name}...", file=sys.stderr)
+        results[name] = benchmarks[name]()
+
+    return {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scoring, fetching, merging and plotting paths on synthetic data.")
+    parser.add_argument("--only", nargs="*", default=[],
+                        choices=["analyze_text", "chunking", "fetch", "subject_sentiment", "merge", "plot"])
+    parser.add_argument("--texts", type=int, default=200, help="Size of the corpus scored by the model benchmarks.")
+    parser.add_argument("--articles", type=int, default=200, help="Size of the article dataset.")
+    parser.add_argument("--mean-words", type=int, default=400, help="Median words per article body.")
+    parser.add_argument("--length-sigma", type=float, default=0.6, help="Sigma of the log-normal body length distribution.")
+    parser.add_argument("--merge-sizes", type=int, nargs="*", default=[1000, 10000, 100000])
+    parser.add_argument("--plot-days", type=int, nargs="*", default=[90, 365, 1825])
+    parser.add_argument("--days", type=int, default=1825, help="Days of price data the merge benchmark runs against.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the article stand-in delays each page by.")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="", help="File to write the JSON results to. Printed if not passed.")
+    args = parser.parse_args()
+
+    report = json.dumps(run_benchmarks(args), indent=2, default=float)
+    if args.output != "":
+        with open(args.output, "w") as file:
+            file.write(report)
+    else:
+        print(report)
@@ -21,34 +21,39 @@ class DataGraphs:
     '''-----------------------------------'''
     '''-----------------------------------'''
     '''-----------------------------------'''
-    def plot_sentiment(self, df: pd.DataFrame):
-        
-        # --- Preprocessing Data ---
-        # Create a separate dataframe with open, high, low, close (ohlcv) data. 
-        ohlcv = df[["Date", "Open", "High", "Low", "Close", "Volume"]]
-        #ohlc = pd.to_datetime(ohlc["Date"]) # Convert column of dates to datetime object. 
-        ohlcv.set_index("Date", inplace=True)
-        # Create mpl candlestick object. 
-        #candlestick_ohlcv = mpl.candlestick_ohlc(ax, ohlc, width=0.6, colorup="green", colordown="red")
-
-        #plt.plot(df["Date"], new_df["compound"], marker="o", linestyle="-")
-
-        
+    def plot_sentiment(self, df: pd.DataFrame, price_df: pd.DataFrame = None, max_bars: int = 400, show: bool = True):
+        """
+        :param df: Merged price and sentiment dataframe, as returned by "Analysis.merge.merge_sentiment_asof" (aggregated or not). It is not modified. 
+        :param price_df: The price data the merge was made from. The candles are drawn from it, so days without articles are 
+                         not missing from the chart. The bars of "df" are used if not passed. 
+        :param max_bars: The most candles drawn. Longer histories are drawn as weekly or monthly candles. 
+        :param show: If the chart should be shown. Set to False to save or close it from the caller. 
+
+        Description: The candles and the sentiment are brought down to the display resolution before plotting, so the render 
+                     time stays about the same whatever the length of the history, and every candle stays readable. 
+        """
+        sentiment_columns = ["bodyNeg", "bodyNeu", "bodyPos", "bodyComp"]
+        price_df = price_df if price_df is not None else df
+        rule = display_rule(price_df["Date"], max_bars=max_bars)
+        ohlcv = resample_ohlcv(price_df, rule)
+        # Periods without articles are left empty in the sentiment panels. 
+        sentiment = aggregate_sentiment(df, rule, sentiment_columns).reindex(ohlcv.index)
+
         # Create the subplot objects
         sentiment_subplot_ylabel = "Sentiment Score"
-        neg_sentiment_subplot = mpf.make_addplot(df["bodyNeg"], panel=2, secondary_y=True, ylabel=sentiment_subplot_ylabel, color="red")
-        neu_sentiment_subplot = mpf.make_addplot(df["bodyNeu"], panel=2, secondary_y=True, ylabel=sentiment_subplot_ylabel, color="yellow") 
-        pos_sentiment_subplot = mpf.make_addplot(df["bodyPos"], panel=2, secondary_y=True, ylabel=sentiment_subplot_ylabel, color="green")
-        compound_sentiment_subplot = mpf.make_addplot(df["bodyComp"], panel=3, secondary_y=False, ylabel="Compound Score")
-        
-        
-        df.set_index("Date", inplace=True)
-       # Create a candlestick chart
-        mpf.plot(df, type='candle', title=f'{self.ticker} Chart', addplot=[neg_sentiment_subplot, neu_sentiment_subplot, pos_sentiment_subplot, compound_sentiment_subplot],volume=True, 
-                style='yahoo')
+        neg_sentiment_subplot = mpf.make_addplot(sentiment["bodyNeg"], panel=2, secondary_y=True, ylabel=sentiment_subplot_ylabel, color="red")
+        neu_sentiment_subplot = mpf.make_addplot(sentiment["bodyNeu"], panel=2, secondary_y=True, ylabel=sentiment_subplot_ylabel, color="yellow") 
+        pos_sentiment_subplot = mpf.make_addplot(sentiment["bodyPos"], panel=2, secondary_y=True, ylabel=sentiment_subplot_ylabel, color="green")
+        compound_sentiment_subplot = mpf.make_addplot(sentiment["bodyComp"], panel=3, secondary_y=False, ylabel="Compound Score")
+
+        resolution = {None: "Daily", "W-FRI": "Weekly", "MS": "Monthly"}[rule]
+        # Create a candlestick chart
+        mpf.plot(ohlcv, type='candle', title=f'{self.ticker} {resolution} Chart', addplot=[neg_sentiment_subplot, neu_sentiment_subplot, pos_sentiment_subplot, compound_sentiment_subplot],volume=True, 
+                style='yahoo', warn_too_much_data=max_bars * 2)
 
         # Combine the financial chart and the stacked bar charts
-        plt.show()
+        if show:
+            plt.show()
     '''-----------------------------------'''
     def make_sentiment_bars(self, ax, data: pd.DataFrame):
         width = 0.2
@@ -59,3 +64,76 @@ class DataGraphs:
         ax.legend(loc='upper left')
     '''-----------------------------------'''
     '''-----------------------------------'''
+
+
+'''-----------------------------------'''
+def display_rule(dates: pd.Series, max_bars: int = 400):
+    """
+    :param dates: The dates of the bars. 
+    :param max_bars: The most candles the chart should have. 
+
+    :returns: The pandas frequency the bars are resampled to: None (daily, left as they are), "W-FRI" (weekly) or "MS" (monthly). 
+    """
+    dates = pd.to_datetime(dates)
+    if len(dates) == 0:
+        return None
+    span_days = (dates.max() - dates.min()).days
+    # About 5 trading days per week, and 21 per month. 
+    if span_days * 5 / 7 <= max_bars:
+        return None
+    if span_days / 7 <= max_bars:
+        return "W-FRI"
+    return "MS"
+
+'''-----------------------------------'''
+def bar_frame(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """
+    :returns: Dataframe of "columns" indexed by the "Date" of "df". Built from the column arrays, so "df" is neither 
+              copied as a whole nor modified. 
+    """
+    return pd.DataFrame({column: df[column].to_numpy() for column in columns}, index=pd.DatetimeIndex(pd.to_datetime(df["Date"]), name="Date"))
+
+'''-----------------------------------'''
+def resample_ohlcv(df: pd.DataFrame, rule: str = None) -> pd.DataFrame:
+    """
+    :param df: Dataframe with "Date", "Open", "High", "Low", "Close" and "Volume" columns. Rows repeating a bar (one row per 
+               article) are allowed. 
+    :param rule: The frequency to resample to (see "display_rule"). The bars are only de-duplicated if None. 
+
+    :returns: Dataframe of candles indexed by date. Each candle opens at the first open, closes at the last close, spans the 
+              highest high and lowest low, and holds the summed volume of its bars. Periods without bars are dropped. 
+    """
+    ohlcv = bar_frame(df, ["Open", "High", "Low", "Close", "Volume"])
+    ohlcv = ohlcv[~ohlcv.index.duplicated(keep="first")]
+    if not ohlcv.index.is_monotonic_increasing:
+        ohlcv = ohlcv.sort_index()
+    if rule is None:
+        return ohlcv
+
+    candles = ohlcv.resample(rule).agg({"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"})
+    return candles[candles["Open"].notna()]
+
+'''-----------------------------------'''
+def aggregate_sentiment(df: pd.DataFrame, rule: str = None, columns: list = None) -> pd.DataFrame:
+    """
+    :param df: Merged dataframe with a "Date" column and the sentiment "columns". If it has an "articleCount" column (one row 
+               per bar), each bar is weighted by its number of articles, otherwise each row counts as one article. 
+    :param rule: The frequency to aggregate to (see "display_rule"). Rows are aggregated per bar if None. 
+
+    :returns: Dataframe indexed by date with the mean of each column over the articles of each period, and "articleCount". 
+    """
+    columns = columns if columns is not None else ["bodyNeg", "bodyNeu", "bodyPos", "bodyComp"]
+    scores = bar_frame(df, columns)
+    if "articleCount" in df.columns:
+        weights = pd.Series(df["articleCount"].to_numpy(dtype=float), index=scores.index)
+    else:
+        weights = pd.Series(1.0, index=scores.index)
+    # Scores that are missing do not count towards the mean of their column. 
+    weights_per_column = scores.notna().multiply(weights, axis=0)
+
+    key = scores.index if rule is None else pd.Grouper(freq=rule)
+    weighted_sums = scores.multiply(weights, axis=0).groupby(key).sum()
+    weight_sums = weights_per_column.groupby(key).sum()
+    aggregated = weighted_sums.divide(weight_sums.where(weight_sums > 0), axis=0)
+    aggregated["articleCount"] = weights.groupby(key).sum()
+    return aggregated
@@ -0,0 +1,215 @@
+import os
+import threading
+
+import numpy as np
+
+# Model loading related
+from Models.registry import load_pretrained, pretrained_folder, default_model_name
+
+
+# Names of the available inference backends.
+backend_names = ["torch", "torch-int8", "onnx"]
+
+# Every backend created so far, shared by the whole process.
+backends_lock = threading.Lock()
+loaded_backends = {}
+
+# Fixed corpus used to check the output of the faster backends against the fp32 reference.
+reference_corpus = [
+    "Shares surged after the company reported record quarterly revenue.",
+    "The stock plunged as regulators opened an investigation into the firm.",
+    "The company will hold its annual shareholder meeting on Tuesday.",
+    "Analysts downgraded the stock, citing weak guidance and rising costs.",
+    "Investors cheered the new product launch and strong user growth.",
+    "The board announced a leadership change effective next month.",
+    "Layoffs hit thousands of employees as the company restructures.",
+    "Earnings came in line with expectations.",
+    "The merger was blocked, sending shares to a five year low.",
+    "Record demand lifted margins and the outlook was raised for the full year.",
+    "Life is work",
+    "Work is life",
+]
+
+
+'''-----------------------------------'''
+def set_thread_counts(intra_op_threads: int = 0, inter_op_threads: int = 0):
+    """
+    :param intra_op_threads: The number of threads a single operation (e.g. a matrix multiply) may use. 0 keeps the default.
+    :param inter_op_threads: The number of operations that may run at the same time. 0 keeps the default.
+    """
+    import torch
+
+    if intra_op_threads > 0:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads > 0:
+        # Torch only allows this to be set before any parallel work has run.
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            print(f"[Backends] Inter-op threads are already in use, keeping {torch.get_num_interop_threads()}.")
+
+
+class TorchBackend:
+    """
+    The reference backend. Runs the pretrained model in fp32 with PyTorch.
+    """
+    def __init__(self, model_name: str = default_model_name):
+        self.model = load_pretrained(model_name)[1]
+    '''-----------------------------------'''
+    def predict_logits(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """
+        :param input_ids: Padded token ids, shape (batch, sequence).
+        :param attention_mask: Attention mask of the padded token ids, shape (batch, sequence).
+        :returns: The logits of each row, shape (batch, labels).
+        """
+        import torch
+
+        with torch.inference_mode():
+            output = self.model(input_ids=torch.from_numpy(input_ids), attention_mask=torch.from_numpy(attention_mask))
+        return output[0].numpy()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """
+    Runs the pretrained model with the weights of its linear layers dynamically quantized to int8.
+    """
+    def __init__(self, model_name: str = default_model_name):
+        import copy
+        import torch
+
+        model = load_pretrained(model_name)[1]
+        # Quantize a copy, so the fp32 model stays available as the reference.
+        self.model = torch.quantization.quantize_dynamic(copy.deepcopy(model), {torch.nn.Linear}, dtype=torch.qint8)
+        self.model.eval()
+
+
+class OnnxBackend:
+    """
+    Runs the pretrained model as an exported ONNX graph with ONNX Runtime. The graph is exported once, next to the
+    pretrained model files.
+    """
+    def __init__(self, model_name: str = default_model_name, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        import onnxruntime as ort
+
+        onnx_path = f"{pretrained_folder}\\onnx\\{model_name.replace('/', '--')}.onnx"
+        if not os.path.exists(onnx_path):
+            self.export(model_name, onnx_path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads > 0:
+            options.inter_op_num_threads = inter_op_threads
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+    '''-----------------------------------'''
+    def export(self, model_name: str, onnx_path: str):
+        import torch
+
+        model = load_pretrained(model_name)[1]
+
+        # Wrap the model, so the exported graph takes plain tensors and returns only the logits.
+        class LogitsOnly(torch.nn.Module):
+            def __init__(self, wrapped):
+                super().__init__()
+                self.wrapped = wrapped
+
+            def forward(self, input_ids, attention_mask):
+                return self.wrapped(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+        folder_path = os.path.dirname(onnx_path)
+        if folder_path != "" and not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+
+        print(f"[Backends] Exporting {model_name} to {onnx_path}")
+        sample_ids = torch.ones((1, 8), dtype=torch.long)
+        sample_mask = torch.ones((1, 8), dtype=torch.long)
+        torch.onnx.export(LogitsOnly(model).eval(), (sample_ids, sample_mask), onnx_path,
+                          input_names=["input_ids", "attention_mask"], output_names=["logits"],
+                          dynamic_axes={"input_ids": {0: "batch", 1: "sequence"},
+                                        "attention_mask": {0: "batch", 1: "sequence"},
+                                        "logits": {0: "batch"}},
+                          opset_version=14)
+    '''-----------------------------------'''
+    def predict_logits(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """
+        :param input_ids: Padded token ids, shape (batch, sequence).
+        :param attention_mask: Attention mask of the padded token ids, shape (batch, sequence).
+        :returns: The logits of each row, shape (batch, labels).
+        """
+        return self.session.run(["logits"], {"input_ids": input_ids.astype(np.int64),
+                                             "attention_mask": attention_mask.astype(np.int64)})[0]
+
+
+'''-----------------------------------'''
+def load_backend(backend: str = "torch", model_name: str = default_model_name, intra_op_threads: int = 0, inter_op_threads: int = 0):
+    """
+    :param backend: One of "torch" (fp32, the reference), "torch-int8" (dynamic quantization) or "onnx" (ONNX Runtime).
+    :param model_name: The pretrained model to run.
+    :param intra_op_threads: The number of threads a single operation may use. 0 keeps the default.
+    :param inter_op_threads: The number of operations that may run at the same time. 0 keeps the default.
+
+    :returns: The backend, created once per process. ONNX sessions are created once per thread setting, since their threads
+              are fixed when the session is made. The torch thread counts are process wide, so they are applied again on
+              every call, and a warning is printed when they change those of the cached backend.
+    """
+    if backend not in backend_names:
+        raise ValueError(f"[Backends] Unknown backend '{backend}'. Choose from: {', '.join(backend_names)}")
+
+    thread_counts = (intra_op_threads, inter_op_threads)
+    key = (backend, model_name, thread_counts) if backend == "onnx" else (backend, model_name)
+    with backends_lock:
+        if backend != "onnx":
+            set_thread_counts(intra_op_threads, inter_op_threads)
+        if key not in loaded_backends:
+            if backend == "onnx":
+                loaded_backends[key] = OnnxBackend(model_name, intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads)
+            elif backend == "torch-int8":
+                loaded_backends[key] = QuantizedTorchBackend(model_name)
+            else:
+                loaded_backends[key] = TorchBackend(model_name)
+            loaded_backends[key].thread_counts = thread_counts
+        elif thread_counts != (0, 0) and loaded_backends[key].thread_counts != thread_counts:
+            print(f"[Backends] {backend} was loaded with (intra, inter) threads {loaded_backends[key].thread_counts}, "
+                  f"now using {thread_counts} for the whole process.")
+            loaded_backends[key].thread_counts = thread_counts
+        return loaded_backends[key]
+
+'''-----------------------------------'''
+def check_backend_accuracy(backends: list = None, texts: list = None, model_name: str = default_model_name) -> list:
+    """
+    :param backends: The backends to check. Defaults to every backend other than the reference.
+    :param texts: The texts to score. Defaults to "reference_corpus".
+    :param model_name: The pretrained model to run.
+
+    :returns: A list with a row per backend: {"backend", "maxAbsDiff", "meanAbsDiff", "labelAgreement"}, comparing its
+              neg/neu/pos scores to the fp32 torch backend.
+    """
+    # Imported here, since the sentiment model module imports this one.
+    from Models.sentiment_analysis import SentimentModel
+
+    if backends is None:
+        backends = [name for name in backend_names if name != "torch"]
+    if texts is None:
+        texts = reference_corpus
+
+    reference_scores = SentimentModel(model_name=model_name, backend="torch").score_texts(texts)
+
+    results = []
+    for backend in backends:
+        scores = SentimentModel(model_name=model_name, backend=backend).score_texts(texts)
+        differences = np.abs(scores - reference_scores)
+        results.append({
+            "backend": backend,
+            "maxAbsDiff": float(differences.max()),
+            "meanAbsDiff": float(differences.mean()),
+            "labelAgreement": float(np.mean(scores.argmax(axis=1) == reference_scores.argmax(axis=1)))
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for result in check_backend_accuracy():
+        print(f"[Backends] {result['backend']}: max diff {result['maxAbsDiff']:.4f}, mean diff {result['meanAbsDiff']:.4f}, "
+              f"label agreement {result['labelAgreement']:.0%}")
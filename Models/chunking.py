@@ -0,0 +1,112 @@
+import numpy as np
+
+
+'''-----------------------------------'''
+def chunk_token_ids(token_ids: list, window: int, overlap: int = 0) -> list:
+    """
+    :param token_ids: The token ids of a single piece of text (without any special tokens).
+    :param window: The maximum number of tokens in a chunk.
+    :param overlap: How many tokens each chunk shares with the chunk before it.
+
+    :returns: A list of token id lists. Every chunk is "window" tokens long, except for the last one.
+
+    Description: Packs a tokenized text into full windows. Unlike splitting on characters, this fills the model's input layer
+                 and never cuts a word in half. Empty texts return a single empty chunk so they still receive a score.
+    """
+    if window <= 0:
+        raise ValueError(f"[Chunking] Window must be positive, got {window}.")
+    if overlap < 0 or overlap >= window:
+        raise ValueError(f"[Chunking] Overlap must be between 0 and the window size ({window}), got {overlap}.")
+
+    if len(token_ids) <= window:
+        return [list(token_ids)]
+
+    stride = window - overlap
+    chunks = []
+    for start in range(0, len(token_ids), stride):
+        chunks.append(list(token_ids[start:start + window]))
+        # Stop once the window reaches the end of the text, otherwise the last chunk would only hold overlap.
+        if start + window >= len(token_ids):
+            break
+    return chunks
+
+'''-----------------------------------'''
+def bucket_batches(lengths: list, max_batch_tokens: int, max_batch_size: int) -> list:
+    """
+    :param lengths: The length (in tokens) of every chunk to schedule.
+    :param max_batch_tokens: The maximum padded size of a batch (batch rows * longest row).
+    :param max_batch_size: The maximum number of rows in a batch.
+
+    :returns: A list of batches, where each batch is a list of indexes into "lengths".
+
+    Description: Sorts the chunks by length and cuts them into batches, so every batch holds chunks of a similar length and
+                 the padding waste stays small. Short chunks are packed into bigger batches than long ones.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+
+    batches = []
+    batch = []
+    longest = 0
+    for index in order:
+        length = max(lengths[index], 1)
+        # Since the chunks are sorted, the new chunk is the longest in the batch. Check the padded size with it included.
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * max(longest, length) > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+            longest = 0
+        batch.append(index)
+        longest = max(longest, length)
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+'''-----------------------------------'''
+def softmax_rows(logits: np.ndarray) -> np.ndarray:
+    """
+    :param logits: Array of shape (N, 3).
+    :returns: The softmax of each row, as float64.
+    """
+    logits = np.asarray(logits, dtype=np.float64)
+    if logits.size == 0:
+        return logits.reshape(0, 3)
+    exponents = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exponents / exponents.sum(axis=1, keepdims=True)
+
+'''-----------------------------------'''
+def aggregate_chunk_scores(owners: np.ndarray, lengths: np.ndarray, probabilities: np.ndarray, text_count: int,
+                           method: str = "weighted_mean") -> np.ndarray:
+    """
+    :param owners: The index of the text each chunk belongs to.
+    :param lengths: The number of tokens in each chunk.
+    :param probabilities: The neg/neu/pos probabilities of each chunk, shape (chunks, 3).
+    :param text_count: The number of texts.
+    :param method: "weighted_mean" (weighted by chunk length), "mean", or "max_negative" (the chunk with the highest
+                   negative score represents the text).
+
+    :returns: Array of shape (text_count, 3) with the neg/neu/pos score of each text. Texts without chunks score 0.
+    """
+    owners = np.asarray(owners, dtype=np.int64)
+    probabilities = np.asarray(probabilities, dtype=np.float64).reshape(-1, 3)
+    text_scores = np.zeros((text_count, 3))
+
+    if method == "max_negative":
+        # Sort by text, then by negative score, so the last chunk of each text is its most negative one.
+        order = np.lexsort((probabilities[:, 0], owners))
+        sorted_owners = owners[order]
+        is_last = np.append(sorted_owners[1:] != sorted_owners[:-1], True) if len(order) else np.zeros(0, dtype=bool)
+        text_scores[sorted_owners[is_last]] = probabilities[order[is_last]]
+        return text_scores
+
+    if method == "weighted_mean":
+        weights = np.maximum(np.asarray(lengths, dtype=np.float64), 1)
+    elif method == "mean":
+        weights = np.ones(len(owners))
+    else:
+        raise ValueError(f"[Chunking] Unknown aggregation method: {method}")
+
+    weight_sums = np.bincount(owners, weights=weights, minlength=text_count)
+    for column in range(3):
+        text_scores[:, column] = np.bincount(owners, weights=probabilities[:, column] * weights, minlength=text_count)
+    text_scores /= np.maximum(weight_sums, 1e-12)[:, None]
+    return text_scores
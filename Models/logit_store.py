@@ -0,0 +1,219 @@
+import os
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Chunking related
+from Models.chunking import aggregate_chunk_scores, softmax_rows
+
+# Cache related
+from Models.score_cache import cache_folder
+from Models.sentiment_analysis import compound_scores, SentimentModel
+
+
+# Path to logit store folder.
+logit_folder = f"{cache_folder}\\Logits"
+
+# Which piece of the article a chunk belongs to.
+field_codes = {"title": 0, "body": 1}
+
+# One row per chunk. The logits of the chunk are stored in the same row of the logits file.
+index_dtype = np.dtype([("urlHash", "<u8"), ("field", "u1"), ("offset", "<u4"), ("length", "<u4")])
+logit_dtype = np.dtype("<f2")
+
+
+'''-----------------------------------'''
+def url_hash(url: str) -> int:
+    """
+    :param url: The url of an article.
+    :returns: A 64 bit hash of the url, used to index the article in the logit store.
+    """
+    return int.from_bytes(hashlib.sha1(str(url).encode("utf-8")).digest()[:8], "little")
+
+
+class LogitStore:
+    def __init__(self, folder_path: str = logit_folder):
+        """
+        :param folder_path: The folder holding the store's "index.bin" and "logits.bin" files.
+
+        Description: Append-only store of the raw logits of every scored chunk, as float16. The index file holds the url hash,
+                     field, token offset and token length of each chunk, and the logits file holds its 3 logits in the same row.
+                     Both files are read as memory-mapped arrays, so re-aggregating never loads more than it needs.
+        """
+        if not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+        self.index_path = f"{folder_path}\\index.bin"
+        self.logits_path = f"{folder_path}\\logits.bin"
+        self.lock = threading.Lock()
+        self.stored_ids = None
+        self.repaired = False
+    '''-----------------------------------'''
+    def append(self, text_ids: list, chunks: dict, text_positions: list = None):
+        """
+        :param text_ids: The (url, field) pair of each text, where field is "title" or "body".
+        :param chunks: The chunk output of the texts, as returned by "SentimentModel.score_chunks".
+        :param text_positions: The position in "chunks" of the text of each id, so texts shared by several urls are only
+                               scored once. Defaults to the same position as the id.
+
+        Description: Ids that are already stored are skipped, so re-running an article does not count it twice.
+        """
+        if text_positions is None:
+            text_positions = list(range(len(text_ids)))
+        hashes = np.array([url_hash(url) for url, _ in text_ids], dtype=np.uint64)
+        fields = np.array([field_codes[field] for _, field in text_ids], dtype=np.uint8)
+
+        # The chunk rows of each text, in order.
+        owners = chunks["owners"]
+        order = np.argsort(owners, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(owners, minlength=max(text_positions, default=-1) + 1))])
+
+        with self.lock:
+            self.repair()
+            stored_ids = self.get_stored_ids()
+            chunk_rows = []
+            chunk_ids = []
+            for position, (h, f) in enumerate(zip(hashes.tolist(), fields.tolist())):
+                if (h, f) in stored_ids:
+                    continue
+                stored_ids.add((h, f))
+                text_position = text_positions[position]
+                rows = order[bounds[text_position]:bounds[text_position + 1]]
+                chunk_rows.append(rows)
+                chunk_ids.append(np.full(len(rows), position, dtype=np.int64))
+            if not chunk_rows:
+                return
+            chunk_rows = np.concatenate(chunk_rows)
+            chunk_ids = np.concatenate(chunk_ids)
+
+            index_rows = np.zeros(len(chunk_rows), dtype=index_dtype)
+            index_rows["urlHash"] = hashes[chunk_ids]
+            index_rows["field"] = fields[chunk_ids]
+            index_rows["offset"] = chunks["offsets"][chunk_rows]
+            index_rows["length"] = chunks["lengths"][chunk_rows]
+            logit_rows = np.ascontiguousarray(chunks["logits"][chunk_rows], dtype=logit_dtype)
+
+            # Write the logits first. If a crash happens between the two writes, "repair" cuts the extra logits off
+            # before the next append, so the rows of both files stay aligned.
+            with open(self.logits_path, "ab") as file:
+                file.write(logit_rows.tobytes())
+            with open(self.index_path, "ab") as file:
+                file.write(index_rows.tobytes())
+    '''-----------------------------------'''
+    def missing(self, text_ids: list) -> np.ndarray:
+        """
+        :param text_ids: (url, field) pairs.
+        :returns: Boolean array, True for the ids that have no logits stored yet.
+        """
+        with self.lock:
+            self.repair()
+            stored_ids = self.get_stored_ids()
+            return np.array([(url_hash(url), field_codes[field]) not in stored_ids for url, field in text_ids], dtype=bool)
+    '''-----------------------------------'''
+    def repair(self):
+        """
+        Truncates both files to the rows they have in common, dropping what a crash in the middle of an append left behind:
+        a partial row, or logits whose index rows were never written. Only runs once per store. The caller must hold the lock.
+        """
+        if self.repaired:
+            return
+        self.repaired = True
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        logits_size = os.path.getsize(self.logits_path) if os.path.exists(self.logits_path) else 0
+        row_size = 3 * logit_dtype.itemsize
+        rows = min(index_size // index_dtype.itemsize, logits_size // row_size)
+
+        for path, size, expected in [(self.index_path, index_size, rows * index_dtype.itemsize),
+                                     (self.logits_path, logits_size, rows * row_size)]:
+            if size > expected:
+                print(f"[Logit Store] Truncating {path} to {expected} bytes after an interrupted append.")
+                with open(path, "r+b") as file:
+                    file.truncate(expected)
+        self.stored_ids = None
+    '''-----------------------------------'''
+    def get_stored_ids(self) -> set:
+        if self.stored_ids is None:
+            index, _ = self.load(repair=False)
+            self.stored_ids = set(zip(index["urlHash"].tolist(), index["field"].tolist()))
+        return self.stored_ids
+    '''-----------------------------------'''
+    def load(self, repair: bool = True) -> tuple:
+        """
+        :returns: Tuple of (index, logits) memory-mapped arrays. "logits" has shape (chunks, 3).
+        """
+        if repair:
+            with self.lock:
+                self.repair()
+        if not os.path.exists(self.index_path) or os.path.getsize(self.index_path) == 0:
+            return np.zeros(0, dtype=index_dtype), np.zeros((0, 3), dtype=logit_dtype)
+
+        index = np.memmap(self.index_path, dtype=index_dtype, mode="r")
+        logits = np.memmap(self.logits_path, dtype=logit_dtype, mode="r").reshape(-1, 3)
+        return index, logits[:len(index)]
+    '''-----------------------------------'''
+    def aggregate(self, method: str = "weighted_mean", neutral_weight: int = SentimentModel.neutral_weight_default) -> pd.DataFrame:
+        """
+        :param method: How the chunks of a text are combined: "weighted_mean" (by chunk length, the same as "analyze_text"),
+                       "mean", or "max_negative" (see "aggregate_chunk_scores").
+        :param neutral_weight: The neutral weight used for the compound scores.
+
+        :returns: Dataframe with a row per stored text: "urlHash", "field", "neg", "neu", "pos" and "compound".
+        """
+        index, logits = self.load()
+
+        text_keys = np.stack([index["urlHash"], index["field"].astype(np.uint64)], axis=1)
+        unique_keys, owners = np.unique(text_keys, axis=0, return_inverse=True)
+        owners = owners.reshape(-1)
+
+        text_scores = aggregate_chunk_scores(owners, index["length"], softmax_rows(logits), text_count=len(unique_keys), method=method)
+
+        fields = {code: field for field, code in field_codes.items()}
+        return pd.DataFrame({
+            "urlHash": unique_keys[:, 0],
+            "field": [fields[int(code)] for code in unique_keys[:, 1]],
+            "neg": text_scores[:, 0],
+            "neu": text_scores[:, 1],
+            "pos": text_scores[:, 2],
+            "compound": compound_scores(text_scores, neutral_weight=neutral_weight)
+        })
+    '''-----------------------------------'''
+    def rescore_articles(self, sentiment_df: pd.DataFrame, method: str = "weighted_mean",
+                         neutral_weight: int = SentimentModel.neutral_weight_default, strict: bool = False) -> pd.DataFrame:
+        """
+        :param sentiment_df: Dataframe of article sentiment, as returned by "get_articles_sentiment".
+        :param method: How the chunks of a text are combined (see "aggregate").
+        :param neutral_weight: The neutral weight used for the compound scores.
+
+        :param strict: If True, raise a KeyError when a scored text has no stored logits, instead of reporting it.
+
+        :returns: A copy of the dataframe with the title and body scores re-aggregated from the stored logits. Articles of a
+                  cluster take the logits of the cluster's first article, the one that was scored. Texts without stored
+                  logits keep their scores, and are reported. Texts that were never scored (e.g. pending bodies) are not.
+        """
+        scores_df = self.aggregate(method=method, neutral_weight=neutral_weight)
+        rescored_df = sentiment_df.copy()
+        if "clusterId" in rescored_df.columns:
+            # Only the first article of a cluster was run through the model (see Scrapers.scoring).
+            clusters = rescored_df["clusterId"].fillna(rescored_df["url"])
+            scored_urls = rescored_df["url"].groupby(clusters).transform("first")
+        else:
+            scored_urls = rescored_df["url"]
+        hashes = scored_urls.map(url_hash).astype(np.uint64)
+
+        missing = {}
+        for field in ["title", "body"]:
+            field_scores = scores_df[scores_df["field"] == field].set_index("urlHash")
+            found = hashes.isin(field_scores.index)
+            matched = field_scores.loc[hashes[found]]
+            for score, suffix in [("neg", "Neg"), ("neu", "Neu"), ("pos", "Pos"), ("compound", "Comp")]:
+                rescored_df.loc[found, f"{field}{suffix}"] = matched[score].to_numpy()
+            missing[field] = int((~found & rescored_df[f"{field}Neg"].notna()).sum())
+
+        if missing["title"] or missing["body"]:
+            message = (f"[Logit Store] No stored logits for {missing['title']} titles and {missing['body']} bodies. "
+                       f"They keep their stored scores.")
+            if strict:
+                raise KeyError(message)
+            print(message)
+        return rescored_df
@@ -0,0 +1,83 @@
+import os
+import threading
+
+
+cwd = os.getcwd()
+
+# Path to the folder the pretrained models are downloaded to, and loaded from when offline.
+pretrained_folder = f"{cwd}\\Models\\Pretrained"
+
+default_model_name = "cardiffnlp/twitter-roberta-base-sentiment"
+
+# Everything loaded so far, shared by the whole process.
+registry_lock = threading.Lock()
+pretrained_models = {}
+sentiment_models = {}
+
+
+'''-----------------------------------'''
+def load_pretrained(model_name: str = default_model_name, cache_dir: str = pretrained_folder) -> tuple:
+    """
+    :param model_name: The name of the pretrained model on the Hugging Face hub.
+    :param cache_dir: The folder the model files are stored in.
+
+    :returns: Tuple of (tokenizer, model). Each model is only loaded once per process.
+
+    Description: The model is loaded from the local folder without touching the network. It is only downloaded if it is
+                 not in the folder yet. Transformers is imported here, so importing this module stays cheap.
+    """
+    with registry_lock:
+        if model_name not in pretrained_models:
+            from transformers import AutoTokenizer
+            from transformers import AutoModelForSequenceClassification
+
+            try:
+                tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=cache_dir, local_files_only=True)
+                model = AutoModelForSequenceClassification.from_pretrained(model_name, cache_dir=cache_dir, local_files_only=True)
+            # The model has not been downloaded yet.
+            except OSError:
+                print(f"[Models] Downloading {model_name} to {cache_dir}")
+                tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=cache_dir)
+                model = AutoModelForSequenceClassification.from_pretrained(model_name, cache_dir=cache_dir)
+
+            model.eval()
+            pretrained_models[model_name] = (tokenizer, model)
+        return pretrained_models[model_name]
+
+'''-----------------------------------'''
+def get_sentiment_model(model_name: str = default_model_name, use_score_cache: bool = True, backend: str = "torch",
+                        use_logit_store: bool = False, server_url: str = None):
+    """
+    :param model_name: The name of the pretrained model on the Hugging Face hub.
+    :param use_score_cache: If the model should read and write the persistent score cache.
+    :param backend: How the model is run (see Models.backends).
+    :param use_logit_store: If the raw chunk logits of every scored text should be kept (see Models.logit_store).
+    :param server_url: The url of a running scoring server (see Models.scoring_server) to score with instead of loading the
+                       model. Read from the "SENTIMENT_SCORING_SERVER" environment variable if not passed. "" scores locally.
+
+    :returns: The SentimentModel shared by the whole process. Creating it is cheap, the weights are loaded on the first
+              call that scores text.
+    """
+    if server_url is None:
+        server_url = os.environ.get("SENTIMENT_SCORING_SERVER", "")
+    if server_url != "":
+        # The cache, backend and logit store are the server's.
+        from Models.scoring_server import RemoteSentimentModel
+
+        with registry_lock:
+            if server_url not in sentiment_models:
+                sentiment_models[server_url] = RemoteSentimentModel(server_url=server_url, model_name=model_name)
+            return sentiment_models[server_url]
+
+    # Imported here, since the sentiment model module imports this one.
+    from Models.sentiment_analysis import SentimentModel
+    from Models.score_cache import ScoreCache
+    from Models.logit_store import LogitStore
+
+    key = (model_name, use_score_cache, backend, use_logit_store)
+    with registry_lock:
+        if key not in sentiment_models:
+            score_cache = ScoreCache() if use_score_cache else None
+            logit_store = LogitStore() if use_logit_store else None
+            sentiment_models[key] = SentimentModel(model_name=model_name, cache=score_cache, backend=backend, logit_store=logit_store)
+        return sentiment_models[key]
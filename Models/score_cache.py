@@ -0,0 +1,148 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+cwd = os.getcwd()
+
+# Path to cache folder.
+cache_folder = f"{cwd}\\Models\\Cache"
+
+
+class ScoreCache:
+    def __init__(self, db_path: str = "", memory_size: int = 50000, max_entries: int = 2000000):
+        """
+        :param db_path: Path to the SQLite file holding the cached scores. Defaults to "sentiment_cache.sqlite" in the cache folder.
+        :param memory_size: The number of scores kept in the in-memory LRU in front of the database.
+        :param max_entries: The maximum number of scores stored on disk. The least recently used scores are evicted past this size.
+        """
+        if db_path == "":
+            if not os.path.exists(cache_folder):
+                os.makedirs(cache_folder)
+            db_path = f"{cache_folder}\\sentiment_cache.sqlite"
+
+        self.db_path = db_path
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Several job runner processes can share the cache file, so wait on their writes instead of failing.
+        self.connection = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS scores (
+                key TEXT PRIMARY KEY,
+                neg REAL NOT NULL,
+                neu REAL NOT NULL,
+                pos REAL NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS scores_last_access ON scores (last_access)")
+        self.connection.commit()
+        # An upper bound on the stored entries, so "put_many" only counts the table once it may be over "max_entries".
+        self.entry_estimate = self.connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+    '''-----------------------------------'''
+    @staticmethod
+    def make_key(model_name: str, text: str, chunk_params: tuple = ()) -> str:
+        """
+        :param model_name: The name of the model that produced the score.
+        :param text: The text that was scored.
+        :param chunk_params: Any settings that change how the text is split before scoring.
+
+        :returns: A hex digest identifying the (model, text, chunking) combination.
+
+        Description: Whitespace is collapsed before hashing, so the same article saved with different line breaks or padding
+                     shares one cache entry.
+        """
+        normalized_text = " ".join(str(text).split())
+        key_source = f"{model_name}\x1f{chunk_params}\x1f{normalized_text}"
+        return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+    '''-----------------------------------'''
+    def get_many(self, keys: list) -> dict:
+        """
+        :param keys: Keys created by "make_key".
+        :returns: Dictionary of {key: (neg, neu, pos)} for every key found in the cache. Missing keys are left out.
+        """
+        found = {}
+        missing = []
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+                elif key not in found:
+                    missing.append(key)
+
+            if missing:
+                # SQLite limits the number of bound parameters, so look the keys up in slices.
+                for start in range(0, len(missing), 500):
+                    key_slice = missing[start:start + 500]
+                    placeholders = ",".join("?" * len(key_slice))
+                    rows = self.connection.execute(f"SELECT key, neg, neu, pos FROM scores WHERE key IN ({placeholders})", key_slice).fetchall()
+                    for key, neg, neu, pos in rows:
+                        found[key] = (neg, neu, pos)
+                        self._remember(key, (neg, neu, pos))
+
+            # Memory hits are touched on disk as well, otherwise the hottest keys look the oldest to "_evict".
+            if found:
+                now = time.time()
+                self.connection.executemany("UPDATE scores SET last_access = ? WHERE key = ?", [(now, key) for key in found])
+                self.connection.commit()
+        return found
+    '''-----------------------------------'''
+    def put_many(self, scores: dict):
+        """
+        :param scores: Dictionary of {key: (neg, neu, pos)} to store.
+        """
+        if not scores:
+            return
+        now = time.time()
+        with self.lock:
+            self.connection.executemany("INSERT OR REPLACE INTO scores (key, neg, neu, pos, last_access) VALUES (?, ?, ?, ?, ?)",
+                                        [(key, float(neg), float(neu), float(pos), now) for key, (neg, neu, pos) in scores.items()])
+            for key, value in scores.items():
+                self._remember(key, tuple(float(i) for i in value))
+            # Replaced keys are counted too, so the estimate never falls below the real count.
+            self.entry_estimate += len(scores)
+            self._evict()
+            self.connection.commit()
+    '''-----------------------------------'''
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.connection.execute("DELETE FROM scores")
+            self.connection.commit()
+            self.entry_estimate = 0
+    '''-----------------------------------'''
+    def close(self):
+        with self.lock:
+            self.connection.close()
+    '''-----------------------------------'''
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+    '''-----------------------------------'''
+    def _remember(self, key: str, value: tuple):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+    '''-----------------------------------'''
+    def _evict(self):
+        if self.entry_estimate <= self.max_entries:
+            return
+        entry_count = self.connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        self.entry_estimate = entry_count
+        if entry_count <= self.max_entries:
+            return
+        # Evict an extra 10% so we don't have to evict again on the very next write.
+        evict_count = entry_count - int(self.max_entries * 0.9)
+        self.connection.execute("""
+            DELETE FROM scores WHERE key IN (
+                SELECT key FROM scores ORDER BY last_access ASC LIMIT ?
+            )""", (evict_count,))
+        self.entry_estimate = entry_count - evict_count
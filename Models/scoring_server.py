@@ -0,0 +1,336 @@
+import json
+import time
+import queue
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# HTTP imports
+import requests
+
+# Model related
+from Models.sentiment_analysis import SentimentModel
+from Models.registry import default_model_name, get_sentiment_model
+
+# Instrumentation
+from Monitoring.metrics import Metric, metrics
+
+
+default_host = "127.0.0.1"
+default_port = 8765
+default_server_url = f"http://{default_host}:{default_port}"
+
+# Tells the batcher thread to exit.
+stop_batcher = object()
+
+
+class ScoreRequest:
+    def __init__(self, texts: list, neutral_weight: int, logit_ids: list = None):
+        self.texts = texts
+        self.neutral_weight = neutral_weight
+        self.logit_ids = logit_ids
+        self.scores = None
+        self.error = None
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    def __init__(self, model: SentimentModel, max_wait: float = 0.01, max_batch: int = 64):
+        """
+        :param model: The SentimentModel every request is scored with.
+        :param max_wait: Seconds the first request of a batch waits for others to join it.
+        :param max_batch: The number of texts that closes a batch before "max_wait" is up.
+
+        Description: Callers block in "submit" while a single thread collects the waiting requests into one "analyze_batch"
+                     call, so concurrent callers share forward passes instead of queueing for the model one at a time.
+        """
+        self.model = model
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+        self.thread = None
+
+        self.stats_lock = threading.Lock()
+        self.batch_texts = Metric()
+        self.batch_requests = Metric()
+        self.queue_waits = Metric()
+        self.score_seconds = Metric()
+        self.max_queue_depth = 0
+        self.failures = 0
+    '''-----------------------------------'''
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="score-batcher", daemon=True)
+            self.thread.start()
+    '''-----------------------------------'''
+    def stop(self):
+        if self.thread is not None:
+            self.requests.put(stop_batcher)
+            self.thread.join()
+            self.thread = None
+    '''-----------------------------------'''
+    def submit(self, texts: list, neutral_weight: int = SentimentModel.neutral_weight_default, logit_ids: list = None) -> list:
+        """
+        :returns: The score dictionaries of "texts", as returned by "analyze_batch". Blocks until the batch holding them is scored.
+        """
+        if not texts:
+            return []
+        request = ScoreRequest(list(texts), neutral_weight, logit_ids=logit_ids)
+        self.requests.put(request)
+        with self.stats_lock:
+            self.max_queue_depth = max(self.max_queue_depth, self.requests.qsize())
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.scores
+    '''-----------------------------------'''
+    def run(self):
+        while True:
+            first = self.requests.get()
+            if first is stop_batcher:
+                return
+
+            batch = [first]
+            text_count = len(first.texts)
+            deadline = first.enqueued + self.max_wait
+            while text_count < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is stop_batcher:
+                    # Score what was collected, then exit on the next loop.
+                    self.requests.put(stop_batcher)
+                    break
+                batch.append(request)
+                text_count += len(request.texts)
+            self.score_batch(batch)
+    '''-----------------------------------'''
+    def score_batch(self, batch: list):
+        start = time.perf_counter()
+        # Requests only share a call if they ask for the same compound weighting, and all or none of them have logit ids.
+        groups = {}
+        for request in batch:
+            groups.setdefault((request.neutral_weight, request.logit_ids is not None), []).append(request)
+
+        for (neutral_weight, has_ids), requests_in_group in groups.items():
+            texts = [text for request in requests_in_group for text in request.texts]
+            logit_ids = [tuple(logit_id) for request in requests_in_group for logit_id in request.logit_ids] if has_ids else None
+            try:
+                scores = self.model.analyze_batch(texts, neutral_weight=neutral_weight, logit_ids=logit_ids)
+                position = 0
+                for request in requests_in_group:
+                    request.scores = [{key: float(value) for key, value in score.items()}
+                                      for score in scores[position:position + len(request.texts)]]
+                    position += len(request.texts)
+            except Exception as error:
+                for request in requests_in_group:
+                    request.error = error
+                with self.stats_lock:
+                    self.failures += 1
+
+        seconds = time.perf_counter() - start
+        text_count = sum(len(request.texts) for request in batch)
+        with self.stats_lock:
+            self.batch_texts.add(text_count)
+            self.batch_requests.add(len(batch))
+            self.score_seconds.add(seconds)
+            for request in batch:
+                self.queue_waits.add(start - request.enqueued)
+        metrics.observe("server.batch_size", text_count)
+        metrics.observe("server.score", seconds)
+
+        for request in batch:
+            request.done.set()
+    '''-----------------------------------'''
+    def stats(self) -> dict:
+        """
+        :returns: Dictionary of the current and deepest request queue, and the count/mean/p50/p95/max of the texts and requests
+                  per batch, the seconds requests waited to be batched, and the seconds each batch took to score.
+        """
+        with self.stats_lock:
+            return {
+                "queueDepth": self.requests.qsize(),
+                "maxQueueDepth": self.max_queue_depth,
+                "batchTexts": self.batch_texts.summary(),
+                "batchRequests": self.batch_requests.summary(),
+                "queueWait": self.queue_waits.summary(),
+                "scoreSeconds": self.score_seconds.summary(),
+                "failures": self.failures,
+                "maxWait": self.max_wait,
+                "maxBatch": self.max_batch
+            }
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    # Keep connections open, so a client's session does not reconnect for every call.
+    protocol_version = "HTTP/1.1"
+    '''-----------------------------------'''
+    def do_POST(self):
+        if self.path != "/score":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        # Only a malformed payload is the client's fault. Errors raised while scoring are answered 500.
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            texts = body["texts"]
+            neutral_weight = int(body.get("neutral_weight", SentimentModel.neutral_weight_default))
+            logit_ids = body.get("logit_ids")
+            if not isinstance(texts, list) or (logit_ids is not None and len(logit_ids) != len(texts)):
+                raise ValueError("\"texts\" must be a list, with one logit id per text if \"logit_ids\" is passed.")
+        except (ValueError, KeyError, TypeError) as error:
+            self.send_json(400, {"error": str(error)})
+            return
+        try:
+            scores = self.server.batcher.submit(texts, neutral_weight=neutral_weight, logit_ids=logit_ids)
+        except Exception as error:
+            self.send_json(500, {"error": str(error)})
+            return
+        self.send_json(200, {"scores": scores})
+    '''-----------------------------------'''
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(200, self.server.batcher.stats())
+        elif self.path == "/health":
+            self.send_json(200, {"model": self.server.batcher.model.model_name})
+        else:
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+    '''-----------------------------------'''
+    def send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    '''-----------------------------------'''
+    def log_message(self, format, *args):
+        # One line per request would drown out everything else.
+        pass
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, model: SentimentModel = None, host: str = default_host, port: int = default_port, max_wait: float = 0.01,
+                 max_batch: int = 64):
+        """
+        :param model: The SentimentModel to serve. The local model shared by the process is used if not passed.
+        :param host: The interface to listen on. Only the local machine can connect by default.
+        :param port: The port to listen on. 0 picks a free one (see "server_address").
+        :param max_wait: Seconds a request waits for others to join its batch.
+        :param max_batch: The number of texts that closes a batch early.
+
+        Description: Holds one model for every process on the machine. "POST /score" takes {"texts", "neutral_weight",
+                     "logit_ids"} and returns {"scores"}, "GET /stats" returns the batching stats, and "GET /health" the
+                     model name. Each connection is served on its own thread, and the threads meet in the MicroBatcher.
+        """
+        model = model if model is not None else get_sentiment_model(server_url="")
+        self.batcher = MicroBatcher(model, max_wait=max_wait, max_batch=max_batch)
+        super().__init__((host, port), ScoringRequestHandler)
+    '''-----------------------------------'''
+    def serve_forever(self, poll_interval: float = 0.5):
+        self.batcher.start()
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self.batcher.stop()
+    '''-----------------------------------'''
+    def start(self) -> threading.Thread:
+        """
+        :returns: The daemon thread the server runs on, for serving from inside another program (or a notebook).
+        """
+        thread = threading.Thread(target=self.serve_forever, name="score-server", daemon=True)
+        thread.start()
+        return thread
+
+
+class RemoteSentimentModel(SentimentModel):
+    def __init__(self, server_url: str = default_server_url, timeout: float = 60, model_name: str = default_model_name):
+        """
+        :param server_url: The url of a running ScoringServer.
+        :param timeout: Seconds to wait on a single call.
+
+        Description: Drop-in for SentimentModel whose "analyze_text", "analyze_batch" and "score_texts" are scored by the
+                     server, so the process never loads the model. "score_chunks" raises TypeError. Everything
+                     that does not score (merging, display, ...) runs locally.
+        """
+        super().__init__(model_name=model_name)
+        self.server_url = server_url.rstrip("/")
+        self.timeout = timeout
+        # A session per thread, since callers score from several threads at once.
+        self.local = threading.local()
+    '''-----------------------------------'''
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+    '''-----------------------------------'''
+    def analyze_batch(self, texts: list, neutral_weight: int = SentimentModel.neutral_weight_default, batch_size: int = 32,
+                      logit_ids: list = None) -> list:
+        """
+        :returns: A list of score dictionaries {"neg","neu","pos","compound"}, in the same order as "texts". "batch_size" is
+                  decided by the server.
+        """
+        if not texts:
+            return []
+        payload = {"texts": [str(text) for text in texts], "neutral_weight": neutral_weight}
+        if logit_ids is not None:
+            payload["logit_ids"] = [list(logit_id) for logit_id in logit_ids]
+        with metrics.timer("model.remote"):
+            response = self.session.post(f"{self.server_url}/score", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["scores"]
+    '''-----------------------------------'''
+    def score_texts(self, texts: list, batch_size: int = 32, return_chunks: bool = False):
+        """
+        :returns: Numpy array of shape (len(texts), 3) holding the neg/neu/pos probabilities of each text, scored by the
+                  server. Unlike the local model, the server's score cache is used. Raises ValueError if "return_chunks" is
+                  True, since the server only returns one score per text.
+        """
+        if return_chunks:
+            raise ValueError("[Scoring Server] The server only returns one score per text, not the chunk logits. "
+                             "Use a local SentimentModel to get the chunks.")
+        scores = self.analyze_batch(texts, batch_size=batch_size)
+        # float64, the same as the local model returns.
+        return np.array([[score["neg"], score["neu"], score["pos"]] for score in scores], dtype=np.float64).reshape(-1, 3)
+    '''-----------------------------------'''
+    def score_chunks(self, texts: list, batch_size: int = 32) -> dict:
+        """
+        Raises TypeError. The server only returns one score per text, and the inherited method would load the model here.
+        """
+        raise TypeError("[Scoring Server] RemoteSentimentModel can not score chunks, the server only returns one score per "
+                        "text. Use a local SentimentModel to get the chunk logits.")
+    '''-----------------------------------'''
+    def server_stats(self) -> dict:
+        response = self.session.get(f"{self.server_url}/stats", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the sentiment model to every process on this machine.")
+    parser.add_argument("--host", default=default_host)
+    parser.add_argument("--port", type=int, default=default_port)
+    parser.add_argument("--max-wait-ms", type=float, default=10, help="Milliseconds a request waits for others to join its batch.")
+    parser.add_argument("--max-batch", type=int, default=64, help="The number of texts that closes a batch early.")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--no-score-cache", action="store_true")
+    args = parser.parse_args()
+
+    model = get_sentiment_model(use_score_cache=not args.no_score_cache, backend=args.backend, server_url="")
+    server = ScoringServer(model, host=args.host, port=args.port, max_wait=args.max_wait_ms / 1000, max_batch=args.max_batch)
+    print(f"[Scoring Server] Serving {model.model_name} on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,86 +1,232 @@
-# Transformer imports
-from transformers import AutoTokenizer
-from transformers import AutoModelForSequenceClassification
-from scipy.special import softmax
+# Transformers and torch are imported where they are used, so code that only reads or plots stored data
+# never pays for them.
 
 # Math related
+import numpy as np
 import pandas as pd
 
+# Chunking related
+from Models.chunking import chunk_token_ids, bucket_batches, aggregate_chunk_scores, softmax_rows
+
+# Cache related
+from Models.score_cache import ScoreCache
+
+# Model loading related
+from Models.registry import load_pretrained, default_model_name
+from Models.backends import load_backend
+
+# Instrumentation
+from Monitoring.metrics import metrics
+
 
 
 class SentimentModel:
     neutral_weight_default = 4
-    def __init__(self):
+    def __init__(self, max_tokens: int = 512, chunk_overlap: int = 32, max_batch_tokens: int = 8192, cache: ScoreCache = None,
+                 model_name: str = default_model_name, backend: str = "torch", intra_op_threads: int = 0, inter_op_threads: int = 0,
+                 logit_store=None):
+        """
+        :param max_tokens: The size of the model's input window, including the special tokens. 
+        :param chunk_overlap: How many tokens neighbouring chunks of a long text share. 
+        :param max_batch_tokens: The maximum padded size (rows * longest row) of a single forward pass. 
+        :param cache: Optional persistent score cache. Texts found in the cache are not run through the model again. 
+        :param model_name: The pretrained model to score with. 
+        :param backend: How the model is run. "torch" (fp32, the reference), "torch-int8" (dynamic quantization) or "onnx" (ONNX Runtime). 
+        :param intra_op_threads: The number of threads a single operation may use. 0 keeps the default. 
+        :param inter_op_threads: The number of operations that may run at the same time. 0 keeps the default. 
+        :param logit_store: Optional store for the raw chunk logits (see Models.logit_store), so scores can be re-aggregated later. 
+
+        Description: The pretrained model is loaded on the first call that needs it, and shared with every other SentimentModel
+                     of the process (see Models.registry). 
+        """
         # Pretrained model from a pipeline. 
-        MODEL = f"cardiffnlp/twitter-roberta-base-sentiment"
-        self.tokenizer = AutoTokenizer.from_pretrained(MODEL)
-        self.model = AutoModelForSequenceClassification.from_pretrained(MODEL)
-        self.max_section_size = 514
+        self.model_name = model_name
+        self.backend_name = backend
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.max_tokens = max_tokens
+        self.chunk_overlap = chunk_overlap
+        self.max_batch_tokens = max_batch_tokens
+        self.cache = cache
+        self.logit_store = logit_store
         
        
+    '''-----------------------------------'''
+    @property
+    def tokenizer(self):
+        return load_pretrained(self.model_name)[0]
+    '''-----------------------------------'''
+    @property
+    def model(self):
+        return load_pretrained(self.model_name)[1]
+    '''-----------------------------------'''
+    @property
+    def backend(self):
+        return load_backend(self.backend_name, model_name=self.model_name, 
+                            intra_op_threads=self.intra_op_threads, inter_op_threads=self.inter_op_threads)
     '''-----------------------------------'''
     def analyze_text(self, text: str, neutral_weight: int = neutral_weight_default):
-        
-        # Check if the text is too big for the model's input layer. This will turn the text variable into a list of strings. 
-        if len(text) > self.max_section_size:
-            text = self.split_text(text)
-
-        if isinstance(text, str):
-            encoded_text = self.tokenizer(text, return_tensors="pt") # Means it will return a "PyTorch" tensor. 
-            output = self.model(**encoded_text)
-            # Convert from a tensor to numpy. 
-            scores = output[0][0].detach().numpy()
-            # Apply softmax function. 
-            scores = softmax(scores)
+        """
+        :param text: The string of text to score. 
+        :param neutral_weight: Passed through to "calculate_compound_score". 
+
+        :returns: Dictionary holding the sentiment score {"neg","neu","pos","compound"}. 
+
+        Description: Long texts are split into token windows, and the score of each window is weighted by its length. 
+        """
+        return self.analyze_batch([text], neutral_weight=neutral_weight)[0]
+    '''-----------------------------------'''
+    def analyze_batch(self, texts: list, neutral_weight: int = neutral_weight_default, batch_size: int = 32, logit_ids: list = None) -> list:
+        """
+        :param texts: List of strings to score. 
+        :param neutral_weight: Passed through to "calculate_compound_score". 
+        :param batch_size: The maximum number of chunks passed to the model in a single forward pass. 
+        :param logit_ids: Optional (url, field) pair for each text. If passed and the model has a logit store, the chunk logits of 
+                          every text are saved under it (see Models.logit_store). Texts whose logits are not stored yet are run 
+                          through the model even if their score is cached. 
+
+        :returns: A list of score dictionaries {"neg","neu","pos","compound"}, in the same order as "texts". 
+
+        Description: Scores are read from the score cache where possible, and the remaining texts are scored by "score_texts". 
+        """
+        # Look the texts up in the score cache first. Identical texts within the batch are only scored once. 
+        keys = [self.cache_key(text) for text in texts]
+        if self.cache is not None:
+            cached_scores = self.cache.get_many(list(set(keys)))
+        else:
+            cached_scores = {}
+
+        uncached_texts = {}
+        for key, text in zip(keys, texts):
+            if key not in cached_scores and key not in uncached_texts:
+                uncached_texts[key] = text
+        metrics.count("model.texts", len(texts))
+        metrics.count("model.cache_hits", len(texts) - len(uncached_texts))
+        metrics.count("model.cache_misses", len(uncached_texts))
+
+        # Every (url, field) gets its logits stored, so texts without stored logits are run through the model as well, even
+        # if their score is cached. Duplicate texts are run once, and their logits stored under each of their ids.
+        if self.logit_store is not None and logit_ids is not None:
+            logit_indexes = np.flatnonzero(self.logit_store.missing(logit_ids))
+        else:
+            logit_indexes = []
+        run_texts = dict(uncached_texts)
+        for index in logit_indexes:
+            run_texts.setdefault(keys[index], texts[index])
+
+        if run_texts:
+            if len(logit_indexes) > 0:
+                run_scores, chunks = self.score_texts(list(run_texts.values()), batch_size=batch_size, return_chunks=True)
+                positions = {key: position for position, key in enumerate(run_texts)}
+                self.logit_store.append([logit_ids[index] for index in logit_indexes], chunks,
+                                        text_positions=[positions[keys[index]] for index in logit_indexes])
+            else:
+                run_scores = self.score_texts(list(run_texts.values()), batch_size=batch_size)
+            # Texts whose score was already cached keep it.
+            new_scores = {key: tuple(scores) for key, scores in zip(run_texts.keys(), run_scores) if key in uncached_texts}
+            if self.cache is not None:
+                self.cache.put_many(new_scores)
+            cached_scores.update(new_scores)
+
+        text_scores = np.array([cached_scores[key] for key in keys], dtype=np.float64).reshape(-1, 3)
+        text_compounds = compound_scores(text_scores, neutral_weight=neutral_weight)
+
+        scores_collected = []
+        for scores, compound in zip(text_scores, text_compounds):
             scores_dict = {
                 "neg": scores[0],
                 "neu": scores[1],
-                "pos": scores[2] 
+                "pos": scores[2],
+                "compound": compound
             }
+            scores_collected.append(scores_dict)
+        return scores_collected
+    '''-----------------------------------'''
+    def score_texts(self, texts: list, batch_size: int = 32, return_chunks: bool = False):
+        """
+        :param texts: List of strings to score. 
+        :param batch_size: The maximum number of chunks passed to the model in a single forward pass. 
+        :param return_chunks: If the raw chunk output (see "score_chunks") should be returned as well. 
 
-            scores_dict["compound"] = self.calculate_compound_score(scores_dict, neutral_weight=neutral_weight)
-
-            return scores_dict
-        # If the text variable is of the datatype list. 
-        elif isinstance(text, list):
-            text_section_scores = []
-            for i in text:
-                encoded_text = self.tokenizer(i, return_tensors="pt") # Means it will return a "PyTorch" tensor. 
-                output = self.model(**encoded_text)
-                # Convert from a tensor to numpy. 
-                scores = output[0][0].detach().numpy()
-                # Apply softmax function. 
-                scores = softmax(scores)
-                scores_dict = {
-                    "neg": scores[0],
-                    "neu": scores[1],
-                    "pos": scores[2] 
-                }
-                text_section_scores.append(scores_dict)
-            # Variables to hold the sum of the text sections. 
-            section_neg_sum = 0
-            section_neu_sum = 0
-            section_pos_sum = 0
-
-            for score in text_section_scores:
-                section_neg_sum += score["neg"]
-                section_neu_sum += score["neu"]
-                section_pos_sum += score["pos"]
-                
-
-            # Variables to hold the averages of the text section. 
-            section_neg_avg = section_neg_sum / len(text_section_scores)
-            section_neu_avg = section_neu_sum / len(text_section_scores)
-            section_pos_avg = section_pos_sum / len(text_section_scores)
-            
-
-            average_section_score = {
-                "neg": section_neg_avg,
-                "neu": section_neu_avg,
-                "pos": section_pos_avg
-            }
-            average_section_score["compound"] = self.calculate_compound_score(score=average_section_score, neutral_weight=neutral_weight)
-            return average_section_score
+        :returns: Numpy array of shape (len(texts), 3) holding the neg/neu/pos probabilities of each text. If "return_chunks" 
+                  is True, a tuple of (scores, chunks). 
+
+        Description: The chunk scores of each text are averaged back into one score per text, weighted by the number of tokens
+                     in each chunk. This skips the cache. 
+        """
+        chunks = self.score_chunks(texts, batch_size=batch_size)
+        text_scores = aggregate_chunk_scores(chunks["owners"], chunks["lengths"], softmax_rows(chunks["logits"]), text_count=len(texts))
+        if return_chunks:
+            return text_scores, chunks
+        return text_scores
+    '''-----------------------------------'''
+    def score_chunks(self, texts: list, batch_size: int = 32) -> dict:
+        """
+        :param texts: List of strings to score. 
+        :param batch_size: The maximum number of chunks passed to the model in a single forward pass. 
+
+        :returns: Dictionary of numpy arrays with a row per chunk: "owners" (index of the text), "offsets" (token offset of the
+                  chunk within its text), "lengths" (tokens in the chunk) and "logits" (raw model output, shape (chunks, 3)). 
+
+        Description: Every text is tokenized and packed into full token windows (see "split_tokens"). The chunks of all the texts
+                     are sorted into length buckets, padded, and run through the model together. 
+        """
+        # Split every text into token chunks, and remember which text each chunk belongs to. 
+        chunks = []
+        chunk_owners = []
+        chunk_offsets = []
+        stride = self.max_tokens - self.tokenizer.num_special_tokens_to_add(pair=False) - self.chunk_overlap
+        with metrics.timer("model.tokenize"):
+            for index, text in enumerate(texts):
+                text_chunks = self.split_tokens(text)
+                chunks.extend(text_chunks)
+                chunk_owners.extend([index] * len(text_chunks))
+                chunk_offsets.extend([i * stride for i in range(len(text_chunks))])
+
+        chunk_lengths = [len(chunk) for chunk in chunks]
+        special_tokens = self.tokenizer.num_special_tokens_to_add(pair=False)
+        batches = bucket_batches([length + special_tokens for length in chunk_lengths], 
+                                 max_batch_tokens=self.max_batch_tokens, max_batch_size=batch_size)
+        metrics.count("model.chunks", len(chunks))
+        metrics.count("model.tokens", sum(chunk_lengths))
+
+        backend = self.backend
+        chunk_logits = np.zeros((len(chunks), 3), dtype=np.float32)
+        for batch_indexes in batches:
+            input_ids = [self.tokenizer.build_inputs_with_special_tokens(chunks[i]) for i in batch_indexes]
+            encoded_text = self.tokenizer.pad({"input_ids": input_ids}, return_tensors="np")
+            metrics.observe("model.batch_size", len(batch_indexes))
+            metrics.observe("model.batch_padded_tokens", encoded_text["input_ids"].size)
+            with metrics.timer("model.forward"):
+                chunk_logits[batch_indexes] = backend.predict_logits(encoded_text["input_ids"], encoded_text["attention_mask"])
+
+        return {
+            "owners": np.array(chunk_owners, dtype=np.int64),
+            "offsets": np.array(chunk_offsets, dtype=np.int64),
+            "lengths": np.array(chunk_lengths, dtype=np.int64),
+            "logits": chunk_logits
+        }
+    '''-----------------------------------'''
+    def cache_key(self, text: str) -> str:
+        """
+        :param text: The text to create a cache key for. 
+        :returns: The score cache key for the text, under this model and chunking setup. 
+        """
+        # Faster backends score slightly differently from the reference, so they get their own cache entries. 
+        if self.backend_name == "torch":
+            model_key = self.model_name
+        else:
+            model_key = f"{self.model_name}:{self.backend_name}"
+        return ScoreCache.make_key(model_key, text, (self.max_tokens, self.chunk_overlap))
+    '''-----------------------------------'''
+    def split_tokens(self, text: str) -> list:
+        """
+        :param text: The string of text to split. 
+        :returns: A list of token id lists. Each chunk fits the model's input layer once the special tokens are added. 
+        """
+        token_ids = self.tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"]
+        window = self.max_tokens - self.tokenizer.num_special_tokens_to_add(pair=False)
+        return chunk_token_ids(token_ids, window=window, overlap=self.chunk_overlap)
     '''-----------------------------------'''
     def calculate_compound_score(self, score: dict, neutral_weight: int = neutral_weight_default):
         """
@@ -93,25 +239,9 @@ class SentimentModel:
         Description: This function will take the 3 values from the sentiment score, and create a single-value compound score.
         """ 
 
-        # Logic for weight.
-        weighing = 0  
-        if neutral_weight >= 5:
-            weighing = 1
-        elif neutral_weight == 4:
-            weighing = 2
-        elif neutral_weight == 3:
-            weighing = 3
-        elif neutral_weight == 2:
-            weighing = 4
-        elif neutral_weight == 1:
-            weighing = 5
-
-        # First we divide the "neu" (neutral) field by 2, to decrease it's weighing.
-        try:
-            neu_formatted = score["neu"] / weighing
-        # If "neu" is already 0. 
-        except ZeroDivisionError:
-            neu_formatted = 0
+        # A divisor of 0 leaves the neutral score out. 
+        divisor = neutral_divisor(neutral_weight)
+        neu_formatted = score["neu"] / divisor if divisor != 0 else 0
 
         # Get the sum of the positive and negative values. 
         score_sum = score["pos"] + neu_formatted
@@ -140,47 +270,24 @@ class SentimentModel:
             return f"Positive: {score['pos']}\nNeutral: {score['neu']}\nNegative: {score['neg']}\nCompound: {score['compound']}"
 
     '''-----------------------------------'''
-    def split_text(self, text: str) -> list:
-        """
-        :param text: The string of text to split. 
-        :returns: A list containing separate sections of the text. Each sections size is determined by "max_section_size". 
-        """ 
-        text_sections = []
-        for i in range(0, len(text), self.max_section_size):
-                            section = text[i:i+self.max_section_size]
-                            text_sections.append(section)
-        
-        return text_sections
-    '''-----------------------------------'''
-    def merge_price_sentiment(self, articles_df: pd.DataFrame, price_df: pd.DataFrame):
+    def merge_price_sentiment(self, articles_df: pd.DataFrame, price_df: pd.DataFrame, aggregate: bool = True):
         """
         :param articles_df: A dataframe full of articles. *Should* have sentiment data included. 
         :param price_df: A dataframe with closing and volume data for an asset. 
+        :param aggregate: If True, there is one row per trading day, with the mean sentiment of its articles and "articleCount". 
+                          If False, there is one row per article. 
 
         :returns: A merged dataframe with price and sentiment data. As well as data related to the article. 
 
-        Description: This function takes an article dataframe(df) and price dataframe(df). It will then use publishing dates
-                     from the article df and search for the closing prices on those days. As noted, the articles df should also include
-                     sentiment data. Refer to "get_articles_sentiment" on how to get articles with sentiment data. 
+        Description: This function takes an article dataframe(df) and price dataframe(df). Each article is matched to the first
+                     trading session it could affect: articles published after the close, on weekends or on holidays count
+                     towards the next trading day. As noted, the articles df should also include sentiment data. Refer to 
+                     "get_articles_sentiment" on how to get articles with sentiment data. Neither dataframe is modified. 
         
         """
+        from Analysis.merge import merge_sentiment_asof
 
-
-        # List to hold data points where an article is published on a trading day. 
-        data_points = []
-
-
-
-        # Convert to datetime. 
-        articles_df["publishDate"] = pd.to_datetime(articles_df["publishDate"])
-        price_df["Date"] = pd.to_datetime(price_df["Date"])
-
-
-        #date_search = price_df.loc[price_df['Date'] == '2016-09-19']
-
-        merged_df = pd.merge(articles_df, price_df, left_on="publishDate", right_on="Date", how="inner")
-
-        return merged_df
+        return merge_sentiment_asof(articles_df, price_df, aggregate=aggregate)
     '''-----------------------------------'''
     def is_ascending(self, df: pd.DataFrame, column: str = "Date", date_sort: bool = True) -> bool:
         """
@@ -200,4 +307,66 @@ class SentimentModel:
         else:
             return False
 
-    
\ No newline at end of file
+
+
+'''-----------------------------------'''
+def neutral_divisor(neutral_weight: int = SentimentModel.neutral_weight_default) -> int:
+    """
+    :param neutral_weight: The neutral weight, as passed to "calculate_compound_score". 
+    :returns: The number the neutral score is divided by. 0 means the neutral score is left out. 
+    """
+    if neutral_weight >= 5:
+        return 1
+    elif neutral_weight == 4:
+        return 2
+    elif neutral_weight == 3:
+        return 3
+    elif neutral_weight == 2:
+        return 4
+    elif neutral_weight == 1:
+        return 5
+    return 0
+
+'''-----------------------------------'''
+def compound_scores(scores, neutral_weight: int = SentimentModel.neutral_weight_default) -> np.ndarray:
+    """
+    :param scores: The neg/neu/pos scores of many texts. Either an array of shape (N, 3) in neg/neu/pos order, or a dataframe
+                   with "neg", "neu" and "pos" columns. 
+    :param neutral_weight: Controls how much to include the neutral score into the compound score. Same as "calculate_compound_score". 
+
+    :returns: Numpy array of shape (N,) with the compound score of each text. 
+
+    Description: Vectorized version of "calculate_compound_score", so a whole dataset is scored in one call. 
+    """
+    if isinstance(scores, pd.DataFrame):
+        scores = scores[["neg", "neu", "pos"]]
+    scores = np.asarray(scores, dtype=np.float64).reshape(-1, 3)
+
+    divisor = neutral_divisor(neutral_weight)
+    # A divisor of 0 leaves the neutral score out. 
+    if divisor == 0:
+        neu_formatted = np.zeros(len(scores))
+    else:
+        neu_formatted = scores[:, 1] / divisor
+
+    # Keep the score within the -1 to 1 range, the same way "calculate_compound_score" does. 
+    score_sum = np.minimum(scores[:, 2] + neu_formatted, 1)
+    return np.maximum(score_sum - scores[:, 0], -1)
+
+'''-----------------------------------'''
+def rescore_compound(sentiment_df: pd.DataFrame, neutral_weight: int = SentimentModel.neutral_weight_default) -> pd.DataFrame:
+    """
+    :param sentiment_df: Dataframe of article sentiment, as returned by "get_articles_sentiment". 
+    :param neutral_weight: The neutral weight to recompute the compound scores with. 
+
+    :returns: A copy of the dataframe with "titleComp" and "bodyComp" recomputed from the stored neg/neu/pos columns. 
+
+    Description: Changing the neutral weight does not need the model, so this re-weights a stored dataset without re-running it. 
+    """
+    rescored_df = sentiment_df.copy()
+    for prefix in ["title", "body"]:
+        columns = [f"{prefix}Neg", f"{prefix}Neu", f"{prefix}Pos"]
+        if all(column in rescored_df.columns for column in columns):
+            compound = compound_scores(rescored_df[columns].to_numpy(), neutral_weight=neutral_weight)
+            rescored_df[f"{prefix}Comp"] = compound.astype(rescored_df[columns[0]].dtype, copy=False)
+    return rescored_df
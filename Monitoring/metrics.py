@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import logging
+import functools
+import threading
+import contextlib
+from collections import deque
+
+import numpy as np
+
+
+# Logger the metrics snapshots are written to, one JSON object per line.
+logger = logging.getLogger("sentiment.metrics")
+
+# The number of most recent samples kept per metric for the percentiles. Counts, totals and maximums cover every sample.
+sample_size = 4096
+
+# Returned by "timer" while metrics are disabled, so a disabled timer costs one attribute check.
+null_timer = contextlib.nullcontext()
+
+
+class Metric:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=sample_size)
+    '''-----------------------------------'''
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.samples.append(value)
+    '''-----------------------------------'''
+    def summary(self) -> dict:
+        samples = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": float(np.percentile(samples, 50)) if len(samples) else 0.0,
+            "p95": float(np.percentile(samples, 95)) if len(samples) else 0.0,
+            "max": self.max
+        }
+
+
+class MetricsRegistry:
+    """
+    Process-wide timers, distributions and counters. Every recording method returns straight away while disabled.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.counters = {}
+    '''-----------------------------------'''
+    def timer(self, name: str):
+        """
+        :param name: The stage being timed, e.g. "model.forward".
+        :returns: Context manager recording the wall time of its block, in seconds.
+        """
+        if not self.enabled:
+            return null_timer
+        return self.timed_block(name)
+    '''-----------------------------------'''
+    @contextlib.contextmanager
+    def timed_block(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+    '''-----------------------------------'''
+    def observe(self, name: str, value: float):
+        """
+        Records one sample of a distribution (a latency in seconds, a batch size, ...).
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = Metric()
+            metric.add(float(value))
+    '''-----------------------------------'''
+    def count(self, name: str, value: int = 1):
+        """
+        Adds to a counter (calls, bytes, tokens, cache hits, ...).
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    '''-----------------------------------'''
+    def snapshot(self) -> dict:
+        """
+        :returns: Dictionary of {"timers": {name: count/total/mean/p50/p95/max}, "counters": {name: value}}.
+        """
+        with self.lock:
+            return {
+                "timers": {name: metric.summary() for name, metric in sorted(self.metrics.items())},
+                "counters": dict(sorted(self.counters.items()))
+            }
+    '''-----------------------------------'''
+    def reset(self):
+        with self.lock:
+            self.metrics = {}
+            self.counters = {}
+
+
+# Shared by the whole process. Set the SENTIMENT_METRICS environment variable to "1" to record from the start.
+metrics = MetricsRegistry(enabled=os.environ.get("SENTIMENT_METRICS", "") == "1")
+
+
+'''-----------------------------------'''
+def enable_metrics(reset: bool = True):
+    if reset:
+        metrics.reset()
+    metrics.enabled = True
+
+'''-----------------------------------'''
+def disable_metrics():
+    metrics.enabled = False
+
+'''-----------------------------------'''
+def timed(name: str):
+    """
+    :param name: The stage being timed.
+    :returns: Decorator recording the wall time of every call of the function. Calls straight through while disabled.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            with metrics.timed_block(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+'''-----------------------------------'''
+def log_snapshot(label: str = "", reset: bool = False) -> dict:
+    """
+    :param label: Written with the snapshot, e.g. the ticker that was refreshed.
+    :param reset: If True, the metrics start over after the snapshot.
+
+    :returns: The snapshot. It is also written to the "sentiment.metrics" logger as one JSON line.
+    """
+    snapshot = metrics.snapshot()
+    logger.info(json.dumps({"label": label, "time": time.time(), **snapshot}))
+    if reset:
+        metrics.reset()
+    return snapshot
+
+'''-----------------------------------'''
+def print_snapshot(snapshot: dict = None):
+    """
+    Prints a table of the timers and counters, slowest stages first.
+    """
+    snapshot = snapshot if snapshot is not None else metrics.snapshot()
+    timers = sorted(snapshot["timers"].items(), key=lambda item: item[1]["total"], reverse=True)
+    print(f"{'[Metrics] Stage':<32}{'count':>8}{'total':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+    for name, summary in timers:
+        print(f"{name:<32}{summary['count']:>8}{summary['total']:>10.3f}{summary['p50']:>10.4f}{summary['p95']:>10.4f}{summary['max']:>10.4f}")
+    for name, value in snapshot["counters"].items():
+        print(f"{name:<32}{value:>8}")
+
+'''-----------------------------------'''
+@contextlib.contextmanager
+def profile(output_path: str = "", top: int = 30):
+    """
+    :param output_path: File to dump the cProfile stats to (open with pstats or snakeviz). The top functions are printed if empty.
+    :param top: The number of functions printed, sorted by cumulative time.
+
+    Description: Opt-in deep dive around a block of code. For a running process, py-spy can attach instead
+                 ("py-spy record --pid <pid>"); the worker threads are named after their stage so its output is readable.
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if output_path != "":
+            profiler.dump_stats(output_path)
+            print(f"[Metrics] Profile written to {output_path}")
+        else:
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
@@ -0,0 +1,171 @@
+import time
+import argparse
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+# Import scrapers
+from Scrapers.googlenews import GoogleNewsScraper
+from Scrapers.fetcher import ArticleFetcher
+from Scrapers.http_cache import get_http_cache
+
+# Instrumentation
+from Monitoring.metrics import enable_metrics, log_snapshot, print_snapshot, profile
+
+
+# The scraper of a scoring worker process. Created once per process, so the model is only loaded once per worker.
+worker_scraper = None
+
+
+'''-----------------------------------'''
+def load_watchlist(file_path: str) -> list:
+    """
+    :param file_path: Path to a text file with one ticker per line. Blank lines and lines starting with "#" are ignored.
+    :returns: List of the tickers in the file, upper case and without duplicates.
+    """
+    tickers = []
+    with open(file_path, "r") as file:
+        for line in file:
+            ticker = line.split("#")[0].strip().upper()
+            if ticker != "" and ticker not in tickers:
+                tickers.append(ticker)
+    return tickers
+
+'''-----------------------------------'''
+def init_score_worker(storage):
+    global worker_scraper
+    worker_scraper = GoogleNewsScraper(storage=storage)
+
+'''-----------------------------------'''
+def score_in_worker(ticker: str) -> int:
+    return len(worker_scraper.update_articles_sentiment(ticker))
+
+
+class JobRunner:
+    def __init__(self, fetch_workers: int = 8, score_workers: int = 0, time_frame: str = "1y", storage=None):
+        """
+        :param fetch_workers: The number of tickers whose articles are fetched at the same time.
+        :param score_workers: The number of processes scoring articles, each with its own copy of the model. If 0, every
+                              ticker is scored in this process by one shared model.
+        :param time_frame: How far back to search for tickers that have never been collected before.
+        :param storage: Where the datasets are stored (see Storage.datasets). Defaults to the CSV files.
+        """
+        self.fetch_workers = fetch_workers
+        self.score_workers = score_workers
+        self.time_frame = time_frame
+        self.storage = storage
+        self.progress_lock = threading.Lock()
+    '''-----------------------------------'''
+    def run(self, tickers: list) -> list:
+        """
+        :param tickers: The tickers (or search terms) to refresh.
+
+        :returns: A list with a report per ticker: {"ticker", "status", "newArticles", "scoredArticles", "fetchSeconds",
+                  "scoreSeconds", "error"}. "status" is "ok", "fetch failed" or "score failed".
+
+        Description: Fetches the new articles of the tickers concurrently. As soon as a ticker's articles are stored, the
+                     ticker is handed to the scoring stage, so scoring overlaps with the fetches still running.
+        """
+        reports = {ticker: {"ticker": ticker, "status": "pending", "newArticles": 0, "scoredArticles": 0,
+                            "fetchSeconds": 0.0, "scoreSeconds": 0.0, "error": ""} for ticker in tickers}
+        completed = [0]
+        start = time.time()
+
+        # One fetcher for every ticker, so the tickers share its connection pools, per host limits and parse processes.
+        fetcher = ArticleFetcher(cache=get_http_cache())
+
+        if self.score_workers > 0:
+            score_pool = ProcessPoolExecutor(max_workers=self.score_workers, initializer=init_score_worker, initargs=(self.storage,))
+            shared_scraper = None
+        else:
+            score_pool = None
+            shared_scraper = GoogleNewsScraper(storage=self.storage, fetcher=fetcher)
+
+        def report_progress(ticker):
+            with self.progress_lock:
+                completed[0] += 1
+                report = reports[ticker]
+                print(f"[Jobs] ({completed[0]}/{len(tickers)}) {ticker}: {report['status']} - {report['newArticles']} new, "
+                      f"{report['scoredArticles']} scored, fetch {report['fetchSeconds']:.1f}s, score {report['scoreSeconds']:.1f}s "
+                      f"{report['error']}")
+
+        def score(ticker):
+            report = reports[ticker]
+            score_start = time.time()
+            try:
+                if shared_scraper is not None:
+                    report["scoredArticles"] = len(shared_scraper.update_articles_sentiment(ticker))
+                else:
+                    report["scoredArticles"] = score_pool.submit(score_in_worker, ticker).result()
+                report["status"] = "ok"
+            except Exception as error:
+                report["status"] = "score failed"
+                report["error"] = repr(error)
+            report["scoreSeconds"] = time.time() - score_start
+            report_progress(ticker)
+
+        def fetch(ticker):
+            report = reports[ticker]
+            fetch_start = time.time()
+            try:
+                # The model is only loaded when a scraper scores something, so these scrapers never load one.
+                scraper = GoogleNewsScraper(storage=self.storage, fetcher=fetcher)
+                report["newArticles"] = len(scraper.update_articles(ticker, time_frame=self.time_frame))
+            except Exception as error:
+                report["status"] = "fetch failed"
+                report["error"] = repr(error)
+                report["fetchSeconds"] = time.time() - fetch_start
+                report_progress(ticker)
+                return None
+            report["fetchSeconds"] = time.time() - fetch_start
+            return ticker
+
+        # With a shared model, a single thread scores, so the model runs one batch at a time and can use every core for it.
+        score_threads = ThreadPoolExecutor(max_workers=max(self.score_workers, 1))
+        try:
+            with ThreadPoolExecutor(max_workers=self.fetch_workers) as fetch_pool:
+                fetch_futures = [fetch_pool.submit(fetch, ticker) for ticker in tickers]
+                score_futures = []
+                for future in as_completed(fetch_futures):
+                    ticker = future.result()
+                    if ticker is not None:
+                        score_futures.append(score_threads.submit(score, ticker))
+                for future in score_futures:
+                    future.result()
+        finally:
+            score_threads.shutdown(wait=True)
+            if score_pool is not None:
+                score_pool.shutdown(wait=True)
+            fetcher.close()
+
+        elapse = time.time() - start
+        failed = [report for report in reports.values() if report["status"] != "ok"]
+        print(f"[Jobs] Finished {len(tickers)} tickers in {elapse:.1f}s. {len(failed)} failed.")
+        return list(reports.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the Google News articles and sentiment of many tickers.")
+    parser.add_argument("tickers", nargs="*", help="Tickers to refresh.")
+    parser.add_argument("--watchlist", default="", help="Path to a file with one ticker per line.")
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--score-workers", type=int, default=0)
+    parser.add_argument("--time-frame", default="1y")
+    parser.add_argument("--metrics", action="store_true", help="Record per-stage timings and counters, and print them at the end.")
+    parser.add_argument("--profile", default="", help="File to write a cProfile of the run to.")
+    args = parser.parse_args()
+
+    tickers = [ticker.upper() for ticker in args.tickers]
+    if args.watchlist != "":
+        tickers += [ticker for ticker in load_watchlist(args.watchlist) if ticker not in tickers]
+
+    if args.metrics:
+        enable_metrics()
+
+    runner = JobRunner(fetch_workers=args.fetch_workers, score_workers=args.score_workers, time_frame=args.time_frame)
+    with profile(args.profile) if args.profile != "" else contextlib.nullcontext():
+        runner.run(tickers)
+
+    if args.metrics:
+        # Scoring worker processes keep their own metrics, so only the stages run in this process are included.
+        print_snapshot(log_snapshot(label="jobs"))
@@ -0,0 +1,240 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Import scoring
+from Scrapers.scoring import score_article_rows
+
+# Import sentitment model.
+from Models.registry import get_sentiment_model
+
+# Import storage.
+from Storage.datasets import CsvStorage
+
+# Instrumentation
+from Monitoring.metrics import metrics
+
+
+# Marks the end of a source's output.
+end_of_stream = object()
+
+
+class SourceLane:
+    def __init__(self, source, queries: list, queue_size: int):
+        """
+        Description: The state of one source during a run: its queries, the rows it has fetched and not yet scored, the
+                     urls it already has per query, and its stats.
+        """
+        self.source = source
+        self.queries = queries
+        self.rows = queue.Queue(maxsize=queue_size)
+        self.known_urls = {}
+        self.stats = {"items": 0, "rows": 0, "failures": 0, "errors": []}
+        self.stats_lock = threading.Lock()
+
+
+class SourceScheduler:
+    def __init__(self, storage=None, sentiment_model=None, batch_size: int = 64, queue_size: int = 256,
+                 flush_interval: float = 5, use_score_cache: bool = True):
+        """
+        :param storage: Where the datasets of every source are stored (see Storage.datasets). Defaults to the CSV files.
+        :param sentiment_model: A SentimentModel to score with. The model shared by the whole process is used if not passed.
+        :param batch_size: The number of rows, from every source together, scored and written at a time.
+        :param queue_size: The number of fetched rows each source can buffer before its fetches wait on the scorer.
+        :param flush_interval: Seconds to wait for a batch to fill before scoring what has arrived so far.
+
+        Description: Runs several sources (see Pipeline.sources) at once and fans their rows into one scoring loop. Each
+                     source lists and fetches on its own threads, capped by its "max_concurrency" and paced by its own
+                     token bucket, so the total rate approaches the sum of the sources' limits. The scorer takes one row
+                     from each source in turn, so a source with a large backlog cannot crowd a slow one out of the batches,
+                     and a source that is behind only ever blocks its own fetches.
+        """
+        self.storage = storage if storage is not None else CsvStorage()
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.use_score_cache = use_score_cache
+        self._sentiment_model = sentiment_model
+        self.lanes = []
+        # Set if scoring fails, so the sources stop listing and fetching while the scorer drains them.
+        self.stopping = threading.Event()
+    '''-----------------------------------'''
+    @property
+    def sentiment_model(self):
+        if self._sentiment_model is None:
+            self._sentiment_model = get_sentiment_model(use_score_cache=self.use_score_cache)
+        return self._sentiment_model
+    '''-----------------------------------'''
+    def add_source(self, source, queries: list):
+        """
+        :param source: A Source (see Pipeline.sources).
+        :param queries: The queries (search terms, subreddits, ...) to collect from the source. Each query is stored as the
+                        "ticker" of the source's datasets.
+        """
+        self.lanes.append(SourceLane(source, list(queries), self.queue_size))
+    '''-----------------------------------'''
+    def run(self) -> dict:
+        """
+        :returns: Dictionary of {source name: {"items", "rows", "failures", "errors"}}. "rows" is the number of new rows
+                  stored, "failures" the number of items that could not be fetched, and "errors" the queries that could
+                  not be listed.
+        """
+        # Released once per row (or end of stream) put on any lane, so the scorer can wait on every lane at once.
+        ready = threading.Semaphore(0)
+        self.stopping.clear()
+
+        producers = []
+        for lane in self.lanes:
+            producer = threading.Thread(target=self.produce, args=(lane, ready), name=f"source-{lane.source.name}", daemon=True)
+            producer.start()
+            producers.append(producer)
+
+        self.score_loop(ready)
+
+        for producer in producers:
+            producer.join()
+
+        stats = {}
+        for lane in self.lanes:
+            stats[lane.source.name] = lane.stats
+            print(f"[Scheduler] {lane.source.name}: {lane.stats['rows']} new rows stored from {lane.stats['items']} items "
+                  f"({lane.stats['failures']} failed).")
+        return stats
+    '''-----------------------------------'''
+    def produce(self, lane: SourceLane, ready: threading.Semaphore):
+        source = lane.source
+
+        def put(message):
+            # Blocks while the scorer is behind on this source only.
+            lane.rows.put(message)
+            ready.release()
+
+        def fetch(query, item):
+            try:
+                if not self.stopping.is_set():
+                    for row in source.fetch_item(item):
+                        put((query, row))
+            except Exception:
+                with lane.stats_lock:
+                    lane.stats["failures"] += 1
+                metrics.count(f"scheduler.{source.name}.failures")
+            finally:
+                in_flight.release()
+
+        # Items are listed ahead of the fetches by at most this many, so a long listing is not held in memory.
+        in_flight = threading.BoundedSemaphore(source.max_concurrency * 2)
+        try:
+            with ThreadPoolExecutor(max_workers=source.max_concurrency, thread_name_prefix=f"fetch-{source.name}") as pool:
+                for query in lane.queries:
+                    if self.stopping.is_set():
+                        break
+                    lane.known_urls[query] = set()
+                    try:
+                        if self.storage.exists(source.headlines_dataset, query):
+                            stored = self.storage.read(source.headlines_dataset, query, columns=["url"])
+                            lane.known_urls[query].update(stored["url"])
+
+                        for item in source.list_items(query):
+                            if self.stopping.is_set():
+                                break
+                            url = source.item_url(item)
+                            if url != "" and url in lane.known_urls[query]:
+                                continue
+                            lane.stats["items"] += 1
+                            metrics.count(f"scheduler.{source.name}.items")
+                            in_flight.acquire()
+                            pool.submit(fetch, query, item)
+                    except Exception as error:
+                        lane.stats["errors"].append(f"{query}: {error}")
+                        print(f"[Scheduler] {source.name}: could not list '{query}' ({error}).")
+        finally:
+            put(end_of_stream)
+    '''-----------------------------------'''
+    def score_loop(self, ready: threading.Semaphore):
+        # Rows waiting to be scored, per (lane, query).
+        pending = {}
+        pending_rows = 0
+        active = len(self.lanes)
+        cursor = 0
+
+        try:
+            while active > 0:
+                received = ready.acquire(timeout=self.flush_interval)
+                if received:
+                    # Round robin over the lanes, starting after the lane that was served last.
+                    for offset in range(len(self.lanes)):
+                        position = (cursor + offset) % len(self.lanes)
+                        try:
+                            message = self.lanes[position].rows.get_nowait()
+                        except queue.Empty:
+                            continue
+                        cursor = position + 1
+                        break
+
+                    lane = self.lanes[position]
+                    if message is end_of_stream:
+                        active -= 1
+                    else:
+                        query, row = message
+                        known_urls = lane.known_urls[query]
+                        # Rows already stored, or repeated within the run (e.g. a comment of a post listed twice), are skipped.
+                        if row["url"] not in known_urls:
+                            known_urls.add(row["url"])
+                            pending.setdefault((position, query), []).append(row)
+                            pending_rows += 1
+
+                # Score when the batch is full, every source has gone quiet, or every source has finished.
+                if pending_rows > 0 and (pending_rows >= self.batch_size or not received or active == 0):
+                    self.store_batch(pending)
+                    pending = {}
+                    pending_rows = 0
+        except BaseException:
+            # Stop the sources and drain their lanes, so no fetch is left blocked on a full queue.
+            self.stopping.set()
+            while active > 0:
+                ready.acquire()
+                for lane in self.lanes:
+                    try:
+                        message = lane.rows.get_nowait()
+                    except queue.Empty:
+                        continue
+                    if message is end_of_stream:
+                        active -= 1
+                    break
+            raise
+    '''-----------------------------------'''
+    def store_batch(self, pending: dict):
+        """
+        :param pending: Dictionary of {(lane position, query): rows}.
+
+        Description: The rows of every source are scored in one call, so the model sees full batches even when each source
+                     only delivers a few rows, and the scores are then split back and appended per source and query.
+        """
+        groups = []
+        for (position, query), rows in pending.items():
+            lane = self.lanes[position]
+            groups.append((lane, query, lane.source.prepare(pd.DataFrame(rows))))
+
+        extra_columns = []
+        for lane, _, _ in groups:
+            extra_columns += [column for column in lane.source.extra_columns if column not in extra_columns]
+        rows_df = pd.concat([group_df for _, _, group_df in groups], ignore_index=True)
+
+        with metrics.timer("scheduler.score"):
+            sentiment_df = score_article_rows(self.sentiment_model, rows_df, extra_columns=extra_columns)
+        optional_columns = set(extra_columns + ["clusterId", "bodyStatus"])
+
+        start = 0
+        for lane, query, group_df in groups:
+            stop = start + len(group_df)
+            columns = [column for column in sentiment_df.columns if column not in optional_columns or column in group_df.columns]
+            group_sentiment = sentiment_df.iloc[start:stop][columns].reset_index(drop=True)
+            start = stop
+
+            self.storage.append(lane.source.headlines_dataset, query, group_df)
+            self.storage.append(lane.source.sentiment_dataset, query, group_sentiment)
+            lane.source.stored(query, group_df)
+            lane.stats["rows"] += len(group_df)
+            metrics.count(f"scheduler.{lane.source.name}.rows", len(group_df))
@@ -0,0 +1,189 @@
+import pandas as pd
+
+# Import rate limiting
+from Scrapers.rate_limit import TokenBucket
+
+# Import scrapers
+from Scrapers.googlenews import GoogleNewsScraper
+from Scrapers.reddit import RedditScraper, post_columns
+from Scrapers.twitter import TwitterScraper, tweet_columns
+
+# Import articles related
+from Scrapers.fetcher import build_article_data, parse_article
+from Scrapers.dedup import assign_clusters, dedupe_entries
+
+# Instrumentation
+from Monitoring.metrics import metrics
+
+
+class Source:
+    """
+    Description: Adapter between a site and the SourceScheduler (see Pipeline.scheduler). A source only knows how to list the
+                 items of a query and how to fetch the rows of one item. Scoring, de-duplication against what is already
+                 stored and writing are done by the scheduler, for every source alike.
+    """
+    # Name of the source in the scheduler's stats and the metrics.
+    name = ""
+    # The datasets (see Storage.datasets) the rows and their scores are appended to, under the query.
+    headlines_dataset = ""
+    sentiment_dataset = ""
+    # Columns of the rows that are carried over to the sentiment rows.
+    extra_columns = []
+
+    def __init__(self, rate: float, capacity: float = 1, max_concurrency: int = 1):
+        """
+        :param rate: The number of requests per second the source may make, on average.
+        :param capacity: The number of requests that may be made back to back after the source has been idle.
+        :param max_concurrency: The number of items of the source fetched at the same time.
+        """
+        self.bucket = TokenBucket(rate=rate, capacity=capacity)
+        self.max_concurrency = max_concurrency
+    '''-----------------------------------'''
+    def list_items(self, query: str):
+        """
+        :param query: The search term, subreddit, ... to list.
+        :returns: Iterable of the items of the query. An item is whatever "fetch_item" needs.
+        """
+        raise NotImplementedError
+    '''-----------------------------------'''
+    def fetch_item(self, item):
+        """
+        :param item: One of the items returned by "list_items".
+        :returns: Iterable of rows (dictionaries in the format of the headlines file) for the item. Empty if it failed.
+        """
+        raise NotImplementedError
+    '''-----------------------------------'''
+    def item_url(self, item) -> str:
+        """
+        :returns: The url of the item's row, if it is known before fetching. Items already stored are then not fetched.
+        """
+        return ""
+    '''-----------------------------------'''
+    def prepare(self, rows_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        :returns: The rows of a batch, as they are stored. Called by the scheduler before scoring.
+        """
+        return rows_df
+    '''-----------------------------------'''
+    def stored(self, query: str, rows_df: pd.DataFrame):
+        """
+        :param query: The query the rows were stored under.
+        :param rows_df: The rows that were just appended to the headlines dataset.
+
+        Description: Called by the scheduler after each batch is stored, for sources that keep state of their own between runs.
+        """
+        pass
+
+
+class GoogleNewsSource(Source):
+    name = "googlenews"
+    headlines_dataset = "headlines"
+    sentiment_dataset = "sentiment"
+
+    def __init__(self, scraper=None, time_frame: str = "1d", rate: float = 10, max_concurrency: int = 8):
+        """
+        :param scraper: The GoogleNewsScraper to search and download with. A new one is created if not passed.
+        :param time_frame: How far back each search goes.
+        :param rate: Article downloads (and searches) per second.
+        """
+        super().__init__(rate=rate, capacity=max_concurrency, max_concurrency=max_concurrency)
+        self.scraper = scraper if scraper is not None else GoogleNewsScraper()
+        self.time_frame = time_frame
+    '''-----------------------------------'''
+    def list_items(self, query: str):
+        self.bucket.acquire()
+        entries = self.scraper.search_entries(query, time_frame=self.time_frame)
+        # Republished copies of the same story are only downloaded once.
+        unique_entries, _ = dedupe_entries(entries)
+        return unique_entries
+    '''-----------------------------------'''
+    def fetch_item(self, entry: dict):
+        url = entry["link"]
+        self.bucket.acquire()
+        html = self.scraper.fetcher.download(url)
+        if html is None:
+            return []
+        with metrics.timer("fetch.parse"):
+            parsed = parse_article(url, html)
+        if parsed is None:
+            return []
+        text, summary = parsed
+        return [build_article_data(entry, text, summary)]
+    '''-----------------------------------'''
+    def item_url(self, entry: dict) -> str:
+        return entry["link"]
+    '''-----------------------------------'''
+    def prepare(self, rows_df: pd.DataFrame) -> pd.DataFrame:
+        rows_df = assign_clusters(rows_df)
+        rows_df["bodyStatus"] = "fetched"
+        return rows_df
+    '''-----------------------------------'''
+    def stored(self, query: str, rows_df: pd.DataFrame):
+        # Moves the scraper's refresh state forward, so "update_articles" does not search for (and fetch) these rows again.
+        state = self.scraper.get_refresh_state(query)
+        self.scraper.advance_refresh_state(query, state, rows_df)
+
+
+class RedditSource(Source):
+    name = "reddit"
+    headlines_dataset = "reddit"
+    sentiment_dataset = "reddit_sentiment"
+    extra_columns = post_columns
+
+    def __init__(self, scraper=None, limit: int = 25, include_comments: bool = True, max_comments: int = 0,
+                 time_filter: str = "day", requests_per_minute: float = 60, max_concurrency: int = 4):
+        """
+        :param scraper: The RedditScraper to read the api with. A new one is created if not passed.
+        :param limit: The number of posts listed per subreddit.
+        :param include_comments: If the comments of each post are fetched as well.
+        :param max_comments: The maximum number of comments per post. Every comment is fetched if 0.
+        """
+        rate = requests_per_minute / 60
+        super().__init__(rate=rate, capacity=max(1, rate * 5), max_concurrency=max_concurrency)
+        if scraper is None:
+            scraper = RedditScraper()
+        # Listings, comment trees and "load more" requests all draw from the budget of the source.
+        scraper.budget = self.bucket
+        self.scraper = scraper
+        self.limit = limit
+        self.include_comments = include_comments
+        self.max_comments = max_comments
+        self.time_filter = time_filter
+    '''-----------------------------------'''
+    def list_items(self, subreddit: str):
+        return self.scraper.iter_posts(subreddit, limit=self.limit, time_filter=self.time_filter)
+    '''-----------------------------------'''
+    def fetch_item(self, post: dict):
+        # Posts are not skipped by url, since a post that is already stored can have new comments.
+        yield post
+        if self.include_comments:
+            yield from self.scraper.iter_comments(post, max_comments=self.max_comments)
+
+
+class TwitterSource(Source):
+    name = "twitter"
+    headlines_dataset = "tweets"
+    sentiment_dataset = "tweet_sentiment"
+    extra_columns = tweet_columns
+
+    def __init__(self, scraper=None, limit: int = 100, requests_per_window: int = 450, window_seconds: float = 900):
+        """
+        :param scraper: The TwitterScraper to search with. A new one is created if not passed.
+        :param limit: The number of tweets listed per query.
+        """
+        super().__init__(rate=requests_per_window / window_seconds, capacity=5, max_concurrency=1)
+        if scraper is None:
+            scraper = TwitterScraper()
+        scraper.budget = self.bucket
+        self.scraper = scraper
+        self.limit = limit
+    '''-----------------------------------'''
+    def list_items(self, query: str):
+        return self.scraper.search_tweets(query, limit=self.limit)
+    '''-----------------------------------'''
+    def fetch_item(self, tweet: dict):
+        # The search returns the whole tweet, there is nothing left to fetch.
+        return [tweet]
+    '''-----------------------------------'''
+    def item_url(self, tweet: dict) -> str:
+        return tweet["url"]
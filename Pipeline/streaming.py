@@ -0,0 +1,179 @@
+import time
+import queue
+import threading
+
+import pandas as pd
+
+# Import scrapers
+from Scrapers.googlenews import GoogleNewsScraper
+from Scrapers.dedup import assign_clusters
+
+
+# Marks the end of a stage's output.
+end_of_stream = object()
+
+
+class StageError:
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+
+
+class SentimentPipeline:
+    def __init__(self, scraper: GoogleNewsScraper = None, batch_size: int = 32, queue_batches: int = 2, flush_interval: float = 30,
+                 join_timeout: float = 30):
+        """
+        :param scraper: The scraper used to search, download and score articles. A new one is created if not passed.
+        :param batch_size: The number of articles scored and written together.
+        :param queue_batches: How many batches each queue between the stages can hold before the stage feeding it has to wait.
+        :param flush_interval: Seconds to wait for a batch to fill before scoring what has arrived so far.
+        :param join_timeout: Seconds to wait for the fetch and score stages to stop after the write stage has failed.
+
+        Description: Streams articles from the search straight into scoring and then into the headlines and sentiment files.
+                     The stages run on their own threads and are connected by bounded queues, so downloads overlap with
+                     inference, memory is bounded by the batch size, and a crash loses at most the batch in flight.
+        """
+        self.scraper = scraper if scraper is not None else GoogleNewsScraper()
+        self.batch_size = batch_size
+        self.queue_batches = queue_batches
+        self.flush_interval = flush_interval
+        self.join_timeout = join_timeout
+    '''-----------------------------------'''
+    def run(self, search_term: str, exclude_term: str = "", time_frame: str = "1y") -> dict:
+        """
+        :param search_term: The search term to collect and score articles for.
+        :param exclude_term: Used to determine if an article should be excluded do to it containing a specific term.
+        :param time_frame: How far back to search if the search term has never been collected before.
+
+        :returns: Dictionary with the number of articles written ("articles") and batches written ("batches").
+
+        Description: Like "update_articles" followed by "update_articles_sentiment", only the window since the last refresh is
+                     searched and articles that are already stored are skipped.
+        """
+        state = self.scraper.get_refresh_state(search_term)
+        if state["lastPublishDate"] == "":
+            entries = self.scraper.search_entries(search_term, exclude_term=exclude_term, time_frame=time_frame)
+        else:
+            entries = self.scraper.search_entries(search_term, exclude_term=exclude_term, from_date=state["lastPublishDate"])
+
+        # Skip articles that are already stored, and articles repeated within this search.
+        known_urls = set(state["urls"])
+        new_entries = []
+        for entry in entries:
+            if entry["link"] not in known_urls:
+                known_urls.add(entry["link"])
+                new_entries.append(entry)
+
+        article_queue = queue.Queue(maxsize=self.batch_size * self.queue_batches)
+        write_queue = queue.Queue(maxsize=self.queue_batches)
+
+        stop = threading.Event()
+        fetch_thread = threading.Thread(target=self.fetch_stage, args=(new_entries, article_queue, stop), daemon=True)
+        score_thread = threading.Thread(target=self.score_stage, args=(article_queue, write_queue, stop), daemon=True)
+        fetch_thread.start()
+        score_thread.start()
+
+        try:
+            stats = self.write_stage(search_term, state, write_queue)
+        except BaseException:
+            # Tell the other stages to stop, and keep emptying the write queue so the score stage is never left blocked on it.
+            stop.set()
+            drain_queue(write_queue, timeout=self.join_timeout)
+            fetch_thread.join(timeout=self.join_timeout)
+            score_thread.join(timeout=self.join_timeout)
+            raise
+
+        fetch_thread.join()
+        score_thread.join()
+        return stats
+    '''-----------------------------------'''
+    def fetch_stage(self, entries: list, article_queue: queue.Queue, stop: threading.Event):
+        try:
+            for _, article_data in self.scraper.fetcher.iter_articles(entries):
+                if stop.is_set():
+                    break
+                # Blocks while the scoring stage is behind.
+                article_queue.put(article_data)
+        except BaseException as error:
+            article_queue.put(StageError("fetch", error))
+        article_queue.put(end_of_stream)
+    '''-----------------------------------'''
+    def score_stage(self, article_queue: queue.Queue, write_queue: queue.Queue, stop: threading.Event):
+        batch = []
+        finished = False
+        try:
+            while not finished:
+                try:
+                    item = article_queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = None
+
+                if item is end_of_stream:
+                    finished = True
+                elif isinstance(item, StageError):
+                    write_queue.put(item)
+                    # Keep draining, so the fetch stage is never left blocked on a full queue.
+                    continue
+                elif stop.is_set():
+                    # The write stage has failed, so nothing more is scored. Keep draining until the fetch stage stops.
+                    batch = []
+                    continue
+                elif item is not None:
+                    batch.append(item)
+
+                # Score when the batch is full, the source has gone quiet, or the source has finished.
+                if batch and not stop.is_set() and (len(batch) >= self.batch_size or item is None or finished):
+                    # Near-duplicates within the batch are scored once (see Scrapers.dedup).
+                    articles_df = assign_clusters(pd.DataFrame(batch))
+                    sentiment_df = self.scraper.score_articles(articles_df)
+                    write_queue.put((articles_df, sentiment_df))
+                    batch = []
+        except BaseException as error:
+            write_queue.put(StageError("score", error))
+            # Drain the rest of the articles so the fetch stage can finish.
+            while not finished:
+                finished = article_queue.get() is end_of_stream
+        write_queue.put(end_of_stream)
+    '''-----------------------------------'''
+    def write_stage(self, search_term: str, state: dict, write_queue: queue.Queue) -> dict:
+        stats = {"articles": 0, "batches": 0}
+        errors = []
+        while True:
+            item = write_queue.get()
+            if item is end_of_stream:
+                break
+            if isinstance(item, StageError):
+                errors.append(item)
+                continue
+
+            articles_df, sentiment_df = item
+            self.scraper.storage.append("headlines", search_term, articles_df)
+            self.scraper.storage.append("sentiment", search_term, sentiment_df)
+
+            # Save the high-water mark after every batch, so a crash only loses the batch in flight.
+            self.scraper.advance_refresh_state(search_term, state, articles_df)
+
+            stats["articles"] += len(articles_df)
+            stats["batches"] += 1
+            print(f"[Pipeline] {search_term}: wrote batch {stats['batches']} ({stats['articles']} articles so far).")
+
+        if errors:
+            raise RuntimeError(f"[Pipeline] {search_term}: {errors[0].stage} stage failed.") from errors[0].error
+        return stats
+
+
+'''-----------------------------------'''
+def drain_queue(stage_queue: queue.Queue, timeout: float):
+    """
+    :param stage_queue: The queue to empty.
+    :param timeout: Seconds to keep draining before giving up.
+
+    Description: Discards items until the stage feeding the queue has put its end of stream, or "timeout" has passed.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if stage_queue.get(timeout=min(1.0, max(deadline - time.monotonic(), 0.0))) is end_of_stream:
+                return
+        except queue.Empty:
+            continue
@@ -0,0 +1,215 @@
+import re
+import zlib
+import hashlib
+import datetime as dt
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+import numpy as np
+import pandas as pd
+
+
+# Query parameters that only track where a click came from. Urls that differ only in these point to the same page.
+tracking_parameters = {"fbclid", "gclid", "ocid", "cmpid", "ref", "smid", "guccounter", "mod", "taid", "src"}
+
+# Mersenne prime used by the MinHash permutations. Shingle hashes are 32 bit, so every product fits in 64 bits.
+minhash_prime = (1 << 61) - 1
+
+
+'''-----------------------------------'''
+def canonicalize_url(url: str) -> str:
+    """
+    :param url: The url of an article.
+
+    :returns: The url with the scheme, "www.", "amp" variants, tracking parameters, fragment and trailing slash removed, so
+              copies of the same page compare equal.
+    """
+    parsed = urlparse(str(url).strip())
+    host = parsed.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host.startswith("amp."):
+        host = host[4:]
+
+    path = re.sub(r"/amp/?$|\.amp$", "", parsed.path).rstrip("/")
+    query = [(key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+             if not key.lower().startswith("utm_") and key.lower() not in tracking_parameters]
+    return urlunparse(("", host, path, "", urlencode(sorted(query)), ""))
+
+'''-----------------------------------'''
+def normalize_title(title: str) -> str:
+    """
+    :param title: The title of a feed entry.
+
+    :returns: The title in lower case, without the " - Outlet" suffix Google News adds and without punctuation.
+    """
+    title = re.sub(r"\s+[-|]\s+[^-|]+$", "", str(title))
+    return " ".join(re.findall(r"[a-z0-9]+", title.lower()))
+
+'''-----------------------------------'''
+def cluster_id(url: str) -> str:
+    """
+    :returns: The id of the cluster whose representative has this url. Stable across runs.
+    """
+    return hashlib.sha1(canonicalize_url(url).encode("utf-8")).hexdigest()[:16]
+
+'''-----------------------------------'''
+def publish_day(entry: dict):
+    """
+    :returns: The date a feed entry was published on, or None if it has no (readable) "published" date.
+    """
+    try:
+        return parsedate_to_datetime(entry.get("published", "")).date()
+    except (TypeError, ValueError):
+        return None
+
+'''-----------------------------------'''
+def dedupe_entries(entries: list, title_window_days: int = 1) -> tuple:
+    """
+    :param entries: Feed entries (title, link, published), such as "search['entries']" from pygooglenews.
+    :param title_window_days: How many days apart two entries with the same title may be published and still be repeats.
+
+    :returns: Tuple of (unique_entries, duplicates). "duplicates" maps the position of every repeated entry in "entries" to
+              the position of the first entry it repeats. Only "unique_entries" need to be downloaded.
+
+    Description: Entries are repeats when their canonical url matches an earlier entry, or their normalized title does and
+                 they were published within "title_window_days" of each other. Wire stories republished by many outlets
+                 keep their headline, so they are caught before any download, while templated headlines ("XYZ stock
+                 rises") from different days are kept apart.
+    """
+    unique_entries = []
+    duplicates = {}
+    seen = {}
+    for position, entry in enumerate(entries):
+        keys = [("url", canonicalize_url(entry["link"]))]
+        title = normalize_title(entry.get("title", ""))
+        day = publish_day(entry)
+        # The title is only looked up around the entry's own day. Entries without a date only match each other.
+        if title != "" and day is None:
+            lookups = [("title", title, None)]
+        elif title != "":
+            lookups = [("title", title, day + dt.timedelta(days=offset)) for offset in range(-title_window_days, title_window_days + 1)]
+        else:
+            lookups = []
+
+        first = next((seen[key] for key in keys + lookups if key in seen), None)
+        if first is None:
+            seen[keys[0]] = position
+            if title != "":
+                seen[("title", title, day)] = position
+            unique_entries.append(entry)
+        else:
+            duplicates[position] = first
+    return unique_entries, duplicates
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 128, bands: int = 32, shingle_size: int = 5, seed: int = 1):
+        """
+        :param num_perm: The length of each MinHash signature.
+        :param bands: The number of LSH bands the signature is split into. Must divide "num_perm".
+        :param shingle_size: The number of words in each shingle.
+        :param seed: Seed of the hash permutations, so signatures are comparable across runs.
+
+        Description: With 32 bands of 4 rows, pairs with a Jaccard similarity of 0.8 share a band over 99.9% of the time, and
+                     pairs below 0.3 rarely do. Candidates are then checked against the threshold on the full signature.
+        """
+        if num_perm % bands != 0:
+            raise ValueError(f"[Dedup] The number of bands ({bands}) must divide the signature length ({num_perm}).")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        generator = np.random.default_rng(seed)
+        self.a = generator.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = generator.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+    '''-----------------------------------'''
+    def shingles(self, text: str) -> np.ndarray:
+        """
+        :returns: Array of the 32 bit hashes of the word shingles of the text. Empty if the text is shorter than one shingle.
+        """
+        words = re.findall(r"\w+", str(text).lower())
+        if len(words) < self.shingle_size:
+            return np.zeros(0, dtype=np.uint64)
+        shingles = {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+        return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    '''-----------------------------------'''
+    def signature(self, text: str):
+        """
+        :returns: The MinHash signature of the text, or None if it is too short to have one.
+        """
+        hashes = self.shingles(text)
+        if len(hashes) == 0:
+            return None
+        # One row per permutation, the minimum over the shingles is the signature value.
+        permuted = (np.outer(self.a, hashes) + self.b[:, None]) % np.uint64(minhash_prime)
+        return permuted.min(axis=1)
+    '''-----------------------------------'''
+    def cluster(self, texts: list, threshold: float = 0.8) -> np.ndarray:
+        """
+        :param texts: The texts to cluster.
+        :param threshold: The estimated Jaccard similarity above which two texts are near-duplicates.
+
+        :returns: Array holding, for each text, the position of the first text of its cluster.
+        """
+        parents = np.arange(len(texts))
+
+        def find(position):
+            while parents[position] != position:
+                parents[position] = parents[parents[position]]
+                position = parents[position]
+            return position
+
+        signatures = [self.signature(text) for text in texts]
+        buckets = {}
+        for position, signature in enumerate(signatures):
+            if signature is None:
+                continue
+            for band in range(self.bands):
+                key = (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                other = buckets.setdefault(key, position)
+                if other == position:
+                    continue
+                root, other_root = find(position), find(other)
+                if root == other_root:
+                    continue
+                if np.mean(signatures[position] == signatures[other]) >= threshold:
+                    # The earlier text stays the representative of the merged cluster.
+                    parents[max(root, other_root)] = min(root, other_root)
+
+        return np.array([find(position) for position in range(len(texts))])
+
+
+'''-----------------------------------'''
+def assign_clusters(articles_df: pd.DataFrame, threshold: float = 0.8, minhasher: MinHasher = None) -> pd.DataFrame:
+    """
+    :param articles_df: Dataframe of articles, in the format returned by "query_search".
+    :param threshold: The estimated Jaccard similarity of the bodies above which two articles are near-duplicates.
+    :param minhasher: The MinHasher to sign the bodies with. A default one is created if not passed.
+
+    :returns: A copy of the dataframe with a "clusterId" column. Articles with the same canonical url or near-duplicate
+              bodies share the id of the cluster's first article. An existing "clusterId" is kept for articles that are
+              not merged into another cluster.
+    """
+    minhasher = minhasher if minhasher is not None else MinHasher()
+    articles_df = articles_df.reset_index(drop=True).copy()
+    if articles_df.empty:
+        articles_df["clusterId"] = pd.Series(dtype=object)
+        return articles_df
+
+    # Group by canonical url first. Codes are numbered in order of first appearance, so code k first appears at "url_firsts[k]".
+    url_codes, _ = pd.factorize(articles_df["url"].map(canonicalize_url))
+    _, url_firsts = np.unique(url_codes, return_index=True)
+
+    # Then merge the url groups whose bodies are near-duplicates.
+    bodies = articles_df["body"].fillna("").astype(str).to_numpy()
+    body_firsts = minhasher.cluster(bodies[url_firsts].tolist(), threshold=threshold)
+    representatives = url_firsts[body_firsts][url_codes]
+
+    if "clusterId" in articles_df.columns:
+        ids = articles_df["clusterId"].where(articles_df["clusterId"].notna(), articles_df["url"].map(cluster_id)).to_numpy()
+    else:
+        ids = articles_df["url"].map(cluster_id).to_numpy()
+    articles_df["clusterId"] = ids[representatives]
+    return articles_df
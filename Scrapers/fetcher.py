@@ -0,0 +1,266 @@
+import time
+import queue
+import itertools
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlparse
+
+# Date & Time imports
+import datetime as dt
+
+# HTTP imports
+import requests
+from requests.adapters import HTTPAdapter
+
+# Instrumentation
+from Monitoring.metrics import metrics
+
+
+# Same browser user agent newspaper sends, since some publishers block the default requests one.
+default_user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+# Status codes that are worth retrying. Other error codes (404, 403, ...) will not change on a retry.
+retry_status_codes = {408, 425, 429, 500, 502, 503, 504}
+
+
+'''-----------------------------------'''
+def parse_article(url: str, html: str):
+    """
+    :param url: The url the html was downloaded from.
+    :param html: The html of the article page.
+
+    :returns: Tuple of (text, summary), or None if newspaper could not extract the article.
+
+    Description: Module level so it can run inside a process pool. Newspaper is imported here, since it is slow to import.
+    """
+    from newspaper import Article
+    from newspaper.article import ArticleException
+
+    try:
+        article = Article(url)
+        article.download(input_html=html)
+        article.parse()
+        return article.text, article.summary
+    except ArticleException:
+        return None
+
+'''-----------------------------------'''
+def timed_parse_article(url: str, html: str) -> tuple:
+    """
+    :returns: Tuple of ("parse_article" result, seconds it took). Lets the parse time be recorded by the parent process.
+    """
+    start = time.perf_counter()
+    parsed = parse_article(url, html)
+    return parsed, time.perf_counter() - start
+
+'''-----------------------------------'''
+def build_article_data(entry: dict, text: str, summary: str) -> dict:
+    """
+    :param entry: The feed entry of the article (title, link, published).
+    :param text: The body text of the article.
+    :param summary: The summary of the article.
+
+    :returns: Dictionary holding the row of the article, in the format stored in the headlines file.
+    """
+    # Get the date and time the article was published.
+    publish_date = entry["published"]
+
+    # Convert the date string to a datetime object
+    date_object = dt.datetime.strptime(publish_date, "%a, %d %b %Y %H:%M:%S %Z")
+    # Convert the datetime object to the desired format and set the timezone to UTC
+    formatted_date = date_object.strftime("%Y-%m-%d %H:%M:%S UTC")
+    formatted_date = date_object.strptime(formatted_date, "%Y-%m-%d %H:%M:%S %Z")
+
+    body = text.replace("\n", "")
+    article_data = {
+        "title": entry["title"],
+        "publishDate": formatted_date.date(),
+        "publishTime": formatted_date.time(),
+        "body": body,
+        "summary": summary,
+        "url": entry["link"]
+    }
+    return article_data
+
+
+class ArticleFetcher:
+    def __init__(self, max_workers: int = 16, per_host_limit: int = 4, timeout: float = 10, retries: int = 3,
+                 backoff: float = 0.5, parse_workers: int = 2, session: requests.Session = None, cache=None,
+                 max_pending: int = 0):
+        """
+        :param max_workers: The maximum number of downloads running at once.
+        :param per_host_limit: The maximum number of downloads running at once against a single host.
+        :param timeout: Seconds to wait on a single request before giving up on it.
+        :param retries: How many times a failed download is retried.
+        :param backoff: Seconds to wait before the first retry. The wait doubles on every retry after that.
+        :param parse_workers: The number of processes extracting article text from html. If 0, html is parsed in the download threads.
+        :param session: Optional requests session to download with. A pooled session is created if not passed.
+        :param cache: Optional HttpCache (see Scrapers.http_cache) the pages are read through.
+        :param max_pending: The most pages being downloaded, parsed or waiting to be consumed at once. Defaults to twice "max_workers".
+        """
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.parse_workers = parse_workers
+        self.cache = cache
+        self.max_pending = max_pending if max_pending > 0 else max_workers * 2
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"User-Agent": default_user_agent})
+        self.session = session
+
+        self.host_semaphores = defaultdict(lambda: threading.BoundedSemaphore(self.per_host_limit))
+        self.host_lock = threading.Lock()
+        # Created on first use, and kept for the life of the fetcher (see "get_parse_pool").
+        self.parse_pool = None
+        self.parse_pool_lock = threading.Lock()
+    '''-----------------------------------'''
+    def get_parse_pool(self):
+        """
+        :returns: The process pool html is parsed in, or None if "parse_workers" is 0. The pool is started once and kept, so
+                  every "iter_pages" call (and every job sharing the fetcher) uses the same processes.
+        """
+        if self.parse_workers <= 0:
+            return None
+        with self.parse_pool_lock:
+            if self.parse_pool is None:
+                self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+            return self.parse_pool
+    '''-----------------------------------'''
+    def close(self):
+        """
+        Stops the parse processes. The fetcher starts new ones if it is used again.
+        """
+        with self.parse_pool_lock:
+            if self.parse_pool is not None:
+                self.parse_pool.shutdown(wait=False, cancel_futures=True)
+                self.parse_pool = None
+    '''-----------------------------------'''
+    def download(self, url: str):
+        """
+        :param url: The url of the page to download.
+        :returns: The html of the page, or None if it could not be downloaded (or is not cached, when the cache is offline).
+        """
+        host = urlparse(url).netloc
+        with self.host_lock:
+            semaphore = self.host_semaphores[host]
+
+        for attempt in range(self.retries + 1):
+            with semaphore:
+                try:
+                    metrics.count("fetch.requests")
+                    with metrics.timer("fetch.download"):
+                        if self.cache is not None:
+                            response = self.cache.fetch(self.session, url, timeout=self.timeout)
+                        else:
+                            response = self.session.get(url, timeout=self.timeout)
+                    if response is None:
+                        metrics.count("fetch.failures")
+                        return None
+                    if response.status_code < 400:
+                        metrics.count("fetch.bytes", len(response.content))
+                        return response.text
+                    if response.status_code not in retry_status_codes:
+                        metrics.count("fetch.failures")
+                        return None
+                except (requests.ConnectionError, requests.Timeout):
+                    pass
+            # Wait outside of the semaphore, so other downloads from the host are not held up.
+            if attempt < self.retries:
+                metrics.count("fetch.retries")
+                time.sleep(self.backoff * (2 ** attempt))
+        metrics.count("fetch.failures")
+        return None
+    '''-----------------------------------'''
+    def iter_articles(self, entries: list):
+        """
+        :param entries: Feed entries (title, link, published), such as "search['entries']" from pygooglenews.
+
+        :returns: Generator of (index, article_data) tuples, in the order the articles finish. "index" is the position of
+                  the entry in "entries". Articles that could not be downloaded or parsed are skipped.
+        """
+        entries = list(entries)
+        for index, (text, summary) in self.iter_pages([entry["link"] for entry in entries]):
+            yield index, build_article_data(entries[index], text, summary)
+    '''-----------------------------------'''
+    def iter_pages(self, urls: list):
+        """
+        :param urls: The urls of the article pages.
+
+        :returns: Generator of (index, (text, summary)) tuples, in the order the pages finish. "index" is the position of
+                  the url in "urls". Pages that could not be downloaded or parsed are skipped.
+
+        Description: Only "max_pending" urls are submitted ahead of the consumer. The next url is submitted as each result is
+                     taken, so a consumer that stops pulling (e.g. a full pipeline queue) also stops the downloads and parses,
+                     and memory is bounded by "max_pending" pages instead of the number of urls.
+        """
+        urls = list(urls)
+        if not urls:
+            return
+
+        # Never holds more than "max_pending" results, since that is the most urls in flight.
+        results = queue.Queue(maxsize=self.max_pending)
+
+        parse_pool = self.get_parse_pool()
+        # The parses of this call, cancelled if the consumer stops early. The pool itself is shared, so it is left running.
+        parse_futures = []
+
+        def finish(index, parse_future):
+            try:
+                parsed, seconds = parse_future.result()
+                metrics.observe("fetch.parse", seconds)
+            except Exception:
+                parsed = None
+            results.put((index, parsed))
+
+        def fetch(index, url):
+            try:
+                html = self.download(url)
+                if html is None:
+                    results.put((index, None))
+                # Hand the html to the parse pool, so this thread can move on to the next download.
+                elif parse_pool is not None:
+                    parse_future = parse_pool.submit(timed_parse_article, url, html)
+                    parse_futures.append(parse_future)
+                    parse_future.add_done_callback(lambda future: finish(index, future))
+                else:
+                    with metrics.timer("fetch.parse"):
+                        parsed = parse_article(url, html)
+                    results.put((index, parsed))
+            # Every url must put exactly one result, otherwise the generator below would wait forever.
+            except Exception:
+                results.put((index, None))
+
+        try:
+            # Named threads keep py-spy and profiler output readable.
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fetch") as download_pool:
+                pending_urls = enumerate(urls)
+                for index, url in itertools.islice(pending_urls, self.max_pending):
+                    download_pool.submit(fetch, index, url)
+
+                for _ in range(len(urls)):
+                    index, parsed = results.get()
+                    next_url = next(pending_urls, None)
+                    if next_url is not None:
+                        download_pool.submit(fetch, *next_url)
+                    if parsed is None:
+                        continue
+                    yield index, parsed
+        finally:
+            for parse_future in parse_futures:
+                parse_future.cancel()
+    '''-----------------------------------'''
+    def fetch_articles(self, entries: list) -> list:
+        """
+        :param entries: Feed entries (title, link, published), such as "search['entries']" from pygooglenews.
+        :returns: List of article dictionaries, in the same order as "entries".
+        """
+        articles_collected = sorted(self.iter_articles(entries), key=lambda result: result[0])
+        return [article_data for _, article_data in articles_collected]
@@ -1,10 +1,14 @@
 import os
+import json
+import threading
+from urllib.parse import quote_plus
 
 import pprint
 
 # Date & Time imports 
 import datetime as dt
 
+import numpy as np
 import pandas as pd
 
 
@@ -12,21 +16,60 @@ import pandas as pd
 from pygooglenews import GoogleNews
 
 # Import articles related 
-from newspaper import Article
-from newspaper.article import ArticleException
+from Scrapers.fetcher import ArticleFetcher, build_article_data
+from Scrapers.dedup import assign_clusters, cluster_id, dedupe_entries
+from Scrapers.scoring import score_article_rows
+from Scrapers.http_cache import feed_ttl, get_http_cache
 
 # Import sentitment model. 
-import Model.sentiment_analysis
+from Models.registry import get_sentiment_model
+
+# Import storage. 
+from Storage.datasets import CsvStorage, filter_date_range
+
+# Instrumentation
+from Monitoring.metrics import metrics, timed
 
 
 # Paths to folders. 
 google_news_folder = "D:\Datasets\ArticleHeadlines\GoogleNews"
 
+# "bodyStatus" of a row. Headlines rows are "pending" (feed metadata only), "fetched" or "failed". Sentiment rows are "pending", 
+# "scored" or "failed". Rows written before the column existed have their body, and are treated as "fetched" / "scored". 
+body_statuses = ["pending", "fetched", "scored", "failed"]
+
 
 class GoogleNewsScraper:
-    def __init__(self, language: str = "en", country: str = "US"):
+    def __init__(self, language: str = "en", country: str = "US", use_score_cache: bool = True, storage=None, sentiment_model=None,
+                 use_logit_store: bool = False, http_cache=None, fetcher=None):
+        """
+        :param storage: Where the headlines and sentiment datasets are stored (see Storage.datasets). Defaults to the CSV files. 
+        :param sentiment_model: A SentimentModel to score with. The model shared by the whole process is used if not passed. 
+        :param use_logit_store: If the raw chunk logits of every scored article should be kept (see Models.logit_store). 
+        :param http_cache: HttpCache the feeds and article pages are read through (see Scrapers.http_cache). The cache shared 
+                           by the whole process is used if it is enabled. 
+        :param fetcher: ArticleFetcher the article pages are downloaded and parsed with (see Scrapers.fetcher). Pass one to 
+                        share its connections and parse processes between scrapers. A new one is created if not passed. 
+        """
         self.gn = GoogleNews(lang=language, country=country)
-        self.sentiment_model = Model.sentiment_analysis.SentimentModel()
+        self.language = language
+        self.country = country
+        self.storage = storage if storage is not None else CsvStorage()
+        self.http_cache = http_cache if http_cache is not None else get_http_cache()
+        self.fetcher = fetcher if fetcher is not None else ArticleFetcher(cache=self.http_cache)
+        self.use_score_cache = use_score_cache
+        self.use_logit_store = use_logit_store
+        self._sentiment_model = sentiment_model
+        # Held while a dataset is read and rewritten, so the background backfill and the refreshes do not drop each other's rows. 
+        self.write_lock = threading.RLock()
+    '''-----------------------------------'''
+    @property
+    def sentiment_model(self):
+        # The model is shared by the whole process, and its weights are only loaded once something is scored. 
+        # Scores are cached across runs, so articles shared between search terms (or already scored yesterday) are not scored again. 
+        if self._sentiment_model is None:
+            self._sentiment_model = get_sentiment_model(use_score_cache=self.use_score_cache, use_logit_store=self.use_logit_store)
+        return self._sentiment_model
     '''-----------------------------------'''
     def query_topic_headlines(self, topic: str = "business"):
         """
@@ -41,143 +84,407 @@ class GoogleNewsScraper:
 
         pprint.pprint(topic_headlines)
     '''-----------------------------------'''
-    def query_search(self, search_term: str, exclude_term: str = "", time_frame: str = "6m"):
+    def query_search(self, search_term: str, exclude_term: str = "", time_frame: str = "6m", from_date: str = "", headlines_only: bool = False,
+                     known_urls: set = None):
         """
         :param search_term: Used to determine the subject of articles to return. 
         :param exclude_term: Used to determine if an article should be excluded do to it containing a specific term. 
         :param time_frame: Determine how far back articles should be collected. 
+        :param from_date: Date string (YYYY-MM-DD). If passed, only articles published on or after this date are collected, and "time_frame" is ignored. 
+        :param headlines_only: If True, the rows are built from the feed alone and no article is downloaded. The bodies are left 
+                               empty with a "pending" body status, to be filled in later by "backfill_bodies". 
+        :param known_urls: Urls that are already stored. Their entries are dropped before anything is downloaded. 
         """
-        # No terms to exclude. 
-        if exclude_term == "":
-            search = self.gn.search(f"{search_term}", when=time_frame)
-        else:
-            search = self.gn.search(f"{search_term} -{exclude_term}", when=time_frame)
-
-        csv_file_path = f"{google_news_folder}\\{search_term}"
-
-        if not os.path.exists(csv_file_path):
-            # Create a directory for the search term. 
-            os.mkdir(csv_file_path)
-        csv_file_path += f"\\{search_term}_gn_headlines.csv"
-
+        entries = self.search_entries(search_term, exclude_term=exclude_term, time_frame=time_frame, from_date=from_date)
+        if known_urls:
+            entries = [entry for entry in entries if entry["link"] not in known_urls]
+        if headlines_only:
+            return self.build_headlines(entries)
+
+        # Republished copies of the same story are only downloaded once. 
+        unique_entries, duplicates = dedupe_entries(entries)
+        unique_positions = [position for position in range(len(entries)) if position not in duplicates]
+
+        metrics.count("googlenews.duplicate_entries", len(duplicates))
+        # Download and parse the articles concurrently. 
+        with metrics.timer("googlenews.fetch_articles"):
+            fetched = dict(self.fetcher.iter_articles(unique_entries))
+        fetched = {unique_positions[index]: article_data for index, article_data in fetched.items()}
+
+        # Keep the rows in the same order as the search entries. Repeats take the text of the entry they repeat. 
         articles_collected = []
-        for result in search["entries"]:
-
-            #print(f"Result: {result}")
-            title = result["title"]
-            link = result["link"]
-            # Access the content of the article.
-            try: 
-                article = Article(link)
-                article.download()
-                article.parse()
-
-                # Get the date and time the article was published. 
-                publish_date = result["published"]
-
-                # Get the summary of the article. 
-                article_summary = article.summary
-
-                # Convert the date string to a datetime object
-                date_object = dt.datetime.strptime(publish_date, "%a, %d %b %Y %H:%M:%S %Z")
-                # Convert the datetime object to the desired format and set the timezone to UTC
-                formatted_date = date_object.strftime("%Y-%m-%d %H:%M:%S UTC")
-                formatted_date = date_object.strptime(formatted_date, "%Y-%m-%d %H:%M:%S %Z")
-
-
-                body = article.text.replace("\n", "")
-                article_data = {
-                    "title": title,
-                    "publishDate": formatted_date.date(),
-                    "publishTime": formatted_date.time(),
-                    "body": f'"{body}"',
-                    "summary": f'"{article_summary}"',
-                    "url": link
-                }
-
-                articles_collected.append(article_data)
-            except ArticleException:
-                pass
-           
+        for position, entry in enumerate(entries):
+            if position in fetched:
+                articles_collected.append(fetched[position])
+            elif duplicates.get(position) in fetched:
+                original = fetched[duplicates[position]]
+                articles_collected.append(build_article_data(entry, original["body"], original["summary"]))
 
         df = pd.DataFrame(articles_collected)
+        # Near-duplicate bodies share a cluster, so each story is only scored (and counted) once. 
+        if not df.empty:
+            df = assign_clusters(df)
+            df["bodyStatus"] = "fetched"
         return df
+    '''-----------------------------------'''
+    def build_headlines(self, entries: list) -> pd.DataFrame:
+        """
+        :param entries: Feed entries (title, link, published), such as "search['entries']" from pygooglenews. 
+        :returns: Dataframe of the articles built from the feed metadata only, with empty bodies and a "pending" body status. 
+        """
+        if not entries:
+            return pd.DataFrame()
+        # Repeats of a story (same canonical url or headline) join the cluster of its first entry. 
+        _, duplicates = dedupe_entries(entries)
+        df = pd.DataFrame([build_article_data(entry, "", "") for entry in entries])
+        df["clusterId"] = [cluster_id(entries[duplicates.get(position, position)]["link"]) for position in range(len(entries))]
+        df["bodyStatus"] = "pending"
+        return df
+    '''-----------------------------------'''
+    def search_entries(self, search_term: str, exclude_term: str = "", time_frame: str = "6m", from_date: str = "") -> list:
+        """
+        :param search_term: Used to determine the subject of articles to return. 
+        :param exclude_term: Used to determine if an article should be excluded do to it containing a specific term. 
+        :param time_frame: Determine how far back articles should be collected. 
+        :param from_date: Date string (YYYY-MM-DD). If passed, only articles published on or after this date are collected, and "time_frame" is ignored. 
 
+        :returns: The feed entries (title, link, published) of the search, without downloading the articles. 
+        """
+        if exclude_term == "":
+            query = f"{search_term}"
+        # Add the term to exclude. 
+        else:
+            query = f"{search_term} -{exclude_term}"
+
+        with metrics.timer("googlenews.rss"):
+            if self.http_cache is not None:
+                entries = self.search_cached(query, time_frame=time_frame, from_date=from_date)
+            elif from_date == "":
+                entries = self.gn.search(query, when=time_frame)["entries"]
+            else:
+                entries = self.gn.search(query, from_=from_date)["entries"]
+        metrics.count("googlenews.entries", len(entries))
+        return entries
     '''-----------------------------------'''
-    def calculate_article_sentiment(self, article) -> dict:
+    def search_cached(self, query: str, time_frame: str = "6m", from_date: str = "") -> list:
+        """
+        :returns: The feed entries of the search, with the feed read through the http cache. Empty if the cache is offline 
+                  and the feed is not cached. 
+        """
+        import feedparser
 
-        # Get the sentiment score for each piece of the article. 
-        title_score = self.sentiment_model.analyze_text(article["title"])
-        body_score = self.sentiment_model.analyze_text(article["body"])
+        # Same feed url pygooglenews builds for "search". 
+        if from_date == "":
+            query += f" when:{time_frame}"
+        else:
+            query += f" after:{from_date}"
+        feed_url = (f"https://news.google.com/rss/search?q={quote_plus(query)}"
+                    f"&ceid={self.country}:{self.language}&hl={self.language}&gl={self.country}")
 
-        # Dictionary to hold the basic data and sentiment score data. 
-        article_data = {
-                "publishDate": article["publishDate"],
-                "title": article["title"],
-                "titleNeg": title_score["neg"],
-                "titleNeu": title_score["neu"],
-                "titlePos": title_score["pos"],
-                "titleComp": title_score["compound"],
-                "body": article["body"],
-                "bodyNeg": body_score["neg"],
-                "bodyNeu": body_score["neu"],
-                "bodyPos": body_score["pos"],
-                "bodyComp": body_score["compound"],
-                "url": article["url"]
-        }
-        return article_data
+        response = self.http_cache.fetch(self.fetcher.session, feed_url, timeout=self.fetcher.timeout, ttl=feed_ttl)
+        if response is None or response.status_code >= 400:
+            return []
+        return feedparser.parse(response.content)["entries"]
 
     '''-----------------------------------'''
     def get_total_subject_sentiment(self, article_subject: str):
 
         
-        article_csv_path = f"{google_news_folder}\\{article_subject}\\{article_subject}_gn_headlines.csv"
-        articles_df = pd.read_csv(article_csv_path)
+        articles_df = self.storage.read("headlines", article_subject)
 
         # Order by date column. 
         articles_df = articles_df.sort_values(by="publishDate", ascending=True)
         articles_df = articles_df.reset_index(drop=True)
 
-        sentiment_collected = []
-        for i in articles_df.iterrows():
-            article_sentiment_data = self.calculate_article_sentiment(article=i[1])
-            sentiment_collected.append(article_sentiment_data)
-        sentiment_df = pd.DataFrame(sentiment_collected)
-        return sentiment_df
+        return self.score_articles(articles_df)
     '''-----------------------------------'''
-    def get_articles(self, search_term: str, custom_path: str = ""):
-
-        if custom_path == "":
-            csv_file_path = f"{google_news_folder}\\{search_term}\\{search_term}_gn_headlines.csv"
-        else:
-            csv_file_path = custom_path
+    @timed("googlenews.score_articles")
+    def score_articles(self, articles_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        :param articles_df: Dataframe of articles, in the format returned by "query_search". 
+        :returns: Dataframe with the title and body sentiment scores of each article (see Scrapers.scoring). 
+        """
+        return score_article_rows(self.sentiment_model, articles_df)
+    '''-----------------------------------'''
+    def get_articles(self, search_term: str, custom_path: str = "", start=None, end=None, columns: list = None):
+        """
+        :param search_term: The search term whose headlines should be returned. 
+        :param custom_path: Optional CSV file to use instead of the storage. 
+        :param start: Only return articles published on or after this date. 
+        :param end: Only return articles published on or before this date. 
+        :param columns: The columns to return. All columns are returned if not passed, leave out "body" to skip the article text. 
 
+        :returns: Dataframe of the articles. Only the requested range and columns are loaded from storage. 
+        """
         # Try to read the articles into the dataframe. 
         try:
-            articles_df = pd.read_csv(csv_file_path)
+            if custom_path == "":
+                articles_df = self.storage.read("headlines", search_term, columns=columns, start=start, end=end)
+            else:
+                articles_df = select_range(pd.read_csv(custom_path), start, end, columns)
         # If the file does not exist, query it from the GoogleNews class. 
         except FileNotFoundError:
             articles_df = self.query_search(search_term)
             articles_df = articles_df.sort_values(by="publishDate", ascending=True)
             articles_df.reset_index(drop=True, inplace=True)
-            articles_df.to_csv(csv_file_path, index=False)
+            if custom_path == "":
+                self.storage.write("headlines", search_term, articles_df)
+            else:
+                articles_df.to_csv(custom_path, index=False)
+            articles_df = select_range(articles_df, start, end, columns)
         
         return articles_df
 
     '''-----------------------------------'''
-    def get_articles_sentiment(self, search_term: str, custom_path: str = ""):
-        if custom_path == "":
-            csv_file_path = f"{google_news_folder}\\{search_term}\\{search_term}_sentiment_data.csv"
-        else:
-            csv_file_path = custom_path
-        
+    def get_articles_sentiment(self, search_term: str, custom_path: str = "", start=None, end=None, columns: list = None):
+        """
+        :param search_term: The search term whose article sentiment should be returned. 
+        :param custom_path: Optional CSV file to use instead of the storage. 
+        :param start: Only return articles published on or after this date. 
+        :param end: Only return articles published on or before this date. 
+        :param columns: The columns to return, e.g. ["publishDate", "bodyComp"]. All columns are returned if not passed. 
+
+        :returns: Dataframe of the articles with sentiment scores. Only the requested range and columns are loaded from storage. 
+        """
         # Try to read the articles from the dataframe. 
         try:
-            sentiment_df = pd.read_csv(csv_file_path)
+            if custom_path == "":
+                sentiment_df = self.storage.read("sentiment", search_term, columns=columns, start=start, end=end)
+            else:
+                sentiment_df = select_range(pd.read_csv(custom_path), start, end, columns)
         # If the file does not exist, query it from the internal class function. 
         except FileNotFoundError:
             sentiment_df = self.get_total_subject_sentiment(article_subject=search_term)
-            sentiment_df.to_csv(csv_file_path)
+            if custom_path == "":
+                self.storage.write("sentiment", search_term, sentiment_df)
+            else:
+                sentiment_df.to_csv(custom_path, index=False)
+            sentiment_df = select_range(sentiment_df, start, end, columns)
         
         return sentiment_df
-    '''-----------------------------------'''
\ No newline at end of file
+    '''-----------------------------------'''
+    @timed("googlenews.update_articles")
+    def update_articles(self, search_term: str, time_frame: str = "1y", headlines_only: bool = False) -> pd.DataFrame:
+        """
+        :param search_term: The search term whose headlines file should be refreshed. 
+        :param time_frame: How far back to search if the search term has never been collected before. 
+        :param headlines_only: If True, only the feed metadata is stored, and the bodies are left for "backfill_bodies". 
+
+        :returns: Dataframe of the articles that were added to the headlines file. 
+
+        Description: Incremental version of "get_articles". Only the window since the latest stored article is queried, articles 
+                     whose url is already stored are skipped, and the new rows are appended to the headlines file. 
+        """
+        state = self.get_refresh_state(search_term)
+        # Articles that are already stored are dropped from the search results, so they are not downloaded again. 
+        known_urls = set(state["urls"])
+
+        # Nothing collected yet, so search the full time frame. 
+        if state["lastPublishDate"] == "":
+            articles_df = self.query_search(search_term, time_frame=time_frame, headlines_only=headlines_only, known_urls=known_urls)
+        # Start from the latest stored date (inclusive), since articles later that same day are not stored yet. 
+        else:
+            articles_df = self.query_search(search_term, from_date=state["lastPublishDate"], headlines_only=headlines_only,
+                                            known_urls=known_urls)
+
+        if articles_df.empty:
+            return articles_df
+
+        # Skip articles repeated within this search. 
+        articles_df = articles_df.drop_duplicates(subset="url")
+        articles_df = articles_df.sort_values(by="publishDate", ascending=True)
+        articles_df = articles_df.reset_index(drop=True)
+
+        if not articles_df.empty:
+            with self.write_lock:
+                self.storage.append("headlines", search_term, articles_df)
+            self.advance_refresh_state(search_term, state, articles_df)
+
+        return articles_df
+    '''-----------------------------------'''
+    @timed("googlenews.update_articles_sentiment")
+    def update_articles_sentiment(self, search_term: str) -> pd.DataFrame:
+        """
+        :param search_term: The search term whose sentiment file should be extended. 
+
+        :returns: Dataframe of the sentiment rows that were added to the sentiment file. 
+
+        Description: Incremental version of "get_articles_sentiment". Only articles in the headlines file that do not have a row
+                     in the sentiment file yet are scored, and their rows are appended to the sentiment file. 
+        """
+        articles_df = self.storage.read("headlines", search_term)
+
+        if self.storage.exists("sentiment", search_term):
+            scored_urls = set(self.storage.read("sentiment", search_term, columns=["url"])["url"])
+        else:
+            scored_urls = set()
+
+        articles_df = articles_df[~articles_df["url"].isin(scored_urls)]
+        articles_df = articles_df.sort_values(by="publishDate", ascending=True)
+        articles_df = articles_df.reset_index(drop=True)
+
+        if articles_df.empty:
+            return pd.DataFrame()
+
+        sentiment_df = self.score_articles(articles_df)
+        with self.write_lock:
+            self.storage.append("sentiment", search_term, sentiment_df)
+
+        return sentiment_df
+    '''-----------------------------------'''
+    @timed("googlenews.backfill_bodies")
+    def backfill_bodies(self, search_term: str, limit: int = 0) -> int:
+        """
+        :param search_term: The search term whose pending bodies should be fetched. 
+        :param limit: The maximum number of stories to download. All pending stories are downloaded if 0. 
+
+        :returns: The number of headlines rows that were updated. 
+
+        Description: Downloads the bodies of rows stored by "update_articles(headlines_only=True)", and scores them. One 
+                     article is downloaded per cluster and its body is given to the other pending rows of the cluster. The 
+                     headlines and sentiment rows are updated in place, and their body status set to "fetched" / "scored" 
+                     (or "failed" if the page could not be downloaded). The datasets are rewritten once, after every 
+                     story has been downloaded and scored. 
+        """
+        if not self.storage.exists("headlines", search_term):
+            return 0
+        pending_df = self.storage.read("headlines", search_term)
+        if "bodyStatus" not in pending_df.columns:
+            return 0
+        pending_df = pending_df[pending_df["bodyStatus"] == "pending"]
+        clusters = pending_df["clusterId"].fillna(pending_df["url"]) if "clusterId" in pending_df.columns else pending_df["url"]
+        pending_df = pending_df.assign(clusterId=clusters)
+
+        representatives_df = pending_df.drop_duplicates(subset="clusterId")
+        if limit > 0:
+            representatives_df = representatives_df.head(limit)
+        if representatives_df.empty:
+            return 0
+
+        # Download every story concurrently. Stories missing from the results could not be downloaded or parsed. 
+        urls = representatives_df["url"].tolist()
+        pages = dict(self.fetcher.iter_pages(urls))
+        bodies = {}
+        for position, cluster in enumerate(representatives_df["clusterId"]):
+            if position in pages:
+                text, summary = pages[position]
+                bodies[cluster] = (text.replace("\n", ""), summary, "fetched")
+            else:
+                bodies[cluster] = ("", "", "failed")
+
+        # Every pending row of a downloaded cluster gets the body. 
+        filled_df = pending_df[pending_df["clusterId"].isin(bodies.keys())].copy()
+        filled_df["body"] = filled_df["clusterId"].map(lambda cluster: bodies[cluster][0])
+        filled_df["summary"] = filled_df["clusterId"].map(lambda cluster: bodies[cluster][1])
+        filled_df["bodyStatus"] = filled_df["clusterId"].map(lambda cluster: bodies[cluster][2])
+        sentiment_df = self.score_articles(filled_df)
+
+        with self.write_lock:
+            # Read again under the lock, so rows appended while downloading are kept. 
+            articles_df = self.storage.read("headlines", search_term)
+            articles_df = replace_rows(articles_df, filled_df, ["body", "summary", "bodyStatus"])
+            self.storage.write("headlines", search_term, articles_df)
+
+            if self.storage.exists("sentiment", search_term):
+                stored_df = self.storage.read("sentiment", search_term)
+                body_columns = ["body", "bodyNeg", "bodyNeu", "bodyPos", "bodyComp", "bodyStatus"]
+                stored_df = replace_rows(stored_df, sentiment_df, [column for column in body_columns if column in stored_df.columns])
+                self.storage.write("sentiment", search_term, stored_df)
+
+        print(f"[Google News] {search_term}: backfilled {len(filled_df)} bodies ({len(representatives_df)} downloads).")
+        return len(filled_df)
+    '''-----------------------------------'''
+    def start_backfill(self, search_term: str, limit: int = 0) -> threading.Thread:
+        """
+        :param search_term: The search term whose pending bodies should be fetched. 
+        :param limit: The maximum number of stories downloaded per run. All pending stories are downloaded if 0. 
+
+        :returns: The background thread. It runs "backfill_bodies" until no pending body is left. 
+
+        Description: Each run downloads the pending stories and writes the datasets once, since every write rewrites them in 
+                     full. Another run only follows for the rows appended while the previous one was downloading. 
+        """
+        def backfill():
+            while self.backfill_bodies(search_term, limit=limit) > 0:
+                pass
+
+        thread = threading.Thread(target=backfill, name=f"backfill-{search_term}", daemon=True)
+        thread.start()
+        return thread
+    '''-----------------------------------'''
+    def get_refresh_state(self, search_term: str) -> dict:
+        """
+        :param search_term: The search term to get the refresh state of. 
+
+        :returns: Dictionary holding the latest stored publish date ("lastPublishDate") and the stored urls ("urls"). 
+
+        Description: The state is read from the search term's state file. If there is no state file yet, it is built from the 
+                     stored headlines (if there are any). 
+        """
+        state_file_path = f"{google_news_folder}\\{search_term}\\{search_term}_gn_state.json"
+
+        try:
+            with open(state_file_path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            pass
+
+        state = {"lastPublishDate": "", "urls": []}
+        if self.storage.exists("headlines", search_term):
+            stored_df = self.storage.read("headlines", search_term, columns=["publishDate", "url"])
+            if not stored_df.empty:
+                state["lastPublishDate"] = pd.to_datetime(stored_df["publishDate"]).max().strftime("%Y-%m-%d")
+                state["urls"] = stored_df["url"].dropna().unique().tolist()
+        return state
+    '''-----------------------------------'''
+    def advance_refresh_state(self, search_term: str, state: dict, articles_df: pd.DataFrame):
+        """
+        :param search_term: The search term the articles were stored under. 
+        :param state: The refresh state, as returned by "get_refresh_state". Updated in place. 
+        :param articles_df: Dataframe of the articles that were just stored. 
+
+        Description: Moves the high-water mark forward past the stored articles, and saves the state. 
+        """
+        latest_date = pd.to_datetime(articles_df["publishDate"]).max().strftime("%Y-%m-%d")
+        if latest_date > state["lastPublishDate"]:
+            state["lastPublishDate"] = latest_date
+        state["urls"] = list(set(state["urls"]).union(articles_df["url"]))
+        self.save_refresh_state(search_term, state)
+    '''-----------------------------------'''
+    def save_refresh_state(self, search_term: str, state: dict):
+        folder_path = f"{google_news_folder}\\{search_term}"
+        if not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+        state_file_path = f"{folder_path}\\{search_term}_gn_state.json"
+        with open(state_file_path, "w") as file:
+            json.dump(state, file)
+    '''-----------------------------------'''
+
+
+'''-----------------------------------'''
+def select_range(articles_df: pd.DataFrame, start=None, end=None, columns: list = None) -> pd.DataFrame:
+    """
+    Applies the date range and columns of "get_articles" to a dataframe that was not read from the storage. 
+    """
+    articles_df = filter_date_range(articles_df, "publishDate", start, end)
+    if columns is not None:
+        articles_df = articles_df[list(columns)]
+    return articles_df
+
+'''-----------------------------------'''
+def replace_rows(stored_df: pd.DataFrame, new_df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """
+    :param stored_df: The stored rows. 
+    :param new_df: Rows holding the new values, matched to "stored_df" by url. 
+    :param columns: The columns to replace. 
+
+    :returns: A copy of "stored_df" with the columns of the matched rows replaced. 
+    """
+    stored_df = stored_df.copy()
+    new_rows = new_df.drop_duplicates(subset="url").set_index("url")
+    matched = stored_df["url"].isin(new_rows.index)
+    for column in columns:
+        if column not in stored_df.columns:
+            stored_df[column] = np.nan
+        stored_df.loc[matched, column] = new_rows.loc[stored_df.loc[matched, "url"], column].to_numpy()
+    return stored_df
@@ -0,0 +1,222 @@
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+# Import articles related
+from Scrapers.dedup import canonicalize_url
+
+# Instrumentation
+from Monitoring.metrics import metrics
+
+
+cwd = os.getcwd()
+
+# Path to cache folder.
+cache_folder = f"{cwd}\\Scrapers\\Cache"
+
+# Seconds a cached feed is served without asking the server again. Feeds change faster than article pages.
+feed_ttl = 900
+
+# The number of responses stored between two eviction passes.
+evict_interval = 100
+
+# The cache shared by the whole process, created by "get_http_cache".
+shared_cache = None
+shared_cache_lock = threading.Lock()
+
+
+class CachedResponse:
+    def __init__(self, status_code: int, content: bytes, encoding: str = "", from_cache: bool = False):
+        """
+        Description: The parts of a requests.Response the scrapers read, for responses served from the cache as well as
+                     from the network.
+        """
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.from_cache = from_cache
+    '''-----------------------------------'''
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+class HttpCache:
+    def __init__(self, db_path: str = "", ttl: float = 3600, max_age: float = 7 * 86400, max_bytes: int = 512 * 1024 * 1024,
+                 offline: bool = None):
+        """
+        :param db_path: Path to the SQLite file holding the responses. Defaults to "http_cache.sqlite" in the cache folder.
+        :param ttl: Seconds a response is served from the cache before it is revalidated with the server.
+        :param max_age: Seconds after which a response is evicted, whether it is still used or not.
+        :param max_bytes: The maximum compressed size of the stored responses. The least recently used are evicted past it.
+        :param offline: If True, nothing is requested: responses are replayed from the cache whatever their age, and urls
+                        that are not cached fail. Read from the "SENTIMENT_HTTP_OFFLINE" environment variable if not passed.
+
+        Description: Responses are stored zlib compressed, keyed by their canonical url (see Scrapers.dedup), so the same
+                     page reached through tracking links or "amp" variants is only downloaded once. Stale responses are
+                     revalidated with their ETag / Last-Modified, and a "304 Not Modified" costs no body download.
+        """
+        if db_path == "":
+            if not os.path.exists(cache_folder):
+                os.makedirs(cache_folder)
+            db_path = f"{cache_folder}\\http_cache.sqlite"
+
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.offline = offline if offline is not None else os.environ.get("SENTIMENT_HTTP_OFFLINE", "") == "1"
+        self.lock = threading.Lock()
+        self.stored_since_evict = 0
+
+        # Several job runner processes can share the cache file, so wait on their writes instead of failing.
+        self.connection = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                encoding TEXT NOT NULL,
+                etag TEXT NOT NULL,
+                last_modified TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.connection.commit()
+    '''-----------------------------------'''
+    @staticmethod
+    def make_key(url: str) -> str:
+        return hashlib.sha256(canonicalize_url(url).encode("utf-8")).hexdigest()
+    '''-----------------------------------'''
+    def fetch(self, session, url: str, timeout: float = 10, ttl: float = None):
+        """
+        :param session: The requests session to download with.
+        :param url: The url to get.
+        :param ttl: Overrides the cache's ttl for this url.
+
+        :returns: A CachedResponse, or None if the cache is offline and the url is not cached. Error responses are returned
+                  but not stored. Raises the session's exceptions (requests.ConnectionError, ...) as they are.
+        """
+        ttl = ttl if ttl is not None else self.ttl
+        key = self.make_key(url)
+        with self.lock:
+            row = self.connection.execute("SELECT body, encoding, etag, last_modified, stored_at FROM responses WHERE key = ?",
+                                          (key,)).fetchone()
+
+        if row is not None:
+            body, encoding, etag, last_modified, stored_at = row
+            if self.offline or time.time() - stored_at < ttl:
+                metrics.count("http_cache.hits")
+                self.touch(key, refreshed=False)
+                return CachedResponse(200, zlib.decompress(body), encoding, from_cache=True)
+        elif self.offline:
+            metrics.count("http_cache.offline_misses")
+            return None
+
+        headers = {}
+        if row is not None:
+            if etag != "":
+                headers["If-None-Match"] = etag
+            if last_modified != "":
+                headers["If-Modified-Since"] = last_modified
+
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and row is not None:
+            # Unchanged, so the stored body is fresh for another ttl.
+            metrics.count("http_cache.revalidated")
+            self.touch(key, refreshed=True)
+            return CachedResponse(200, zlib.decompress(body), encoding, from_cache=True)
+
+        metrics.count("http_cache.misses")
+        if response.status_code >= 400:
+            return CachedResponse(response.status_code, response.content, response.encoding or "")
+        self.put(key, url, response)
+        return CachedResponse(response.status_code, response.content, response.encoding or "")
+    '''-----------------------------------'''
+    def put(self, key: str, url: str, response):
+        body = zlib.compress(response.content, 6)
+        now = time.time()
+        with self.lock:
+            self.connection.execute("""
+                INSERT OR REPLACE INTO responses (key, url, body, encoding, etag, last_modified, stored_at, last_access, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (key, url, body, response.encoding or "", response.headers.get("ETag", ""),
+                 response.headers.get("Last-Modified", ""), now, now, len(body)))
+            self.stored_since_evict += 1
+            if self.stored_since_evict >= evict_interval:
+                self._evict()
+            self.connection.commit()
+    '''-----------------------------------'''
+    def touch(self, key: str, refreshed: bool):
+        now = time.time()
+        with self.lock:
+            if refreshed:
+                self.connection.execute("UPDATE responses SET stored_at = ?, last_access = ? WHERE key = ?", (now, now, key))
+            else:
+                self.connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+    '''-----------------------------------'''
+    def evict(self):
+        with self.lock:
+            self._evict()
+            self.connection.commit()
+    '''-----------------------------------'''
+    def _evict(self):
+        """
+        Removes the responses older than "max_age", then the least recently used ones until the cache is under "max_bytes".
+        The caller must hold the lock.
+        """
+        self.stored_since_evict = 0
+        # Replays must keep working however old the responses are.
+        if self.offline:
+            return
+
+        self.connection.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.max_age,))
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Walk the responses from the least recently used until enough bytes are freed.
+        freed = 0
+        cutoff = None
+        for last_access, size in self.connection.execute("SELECT last_access, size FROM responses ORDER BY last_access"):
+            freed += size
+            cutoff = last_access
+            if total - freed <= self.max_bytes:
+                break
+        self.connection.execute("DELETE FROM responses WHERE last_access <= ?", (cutoff,))
+        metrics.count("http_cache.evicted_bytes", freed)
+    '''-----------------------------------'''
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
+    '''-----------------------------------'''
+    def close(self):
+        with self.lock:
+            self.connection.close()
+    '''-----------------------------------'''
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+'''-----------------------------------'''
+def get_http_cache():
+    """
+    :returns: The HttpCache shared by the whole process if the "SENTIMENT_HTTP_CACHE" environment variable is "1" (or the
+              cache is offline), otherwise None.
+    """
+    global shared_cache
+    with shared_cache_lock:
+        if shared_cache is None:
+            if os.environ.get("SENTIMENT_HTTP_CACHE", "") != "1" and os.environ.get("SENTIMENT_HTTP_OFFLINE", "") != "1":
+                return None
+            shared_cache = HttpCache()
+        return shared_cache
@@ -0,0 +1,98 @@
+import time
+import threading
+import email.utils
+
+# Date & Time imports
+import datetime as dt
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        :param rate: The number of requests allowed per second, on average.
+        :param capacity: The number of requests that may be made back to back after the bucket has been idle.
+
+        Description: Shared by every thread making requests to a source, so together they stay within the source's budget.
+        """
+        if rate <= 0:
+            raise ValueError(f"[Rate Limit] Rate must be positive, got {rate}.")
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    '''-----------------------------------'''
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    '''-----------------------------------'''
+    def try_acquire(self) -> float:
+        """
+        :returns: 0 if a token was taken, otherwise the number of seconds until one is available.
+        """
+        with self.lock:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+    '''-----------------------------------'''
+    def acquire(self):
+        """
+        Blocks until a token is available, and takes it.
+        """
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            # Sleep outside of the lock, so other threads can check the bucket in the meantime.
+            time.sleep(wait)
+    '''-----------------------------------'''
+    def penalize(self, seconds: float):
+        """
+        Empties the bucket for "seconds", e.g. after the source answered 429 with a "Retry-After" header.
+        """
+        with self.lock:
+            self.refill()
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+'''-----------------------------------'''
+def parse_retry_after(value, default: float) -> float:
+    """
+    :param value: The "Retry-After" header, either a number of seconds or an HTTP date. None if the response had none.
+    :param default: Seconds to return if the header is missing or can not be read.
+
+    :returns: The number of seconds to wait, never negative.
+    """
+    if value is None:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if retry_at is None:
+        return default
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=dt.timezone.utc)
+    return max((retry_at - dt.datetime.now(dt.timezone.utc)).total_seconds(), 0.0)
+
+'''-----------------------------------'''
+def parse_rate_limit_reset(value, default: float) -> float:
+    """
+    :param value: The "x-rate-limit-reset" header, the unix time at which the window resets. None if the response had none.
+    :param default: Seconds to return if the header is missing or can not be read.
+
+    :returns: The number of seconds until the window resets, never negative.
+    """
+    if value is None:
+        return default
+    try:
+        return max(float(value) - time.time(), 0.0)
+    except ValueError:
+        return default
@@ -0,0 +1,373 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Date & Time imports
+import datetime as dt
+
+import pandas as pd
+
+# HTTP imports
+import requests
+
+# Import rate limiting
+from Scrapers.rate_limit import TokenBucket, parse_retry_after
+
+# Import scoring
+from Scrapers.scoring import score_article_rows
+
+# Import sentitment model.
+from Models.registry import get_sentiment_model
+
+# Import storage.
+from Storage.datasets import CsvStorage
+
+# Instrumentation
+from Monitoring.metrics import metrics
+
+
+# Reddit asks every client to identify itself. Requests with a generic user agent are throttled much harder.
+default_user_agent = "python:SentimentAnalysisV2:v2 (sentiment research)"
+
+# The most children Reddit expands in one "morechildren" call.
+more_children_limit = 100
+
+# Columns of the post rows that are carried over to the sentiment rows.
+post_columns = ["kind", "postId", "parentId", "subreddit", "upvotes"]
+
+# Marks the end of a producer's output.
+end_of_stream = object()
+
+
+class RedditScraper:
+    def __init__(self, base_url: str = "https://www.reddit.com", requests_per_minute: float = 60, max_workers: int = 4,
+                 queue_size: int = 256, timeout: float = 10, retries: int = 3, storage=None, sentiment_model=None,
+                 use_score_cache: bool = True, session: requests.Session = None):
+        """
+        :param base_url: The Reddit host the JSON api is read from. Point it at a local stand-in to run offline.
+        :param requests_per_minute: The request budget shared by every thread of the scraper.
+        :param max_workers: The number of comment trees expanded at the same time.
+        :param queue_size: The number of posts and comments buffered before the producers wait on the consumer.
+        :param timeout: Seconds to wait on a single request before giving up on it.
+        :param retries: How many times a failed request is retried.
+        :param storage: Where the post and sentiment datasets are stored (see Storage.datasets). Defaults to the CSV files.
+        :param sentiment_model: A SentimentModel to score with. The model shared by the whole process is used if not passed.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.budget = TokenBucket(rate=requests_per_minute / 60, capacity=max(1, requests_per_minute / 60 * 5))
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retries = retries
+        self.storage = storage if storage is not None else CsvStorage()
+        self.use_score_cache = use_score_cache
+        self._sentiment_model = sentiment_model
+
+        if session is None:
+            session = requests.Session()
+            session.headers.update({"User-Agent": default_user_agent})
+        self.session = session
+    '''-----------------------------------'''
+    @property
+    def sentiment_model(self):
+        if self._sentiment_model is None:
+            self._sentiment_model = get_sentiment_model(use_score_cache=self.use_score_cache)
+        return self._sentiment_model
+    '''-----------------------------------'''
+    def get_json(self, path: str, params: dict = None):
+        """
+        :param path: The api path, e.g. "/r/Cryptocurrency/top.json".
+        :param params: Query parameters of the request.
+
+        :returns: The decoded JSON response. Raises requests.HTTPError if the request still fails after the retries.
+        """
+        params = dict(params or {})
+        params.setdefault("raw_json", 1)
+        for attempt in range(self.retries + 1):
+            self.budget.acquire()
+            metrics.count("reddit.requests")
+            try:
+                with metrics.timer("reddit.request"):
+                    response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == self.retries:
+                    response.raise_for_status()
+                # Stop every thread until Reddit's window resets, not just this one.
+                self.budget.penalize(parse_retry_after(response.headers.get("Retry-After"), default=2 ** attempt))
+                continue
+            response.raise_for_status()
+            metrics.count("reddit.bytes", len(response.content))
+            return response.json()
+    '''-----------------------------------'''
+    def iter_posts(self, subreddit: str, limit: int = 25, listing: str = "top", time_filter: str = "day"):
+        """
+        :param subreddit: The subreddit to list, without the "r/".
+        :param limit: The number of posts to return.
+        :param listing: The listing to page through: "top", "hot", "new" or "rising".
+        :param time_filter: The window of the "top" listing: "hour", "day", "week", "month", "year" or "all".
+
+        :returns: Generator of post rows, one page (up to 100 posts) at a time.
+        """
+        after = None
+        returned = 0
+        while returned < limit:
+            params = {"limit": min(100, limit - returned), "t": time_filter}
+            if after is not None:
+                params["after"] = after
+            page = self.get_json(f"/r/{subreddit}/{listing}.json", params=params)["data"]
+
+            for child in page["children"]:
+                if child["kind"] != "t3" or returned >= limit:
+                    continue
+                returned += 1
+                yield build_post_row(child["data"])
+
+            after = page.get("after")
+            if after is None or not page["children"]:
+                return
+    '''-----------------------------------'''
+    def iter_comments(self, post: dict, max_comments: int = 0):
+        """
+        :param post: The post row, as returned by "iter_posts".
+        :param max_comments: The maximum number of comments to return. Every comment is returned if 0.
+
+        :returns: Generator of comment rows, in depth-first order.
+
+        Description: The tree is walked with an explicit stack, so deep threads never hit the recursion limit, and each
+                     comment is yielded (and dropped) as soon as it is reached. "Load more comments" stubs are expanded
+                     in groups of 100 with the "morechildren" api when the walk gets to them.
+        """
+        post_id = post["postId"]
+        listing = self.get_json(f"/comments/{post_id}.json", params={"limit": 500})
+        # The first listing is the post itself, the second its top level comments. Reverse, so the stack pops them in order.
+        stack = list(reversed(listing[1]["data"]["children"]))
+        del listing
+
+        returned = 0
+        while stack:
+            node = stack.pop()
+            if node["kind"] == "more":
+                children = node["data"].get("children", [])
+                # "Continue this thread" stubs have no children ids, they would need a request of their own per thread.
+                if children:
+                    stack.extend(reversed(self.expand_more(post_id, children)))
+                continue
+            if node["kind"] != "t1":
+                continue
+
+            data = node["data"]
+            replies = data.get("replies")
+            if isinstance(replies, dict):
+                stack.extend(reversed(replies["data"]["children"]))
+
+            yield build_comment_row(data, post)
+            returned += 1
+            if max_comments > 0 and returned >= max_comments:
+                return
+    '''-----------------------------------'''
+    def expand_more(self, post_id: str, children: list) -> list:
+        """
+        :returns: The comments (and nested "more" stubs) behind a "load more comments" stub, nested back into a tree.
+        """
+        things = []
+        for start in range(0, len(children), more_children_limit):
+            response = self.get_json("/api/morechildren.json", params={
+                "api_type": "json",
+                "link_id": f"t3_{post_id}",
+                "children": ",".join(children[start:start + more_children_limit])
+            })
+            things.extend(response["json"]["data"]["things"])
+
+        # "morechildren" returns a flat list with parent ids. Hang each reply under its parent, so the walk stays depth-first.
+        by_name = {thing["data"].get("name", ""): thing for thing in things}
+        roots = []
+        for thing in things:
+            parent = by_name.get(thing["data"].get("parent_id", ""))
+            if parent is None or parent["kind"] != "t1":
+                roots.append(thing)
+                continue
+            replies = parent["data"].get("replies")
+            if not isinstance(replies, dict):
+                replies = parent["data"]["replies"] = {"data": {"children": []}}
+            replies["data"]["children"].append(thing)
+        return roots
+    '''-----------------------------------'''
+    def iter_items(self, subreddit: str, limit: int = 25, include_comments: bool = False, max_comments: int = 0,
+                   listing: str = "top", time_filter: str = "day"):
+        """
+        :param subreddit: The subreddit to list, without the "r/".
+        :param limit: The number of posts to return.
+        :param include_comments: If the comments of each post should be returned as well.
+        :param max_comments: The maximum number of comments per post. Every comment is returned if 0.
+
+        :returns: Generator of post and comment rows, in the order they arrive. The comment trees of several posts are
+                  expanded at the same time, and the producers wait while "queue_size" rows are waiting to be consumed.
+        """
+        if not include_comments:
+            yield from self.iter_posts(subreddit, limit=limit, listing=listing, time_filter=time_filter)
+            return
+
+        rows = queue.Queue(maxsize=self.queue_size)
+        errors = []
+        stop = threading.Event()
+
+        def put(row):
+            # Give up on a full queue once the consumer has stopped, so the producers never block forever.
+            while not stop.is_set():
+                try:
+                    rows.put(row, timeout=0.5)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def expand(post):
+            if stop.is_set():
+                return
+            try:
+                for comment in self.iter_comments(post, max_comments=max_comments):
+                    if not put(comment):
+                        return
+            except Exception as error:
+                errors.append(error)
+
+        def produce():
+            try:
+                with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="reddit") as pool:
+                    for post in self.iter_posts(subreddit, limit=limit, listing=listing, time_filter=time_filter):
+                        if not put(post):
+                            return
+                        pool.submit(expand, post)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                put(end_of_stream)
+
+        producer = threading.Thread(target=produce, name=f"reddit-{subreddit}", daemon=True)
+        producer.start()
+        try:
+            while True:
+                row = rows.get()
+                if row is end_of_stream:
+                    break
+                yield row
+        finally:
+            stop.set()
+        if errors:
+            raise errors[0]
+    '''-----------------------------------'''
+    def get_top_posts(self, subreddit: str, limit: int = 25, include_comments: bool = False, max_comments: int = 0,
+                      time_filter: str = "day") -> pd.DataFrame:
+        """
+        :param subreddit: The subreddit to list, without the "r/".
+        :param limit: The number of posts to return.
+        :param include_comments: If the comments of each post should be returned as well.
+        :param max_comments: The maximum number of comments per post. Every comment is returned if 0.
+
+        :returns: Dataframe with a row per post and comment, in the format of the headlines file. The post title is used as
+                  the title of its comments, and "kind" tells posts from comments.
+        """
+        rows = list(self.iter_items(subreddit, limit=limit, include_comments=include_comments, max_comments=max_comments,
+                                    time_filter=time_filter))
+        return pd.DataFrame(rows)
+    '''-----------------------------------'''
+    def score_posts(self, posts_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        :param posts_df: Dataframe of posts and comments, as returned by "get_top_posts".
+        :returns: Dataframe with the title and body sentiment scores of each row (see Scrapers.scoring).
+        """
+        return score_article_rows(self.sentiment_model, posts_df, extra_columns=post_columns)
+    '''-----------------------------------'''
+    def update_subreddit(self, subreddit: str, limit: int = 25, include_comments: bool = True, max_comments: int = 0,
+                         time_filter: str = "day", batch_size: int = 256) -> int:
+        """
+        :param subreddit: The subreddit to collect, without the "r/".
+        :param batch_size: The number of rows scored and written at a time.
+
+        :returns: The number of new rows stored.
+
+        Description: Streams the posts and comments, and scores and appends them in batches as they arrive, so memory stays
+                     bounded by the batch size. Rows whose url is already stored are skipped.
+        """
+        if self.storage.exists("reddit", subreddit):
+            known_urls = set(self.storage.read("reddit", subreddit, columns=["url"])["url"])
+        else:
+            known_urls = set()
+
+        stored = 0
+        batch = []
+        items = self.iter_items(subreddit, limit=limit, include_comments=include_comments, max_comments=max_comments,
+                                time_filter=time_filter)
+        for row in items:
+            if row["url"] in known_urls:
+                continue
+            known_urls.add(row["url"])
+            batch.append(row)
+            if len(batch) >= batch_size:
+                stored += self.store_batch(subreddit, batch)
+                batch = []
+        if batch:
+            stored += self.store_batch(subreddit, batch)
+
+        print(f"[Reddit] r/{subreddit}: {stored} new posts and comments stored.")
+        return stored
+    '''-----------------------------------'''
+    def store_batch(self, subreddit: str, batch: list) -> int:
+        posts_df = pd.DataFrame(batch)
+        sentiment_df = self.score_posts(posts_df)
+        self.storage.append("reddit", subreddit, posts_df)
+        self.storage.append("reddit_sentiment", subreddit, sentiment_df)
+        return len(posts_df)
+
+
+'''-----------------------------------'''
+def utc_datetime(created_utc: float) -> dt.datetime:
+    return dt.datetime.fromtimestamp(float(created_utc), tz=dt.timezone.utc).replace(tzinfo=None)
+
+'''-----------------------------------'''
+def build_post_row(data: dict) -> dict:
+    """
+    :param data: The "data" of a "t3" (post) thing.
+    :returns: Dictionary holding the row of the post, in the format of the headlines file.
+    """
+    created = utc_datetime(data["created_utc"])
+    return {
+        "title": data.get("title", ""),
+        "publishDate": created.date(),
+        "publishTime": created.time(),
+        "body": data.get("selftext", "").replace("\n", " "),
+        "summary": "",
+        "url": f"https://www.reddit.com{data.get('permalink', '')}",
+        "kind": "post",
+        "postId": data["id"],
+        "parentId": "",
+        "subreddit": data.get("subreddit", ""),
+        "upvotes": data.get("score", 0)
+    }
+
+'''-----------------------------------'''
+def build_comment_row(data: dict, post: dict) -> dict:
+    """
+    :param data: The "data" of a "t1" (comment) thing.
+    :param post: The row of the post the comment belongs to.
+    :returns: Dictionary holding the row of the comment, in the format of the headlines file.
+    """
+    created = utc_datetime(data["created_utc"])
+    return {
+        "title": post["title"],
+        "publishDate": created.date(),
+        "publishTime": created.time(),
+        "body": data.get("body", "").replace("\n", " "),
+        "summary": "",
+        "url": f"https://www.reddit.com{data.get('permalink', '')}",
+        "kind": "comment",
+        "postId": post["postId"],
+        "parentId": data.get("parent_id", ""),
+        "subreddit": post["subreddit"],
+        "upvotes": data.get("score", 0)
+    }
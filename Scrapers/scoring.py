@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+# Scores given to bodies that have not been fetched yet.
+missing_score = {"neg": np.nan, "neu": np.nan, "pos": np.nan, "compound": np.nan}
+
+
+'''-----------------------------------'''
+def score_article_rows(sentiment_model, articles_df: pd.DataFrame, extra_columns: list = None) -> pd.DataFrame:
+    """
+    :param sentiment_model: The SentimentModel to score with.
+    :param articles_df: Dataframe of articles (or posts), with "publishDate", "title", "body" and "url" columns.
+    :param extra_columns: Columns of "articles_df" carried over to the sentiment rows as they are.
+
+    :returns: Dataframe with the title and body sentiment scores of each article.
+
+    Description: If the articles have a "clusterId" column, only the first article of each cluster is scored, and its
+                 scores are given to every article of the cluster.
+    """
+    if "clusterId" in articles_df.columns:
+        clusters = articles_df["clusterId"].fillna(articles_df["url"])
+        first_in_cluster = ~clusters.duplicated()
+        scored_df = articles_df[first_in_cluster]
+        # The position of each article's representative among the scored articles.
+        representatives = pd.Index(clusters[first_in_cluster]).get_indexer(clusters)
+    else:
+        scored_df = articles_df
+        representatives = range(len(articles_df))
+
+    # Bodies that have not been fetched yet are not scored. Their scores are left empty until the backfill fills them in.
+    body_ready = get_body_statuses(scored_df, default="fetched").to_numpy() == "fetched"
+    ready_positions = np.flatnonzero(body_ready)
+
+    # Score every title and body in batches, rather than one forward pass per piece of text.
+    titles = scored_df["title"].fillna("").astype(str).tolist()
+    bodies = scored_df["body"].fillna("").astype(str).to_numpy()[ready_positions].tolist()
+    # The (url, field) pairs let the model keep the raw logits of each article, if it has a logit store.
+    urls = scored_df["url"].tolist()
+    title_scores = sentiment_model.analyze_batch(titles, logit_ids=[(url, "title") for url in urls])
+    ready_scores = sentiment_model.analyze_batch(bodies, logit_ids=[(urls[position], "body") for position in ready_positions])
+
+    body_scores = [missing_score] * len(scored_df)
+    for position, score in zip(ready_positions, ready_scores):
+        body_scores[position] = score
+    title_scores = [title_scores[position] for position in representatives]
+    body_scores = [body_scores[position] for position in representatives]
+
+    sentiment_df = pd.DataFrame({
+        "publishDate": articles_df["publishDate"],
+        "title": articles_df["title"],
+        "titleNeg": [score["neg"] for score in title_scores],
+        "titleNeu": [score["neu"] for score in title_scores],
+        "titlePos": [score["pos"] for score in title_scores],
+        "titleComp": [score["compound"] for score in title_scores],
+        "body": articles_df["body"],
+        "bodyNeg": [score["neg"] for score in body_scores],
+        "bodyNeu": [score["neu"] for score in body_scores],
+        "bodyPos": [score["pos"] for score in body_scores],
+        "bodyComp": [score["compound"] for score in body_scores],
+        "url": articles_df["url"]
+    })
+    # The merge needs the time to move articles published after the close to the next session (see Analysis.merge).
+    if "publishTime" in articles_df.columns:
+        sentiment_df.insert(1, "publishTime", articles_df["publishTime"])
+    for column in (extra_columns or []) + ["clusterId"]:
+        if column in articles_df.columns:
+            sentiment_df[column] = articles_df[column]
+    if "bodyStatus" in articles_df.columns:
+        statuses = get_body_statuses(articles_df, default="fetched")
+        sentiment_df["bodyStatus"] = statuses.where(statuses != "fetched", "scored")
+    return sentiment_df
+
+'''-----------------------------------'''
+def get_body_statuses(articles_df: pd.DataFrame, default: str) -> pd.Series:
+    """
+    :returns: The "bodyStatus" of each row. Rows without a status (or datasets without the column) get "default".
+    """
+    if "bodyStatus" not in articles_df.columns:
+        return pd.Series(default, index=articles_df.index)
+    return articles_df["bodyStatus"].fillna(default).astype(str)
@@ -1,183 +1,151 @@
 import os
 
-import pprint
-
-# Date & Time imports 
+# Date & Time imports
 import datetime as dt
 
 import pandas as pd
 
+# HTTP imports
+import requests
+
+# Import rate limiting
+from Scrapers.rate_limit import TokenBucket, parse_rate_limit_reset
 
-# NOTE: To properly install this library, you may need to downgrade your "feedparser" library to version 58. This is the command: pip install "setuptools<58.0"
-from pygooglenews import GoogleNews
+# Import scoring
+from Scrapers.scoring import score_article_rows
 
-# Import articles related 
-from newspaper import Article
-from newspaper.article import ArticleException
+# Import sentitment model.
+from Models.registry import get_sentiment_model
 
-# Import sentitment model. 
-import Model.sentiment_analysis
+# Import storage.
+from Storage.datasets import CsvStorage
 
+# Instrumentation
+from Monitoring.metrics import metrics
 
-# Paths to folders. 
-google_news_folder = "D:\Datasets\ArticleHeadlines\GoogleNews"
 
+# Columns of the tweet rows that are carried over to the sentiment rows.
+tweet_columns = ["tweetId", "authorId", "likes", "retweets"]
 
-class GoogleNewsScraper:
-    def __init__(self, language: str = "en", country: str = "US"):
-        self.gn = GoogleNews(lang=language, country=country)
-        self.sentiment_model = Model.sentiment_analysis.SentimentModel()
+
+class TwitterScraper:
+    def __init__(self, bearer_token: str = "", base_url: str = "https://api.twitter.com", requests_per_window: int = 450,
+                 window_seconds: float = 900, timeout: float = 10, retries: int = 3, storage=None, sentiment_model=None,
+                 use_score_cache: bool = True, session: requests.Session = None):
+        """
+        :param bearer_token: App bearer token of the Twitter api. Read from the "TWITTER_BEARER_TOKEN" environment variable if empty.
+        :param base_url: The api host. Point it at a local stand-in to run offline.
+        :param requests_per_window: The number of search requests allowed per rate limit window.
+        :param window_seconds: The length of the rate limit window.
+        :param retries: How many times a request answered with 429 or a server error is retried.
+        :param storage: Where the tweet and sentiment datasets are stored (see Storage.datasets). Defaults to the CSV files.
+        :param sentiment_model: A SentimentModel to score with. The model shared by the whole process is used if not passed.
+        """
+        self.bearer_token = bearer_token if bearer_token != "" else os.environ.get("TWITTER_BEARER_TOKEN", "")
+        self.base_url = base_url.rstrip("/")
+        self.budget = TokenBucket(rate=requests_per_window / window_seconds, capacity=5)
+        self.timeout = timeout
+        self.retries = retries
+        self.storage = storage if storage is not None else CsvStorage()
+        self.use_score_cache = use_score_cache
+        self._sentiment_model = sentiment_model
+
+        if session is None:
+            session = requests.Session()
+        session.headers.update({"Authorization": f"Bearer {self.bearer_token}"})
+        self.session = session
+    '''-----------------------------------'''
+    @property
+    def sentiment_model(self):
+        if self._sentiment_model is None:
+            self._sentiment_model = get_sentiment_model(use_score_cache=self.use_score_cache)
+        return self._sentiment_model
     '''-----------------------------------'''
-    def query_topic_headlines(self, topic: str = "business"):
+    def search_tweets(self, query: str, limit: int = 100, start_time: str = ""):
         """
-        :param topic: The topic to search the top headlines for. 
-        Accepted topics are: WORLD, NATION, BUSINESS, TECHNOLOGY, ENTERTAINMENT, SCIENCE, SPORTS, HEALTH    
+        :param query: The search query, e.g. "$META -is:retweet lang:en".
+        :param limit: The number of tweets to return.
+        :param start_time: Optional date string (YYYY-MM-DD). Only tweets created on or after it are returned.
 
-        Description: Query google news and get the top stories for the topic. 
+        :returns: Generator of tweet rows, in the format of the headlines file, one page (up to 100 tweets) at a time.
         """
-
-
-        topic_headlines = self.gn.topic_headlines(topic)
-
-        pprint.pprint(topic_headlines)
+        next_token = None
+        returned = 0
+        while returned < limit:
+            params = {"query": query, "max_results": max(10, min(100, limit - returned)),
+                      "tweet.fields": "created_at,author_id,public_metrics"}
+            if start_time != "":
+                params["start_time"] = f"{start_time}T00:00:00Z"
+            if next_token is not None:
+                params["next_token"] = next_token
+
+            page = self.get_page(params)
+
+            for tweet in page.get("data", []):
+                if returned >= limit:
+                    return
+                returned += 1
+                yield build_tweet_row(tweet)
+
+            next_token = page.get("meta", {}).get("next_token")
+            if next_token is None:
+                return
     '''-----------------------------------'''
-    def query_search(self, search_term: str, exclude_term: str = "", time_frame: str = "6m"):
-        """
-        :param search_term: Used to determine the subject of articles to return. 
-        :param exclude_term: Used to determine if an article should be excluded do to it containing a specific term. 
-        :param time_frame: Determine how far back articles should be collected. 
+    def get_page(self, params: dict) -> dict:
         """
-        # No terms to exclude. 
-        if exclude_term == "":
-            search = self.gn.search(f"{search_term}", when=time_frame)
-        else:
-            search = self.gn.search(f"{search_term} -{exclude_term}", when=time_frame)
-
-        csv_file_path = f"{google_news_folder}\\{search_term}"
-
-        if not os.path.exists(csv_file_path):
-            # Create a directory for the search term. 
-            os.mkdir(csv_file_path)
-        csv_file_path += f"\\{search_term}_gn_headlines.csv"
-
-        articles_collected = []
-        for result in search["entries"]:
-
-            #print(f"Result: {result}")
-            title = result["title"]
-            link = result["link"]
-            # Access the content of the article.
-            try: 
-                article = Article(link)
-                article.download()
-                article.parse()
-
-                # Get the date and time the article was published. 
-                publish_date = result["published"]
-
-                # Get the summary of the article. 
-                article_summary = article.summary
-
-                # Convert the date string to a datetime object
-                date_object = dt.datetime.strptime(publish_date, "%a, %d %b %Y %H:%M:%S %Z")
-                # Convert the datetime object to the desired format and set the timezone to UTC
-                formatted_date = date_object.strftime("%Y-%m-%d %H:%M:%S UTC")
-                formatted_date = date_object.strptime(formatted_date, "%Y-%m-%d %H:%M:%S %Z")
-
-
-                body = article.text.replace("\n", "")
-                article_data = {
-                    "title": title,
-                    "publishDate": formatted_date.date(),
-                    "publishTime": formatted_date.time(),
-                    "body": f'"{body}"',
-                    "summary": f'"{article_summary}"',
-                    "url": link
-                }
-
-                articles_collected.append(article_data)
-            except ArticleException:
-                pass
-           
-
-        df = pd.DataFrame(articles_collected)
-        return df
+        :param params: Query parameters of the search request.
 
-    '''-----------------------------------'''
-    def calculate_article_sentiment(self, article) -> dict:
-
-        # Get the sentiment score for each piece of the article. 
-        title_score = self.sentiment_model.analyze_text(article["title"])
-        body_score = self.sentiment_model.analyze_text(article["body"])
-
-        # Dictionary to hold the basic data and sentiment score data. 
-        article_data = {
-                "publishDate": article["publishDate"],
-                "title": article["title"],
-                "titleNeg": title_score["neg"],
-                "titleNeu": title_score["neu"],
-                "titlePos": title_score["pos"],
-                "titleComp": title_score["compound"],
-                "body": article["body"],
-                "bodyNeg": body_score["neg"],
-                "bodyNeu": body_score["neu"],
-                "bodyPos": body_score["pos"],
-                "bodyComp": body_score["compound"],
-                "url": article["url"]
-        }
-        return article_data
+        :returns: The decoded JSON response. Raises requests.HTTPError if the request still fails after the retries.
 
+        Description: The api reports the end of the rate limit window in the "x-rate-limit-reset" header (unix time). When a
+                     request is answered with 429, or uses up the window, the budget is emptied until then.
+        """
+        for attempt in range(self.retries + 1):
+            self.budget.acquire()
+            metrics.count("twitter.requests")
+            with metrics.timer("twitter.request"):
+                response = self.session.get(f"{self.base_url}/2/tweets/search/recent", params=params, timeout=self.timeout)
+
+            reset = response.headers.get("x-rate-limit-reset")
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == self.retries:
+                    response.raise_for_status()
+                self.budget.penalize(parse_rate_limit_reset(reset, default=2 ** attempt))
+                continue
+            response.raise_for_status()
+            if response.headers.get("x-rate-limit-remaining") == "0":
+                self.budget.penalize(parse_rate_limit_reset(reset, default=0))
+            return response.json()
     '''-----------------------------------'''
-    def get_total_subject_sentiment(self, article_subject: str):
-
-        
-        article_csv_path = f"{google_news_folder}\\{article_subject}\\{article_subject}_gn_headlines.csv"
-        articles_df = pd.read_csv(article_csv_path)
-
-        # Order by date column. 
-        articles_df = articles_df.sort_values(by="publishDate", ascending=True)
-        articles_df = articles_df.reset_index(drop=True)
-
-        sentiment_collected = []
-        for i in articles_df.iterrows():
-            article_sentiment_data = self.calculate_article_sentiment(article=i[1])
-            sentiment_collected.append(article_sentiment_data)
-        sentiment_df = pd.DataFrame(sentiment_collected)
-        return sentiment_df
-    '''-----------------------------------'''
-    def get_articles(self, search_term: str, custom_path: str = ""):
-
-        if custom_path == "":
-            csv_file_path = f"{google_news_folder}\\{search_term}\\{search_term}_gn_headlines.csv"
-        else:
-            csv_file_path = custom_path
-
-        # Try to read the articles into the dataframe. 
-        try:
-            articles_df = pd.read_csv(csv_file_path)
-        # If the file does not exist, query it from the GoogleNews class. 
-        except FileNotFoundError:
-            articles_df = self.query_search(search_term)
-            articles_df = articles_df.sort_values(by="publishDate", ascending=True)
-            articles_df.reset_index(drop=True, inplace=True)
-            articles_df.to_csv(csv_file_path, index=False)
-        
-        return articles_df
-
+    def get_tweets(self, query: str, limit: int = 100, start_time: str = "") -> pd.DataFrame:
+        return pd.DataFrame(list(self.search_tweets(query, limit=limit, start_time=start_time)))
     '''-----------------------------------'''
-    def get_articles_sentiment(self, search_term: str, custom_path: str = ""):
-        if custom_path == "":
-            csv_file_path = f"{google_news_folder}\\{search_term}\\{search_term}_sentiment_data.csv"
-        else:
-            csv_file_path = custom_path
-        
-        # Try to read the articles from the dataframe. 
-        try:
-            sentiment_df = pd.read_csv(csv_file_path)
-        # If the file does not exist, query it from the internal class function. 
-        except FileNotFoundError:
-            sentiment_df = self.get_total_subject_sentiment(article_subject=search_term)
-            sentiment_df.to_csv(csv_file_path)
-        
-        return sentiment_df
-    '''-----------------------------------'''
\ No newline at end of file
+    def score_tweets(self, tweets_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        :param tweets_df: Dataframe of tweets, as returned by "get_tweets".
+        :returns: Dataframe with the sentiment scores of each tweet (see Scrapers.scoring).
+        """
+        return score_article_rows(self.sentiment_model, tweets_df, extra_columns=tweet_columns)
+
+
+'''-----------------------------------'''
+def build_tweet_row(tweet: dict) -> dict:
+    """
+    :param tweet: A tweet object of the Twitter api (v2).
+    :returns: Dictionary holding the row of the tweet. Tweets have no title, so the text is used as both title and body.
+    """
+    created = dt.datetime.strptime(tweet["created_at"][:19], "%Y-%m-%dT%H:%M:%S")
+    text = tweet.get("text", "").replace("\n", " ")
+    public_metrics = tweet.get("public_metrics", {})
+    return {
+        "title": text,
+        "publishDate": created.date(),
+        "publishTime": created.time(),
+        "body": text,
+        "summary": "",
+        "url": f"https://twitter.com/i/web/status/{tweet['id']}",
+        "tweetId": tweet["id"],
+        "authorId": tweet.get("author_id", ""),
+        "likes": public_metrics.get("like_count", 0),
+        "retweets": public_metrics.get("retweet_count", 0)
+    }
@@ -0,0 +1,302 @@
+import os
+import uuid
+import shutil
+
+import pandas as pd
+
+# Date index of the CSV files.
+from Storage.date_index import DateIndex
+
+# Instrumentation
+from Monitoring.metrics import timed
+
+# Pyarrow is imported by the Parquet storage methods, so the CSV storage does not need it.
+
+
+cwd = os.getcwd()
+
+# Paths to folders.
+google_news_folder = "D:\\Datasets\\ArticleHeadlines\\GoogleNews"
+price_folder = f"{cwd}\\AssetData\\Storage"
+parquet_folder = "D:\\Datasets\\Parquet"
+reddit_folder = "D:\\Datasets\\Reddit"
+twitter_folder = "D:\\Datasets\\Twitter"
+
+# The date column of each dataset. Used for date range reads and partitioning.
+date_columns = {
+    "headlines": "publishDate",
+    "sentiment": "publishDate",
+    "prices": "Date",
+    "reddit": "publishDate",
+    "reddit_sentiment": "publishDate",
+    "tweets": "publishDate",
+    "tweet_sentiment": "publishDate"
+}
+
+# Sentiment score columns are stored as float32, there is no use for more precision than that.
+score_columns = ["titleNeg", "titleNeu", "titlePos", "titleComp", "bodyNeg", "bodyNeu", "bodyPos", "bodyComp"]
+
+
+'''-----------------------------------'''
+def normalize_dataset(dataset: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    :param dataset: The name of the dataset ("headlines", "sentiment" or "prices").
+    :param df: Dataframe holding rows of the dataset.
+
+    :returns: A copy of the dataframe with typed columns (datetime dates, time objects, float32 scores).
+
+    Description: Also removes the extra quotes older headlines files wrapped around the body and summary.
+    """
+    df = df.copy()
+    date_column = date_columns[dataset]
+    if date_column in df.columns:
+        df[date_column] = pd.to_datetime(df[date_column])
+
+    if "publishTime" in df.columns and df["publishTime"].dtype == object:
+        df["publishTime"] = pd.to_datetime(df["publishTime"].astype(str), format="%H:%M:%S", errors="coerce").dt.time
+
+    for column in score_columns:
+        if column in df.columns:
+            df[column] = df[column].astype("float32")
+
+    for column in ["body", "summary"]:
+        if column in df.columns and df[column].dtype == object:
+            df[column] = df[column].str.replace(r'^"(.*)"$', r"\1", regex=True)
+
+    # Drop the index column of files that were written with their index.
+    df = df.drop(columns=[column for column in df.columns if str(column).startswith("Unnamed: ")])
+    return df
+
+'''-----------------------------------'''
+def copy_dataset(source, target, dataset: str, ticker: str):
+    """
+    :param source: The storage to read the dataset from.
+    :param target: The storage to write the dataset to.
+    :param dataset: The name of the dataset ("headlines", "sentiment" or "prices").
+    :param ticker: The ticker (or search term) of the dataset.
+
+    Description: Used to move existing CSV files over to the Parquet storage.
+    """
+    target.write(dataset, ticker, source.read(dataset, ticker))
+
+
+class CsvStorage:
+    """
+    Stores every dataset in the per-ticker CSV files the project has always used.
+    """
+    '''-----------------------------------'''
+    def get_path(self, dataset: str, ticker: str) -> str:
+        if dataset == "headlines":
+            return f"{google_news_folder}\\{ticker}\\{ticker}_gn_headlines.csv"
+        elif dataset == "sentiment":
+            return f"{google_news_folder}\\{ticker}\\{ticker}_sentiment_data.csv"
+        elif dataset == "prices":
+            return f"{price_folder}\\{ticker}.csv"
+        elif dataset == "reddit":
+            return f"{reddit_folder}\\{ticker}\\{ticker}_reddit_posts.csv"
+        elif dataset == "reddit_sentiment":
+            return f"{reddit_folder}\\{ticker}\\{ticker}_reddit_sentiment.csv"
+        elif dataset == "tweets":
+            return f"{twitter_folder}\\{ticker}\\{ticker}_tweets.csv"
+        elif dataset == "tweet_sentiment":
+            return f"{twitter_folder}\\{ticker}\\{ticker}_tweet_sentiment.csv"
+        raise ValueError(f"[Storage] Unknown dataset: {dataset}")
+    '''-----------------------------------'''
+    def exists(self, dataset: str, ticker: str) -> bool:
+        return os.path.exists(self.get_path(dataset, ticker))
+    '''-----------------------------------'''
+    @timed("storage.csv.read")
+    def read(self, dataset: str, ticker: str, columns: list = None, start=None, end=None) -> pd.DataFrame:
+        """
+        :param dataset: The name of the dataset ("headlines", "sentiment" or "prices").
+        :param ticker: The ticker (or search term) of the dataset.
+        :param columns: The columns to load. All columns are loaded if not passed.
+        :param start: Only load rows dated on or after this date.
+        :param end: Only load rows dated on or before this date.
+
+        :returns: Dataframe of the dataset. Raises FileNotFoundError if the dataset has not been stored.
+
+        Description: Date range reads go through the file's date index (see Storage.date_index), so only the rows in the range 
+                     are read and parsed.
+        """
+        csv_file_path = self.get_path(dataset, ticker)
+        date_column = date_columns[dataset]
+        usecols = None
+        if columns is not None:
+            usecols = list(columns)
+            if (start is not None or end is not None) and date_column not in usecols:
+                usecols.append(date_column)
+
+        if start is None and end is None:
+            df = pd.read_csv(csv_file_path, usecols=usecols)
+        else:
+            if not os.path.exists(csv_file_path):
+                raise FileNotFoundError(f"[Storage] No {dataset} data stored for {ticker}: {csv_file_path}")
+            try:
+                df = DateIndex(csv_file_path, date_column).read_range(start=start, end=end, usecols=usecols)
+            except ValueError:
+                # Files the index can not make sense of are read in full.
+                df = pd.read_csv(csv_file_path, usecols=usecols)
+            df = filter_date_range(df, date_column, start, end)
+
+        if columns is not None:
+            df = df[list(columns)]
+        return df
+    '''-----------------------------------'''
+    @timed("storage.csv.write")
+    def write(self, dataset: str, ticker: str, df: pd.DataFrame):
+        csv_file_path = self.get_path(dataset, ticker)
+        folder_path = os.path.dirname(csv_file_path)
+        if folder_path != "" and not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+        df.to_csv(csv_file_path, index=False)
+        # The rows have moved, so the date index has to be rebuilt on the next range read.
+        DateIndex(csv_file_path, date_columns[dataset]).remove()
+    '''-----------------------------------'''
+    @timed("storage.csv.append")
+    def append(self, dataset: str, ticker: str, df: pd.DataFrame):
+        if not self.exists(dataset, ticker):
+            self.write(dataset, ticker, df)
+            return
+        # Match the column layout of the existing file (older files were written with their index).
+        csv_file_path = self.get_path(dataset, ticker)
+        existing_columns = pd.read_csv(csv_file_path, nrows=0).columns
+        # Files written before a column was added are rewritten once with the new column, instead of dropping it.
+        new_columns = [column for column in df.columns if column not in existing_columns]
+        if new_columns:
+            self.write(dataset, ticker, pd.concat([pd.read_csv(csv_file_path), df], ignore_index=True))
+            return
+        df.reindex(columns=existing_columns).to_csv(csv_file_path, mode="a", header=False, index=False)
+
+
+class ParquetStorage:
+    """
+    Stores every dataset as a Parquet dataset partitioned by ticker and year, with typed columns. Reads only load the
+    requested columns, and date ranges are pushed down to skip the partitions and row groups outside of the range.
+    """
+    def __init__(self, root_folder: str = parquet_folder):
+        self.root_folder = root_folder
+    '''-----------------------------------'''
+    def get_path(self, dataset: str) -> str:
+        if dataset not in date_columns:
+            raise ValueError(f"[Storage] Unknown dataset: {dataset}")
+        return os.path.join(self.root_folder, dataset)
+    '''-----------------------------------'''
+    def get_ticker_path(self, dataset: str, ticker: str) -> str:
+        return os.path.join(self.get_path(dataset), f"ticker={ticker}")
+    '''-----------------------------------'''
+    def exists(self, dataset: str, ticker: str) -> bool:
+        return os.path.exists(self.get_ticker_path(dataset, ticker))
+    '''-----------------------------------'''
+    @timed("storage.parquet.read")
+    def read(self, dataset: str, ticker: str, columns: list = None, start=None, end=None) -> pd.DataFrame:
+        """
+        :param dataset: The name of the dataset ("headlines", "sentiment" or "prices").
+        :param ticker: The ticker (or search term) of the dataset.
+        :param columns: The columns to load. All columns are loaded if not passed.
+        :param start: Only load rows dated on or after this date.
+        :param end: Only load rows dated on or before this date.
+
+        :returns: Dataframe of the dataset, sorted by date. Raises FileNotFoundError if the dataset has not been stored.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        ticker_path = self.get_ticker_path(dataset, ticker)
+        if not os.path.exists(ticker_path):
+            raise FileNotFoundError(f"[Storage] No {dataset} data stored for {ticker}: {ticker_path}")
+
+        date_column = date_columns[dataset]
+        dataset_files = ds.dataset(ticker_path, format="parquet", partitioning="hive")
+        # The dataset takes its schema from the first file, so columns added to later files would be dropped. Read every
+        # file with the union of their schemas instead.
+        schemas = [fragment.physical_schema for fragment in dataset_files.get_fragments()]
+        if len(schemas) > 1:
+            schema = pa.unify_schemas([dataset_files.schema] + schemas)
+            dataset_files = ds.dataset(ticker_path, schema=schema, format="parquet", partitioning="hive")
+
+        # Filter on the year partition first, so files outside of the range are never opened.
+        row_filter = None
+        if start is not None:
+            start = pd.Timestamp(start)
+            row_filter = (ds.field("year") >= start.year) & (ds.field(date_column) >= pa.scalar(start.to_pydatetime(), type=pa.timestamp("ns")))
+        if end is not None:
+            end = pd.Timestamp(end)
+            end_filter = (ds.field("year") <= end.year) & (ds.field(date_column) <= pa.scalar(end.to_pydatetime(), type=pa.timestamp("ns")))
+            row_filter = end_filter if row_filter is None else row_filter & end_filter
+
+        if columns is None:
+            load_columns = [name for name in dataset_files.schema.names if name != "year"]
+        else:
+            load_columns = list(columns)
+            if date_column not in load_columns:
+                load_columns.append(date_column)
+
+        table = dataset_files.to_table(columns=load_columns, filter=row_filter)
+        df = table.to_pandas()
+        df = df.sort_values(by=date_column, kind="stable").reset_index(drop=True)
+
+        if columns is not None:
+            df = df[list(columns)]
+        return df
+    '''-----------------------------------'''
+    def write(self, dataset: str, ticker: str, df: pd.DataFrame):
+        """
+        Replaces everything stored for the ticker with "df". The rows are written to a temporary folder, which is swapped in
+        once it is complete, so a failed write leaves the stored rows as they were.
+        """
+        ticker_path = self.get_ticker_path(dataset, ticker)
+        # Folders starting with "_" are skipped when the dataset is read, so the temporary folders are never picked up.
+        temp_path = os.path.join(self.get_path(dataset), f"_tmp-{uuid.uuid4().hex}")
+        old_path = os.path.join(self.get_path(dataset), f"_old-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(temp_path)
+            self.write_files(dataset, temp_path, df)
+        except BaseException:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+
+        if os.path.exists(ticker_path):
+            os.rename(ticker_path, old_path)
+        os.rename(temp_path, ticker_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    '''-----------------------------------'''
+    @timed("storage.parquet.append")
+    def append(self, dataset: str, ticker: str, df: pd.DataFrame):
+        """
+        Adds "df" to the rows stored for the ticker, as new files in each year partition.
+        """
+        self.write_files(dataset, self.get_ticker_path(dataset, ticker), df)
+    '''-----------------------------------'''
+    def write_files(self, dataset: str, root_path: str, df: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if df.empty:
+            return
+        date_column = date_columns[dataset]
+        df = normalize_dataset(dataset, df)
+        df["year"] = df[date_column].dt.year.astype("int32")
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_to_dataset(table, root_path=root_path, partition_cols=["year"],
+                            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet", existing_data_behavior="overwrite_or_ignore")
+
+
+'''-----------------------------------'''
+def filter_date_range(df: pd.DataFrame, date_column: str, start=None, end=None) -> pd.DataFrame:
+    """
+    :param df: Dataframe to filter.
+    :param date_column: The column holding the date of each row.
+    :param start: Only keep rows dated on or after this date.
+    :param end: Only keep rows dated on or before this date.
+    """
+    if start is None and end is None:
+        return df
+    dates = pd.to_datetime(df[date_column])
+    keep = pd.Series(True, index=df.index)
+    if start is not None:
+        keep &= dates >= pd.Timestamp(start)
+    if end is not None:
+        keep &= dates <= pd.Timestamp(end)
+    return df[keep]
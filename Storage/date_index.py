@@ -0,0 +1,156 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Bytes kept from the end of the indexed part of the file, to check the file has only been appended to since.
+tail_size = 64
+
+
+'''-----------------------------------'''
+def record_offsets(data: bytes, start_offset: int = 0) -> np.ndarray:
+    """
+    :param data: Bytes of whole CSV records (no header).
+    :param start_offset: The position of "data" in the file.
+
+    :returns: Array with the byte offset (in the file) of the start of each record. Quoted fields can span many lines, so a
+              line only ends a record once the number of quotes seen is even.
+    """
+    offsets = []
+    position = 0
+    quotes = 0
+    record_start = 0
+    for line in io.BytesIO(data):
+        quotes += line.count(b'"')
+        position += len(line)
+        if quotes % 2 == 0:
+            if line.strip() != b"":
+                offsets.append(start_offset + record_start)
+            record_start = position
+            quotes = 0
+    return np.array(offsets, dtype=np.int64)
+
+
+class DateIndex:
+    def __init__(self, csv_file_path: str, date_column: str):
+        """
+        :param csv_file_path: The CSV file to index.
+        :param date_column: The column holding the date of each row.
+
+        Description: Side file holding the date and byte offset of every row of a CSV file, so a date range can be read by
+                     seeking straight to its rows instead of parsing the whole file. The index is extended when rows are
+                     appended to the file, and rebuilt if the file was rewritten.
+        """
+        self.csv_file_path = csv_file_path
+        self.date_column = date_column
+        self.index_path = f"{csv_file_path}.dateidx.npz"
+    '''-----------------------------------'''
+    def load(self) -> tuple:
+        """
+        :returns: Tuple of (dates, offsets, header), brought up to date with the CSV file.
+        """
+        file_size = os.path.getsize(self.csv_file_path)
+        with open(self.csv_file_path, "rb") as file:
+            header = file.readline()
+
+            dates, offsets, indexed_size = self.read_index()
+            if indexed_size > 0:
+                # The file was rewritten if it shrank, or the bytes at the end of the indexed part changed.
+                tail_start = max(indexed_size - tail_size, 0)
+                file.seek(tail_start)
+                if indexed_size > file_size or file.read(indexed_size - tail_start) != self.tail:
+                    dates, offsets, indexed_size = None, None, 0
+
+            if indexed_size == file_size:
+                return dates, offsets, header
+
+            if indexed_size == 0:
+                indexed_size = len(header)
+                dates, offsets = np.zeros(0, dtype="datetime64[ns]"), np.zeros(0, dtype=np.int64)
+
+            file.seek(indexed_size)
+            new_data = file.read(file_size - indexed_size)
+
+        new_offsets = record_offsets(new_data, start_offset=indexed_size)
+        new_dates = pd.read_csv(io.BytesIO(header + new_data), usecols=[self.date_column])[self.date_column]
+        new_dates = pd.to_datetime(new_dates).to_numpy(dtype="datetime64[ns]")
+        if len(new_dates) != len(new_offsets):
+            raise ValueError(f"[Storage] Could not index the rows of {self.csv_file_path}")
+
+        dates = np.concatenate([dates, new_dates])
+        offsets = np.concatenate([offsets, new_offsets])
+        self.write_index(dates, offsets, file_size)
+        return dates, offsets, header
+    '''-----------------------------------'''
+    def read_index(self) -> tuple:
+        self.tail = b""
+        if not os.path.exists(self.index_path):
+            return None, None, 0
+        try:
+            with np.load(self.index_path) as index:
+                self.tail = index["tail"].tobytes()
+                return index["dates"], index["offsets"], int(index["size"])
+        except (OSError, KeyError, ValueError):
+            return None, None, 0
+    '''-----------------------------------'''
+    def write_index(self, dates: np.ndarray, offsets: np.ndarray, file_size: int):
+        with open(self.csv_file_path, "rb") as file:
+            tail_start = max(file_size - tail_size, 0)
+            file.seek(tail_start)
+            tail = file.read(file_size - tail_start)
+
+        # Write to a temporary file first, so a reader never sees half of an index.
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "wb") as file:
+            np.savez(file, dates=dates, offsets=offsets, size=np.int64(file_size), tail=np.frombuffer(tail, dtype=np.uint8))
+        os.replace(temp_path, self.index_path)
+    '''-----------------------------------'''
+    def remove(self):
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+    '''-----------------------------------'''
+    def read_range(self, start=None, end=None, usecols: list = None) -> pd.DataFrame:
+        """
+        :param start: Only load rows dated on or after this date.
+        :param end: Only load rows dated on or before this date.
+        :param usecols: The columns to parse. All columns are parsed if not passed.
+
+        :returns: Dataframe of the rows in the range, in file order. Only the bytes of those rows are read from the file.
+        """
+        dates, offsets, header = self.load()
+        file_end = os.path.getsize(self.csv_file_path)
+        row_ends = np.append(offsets[1:], file_end)
+
+        low = np.datetime64(pd.Timestamp(start)) if start is not None else None
+        high = np.datetime64(pd.Timestamp(end)) if end is not None else None
+
+        # Sorted files (prices, and headlines written in date order) are searched. Otherwise the rows are masked.
+        if len(dates) < 2 or bool(np.all(dates[1:] >= dates[:-1])):
+            first = np.searchsorted(dates, low, side="left") if low is not None else 0
+            last = np.searchsorted(dates, high, side="right") if high is not None else len(dates)
+            rows = np.arange(first, last)
+        else:
+            keep = np.ones(len(dates), dtype=bool)
+            if low is not None:
+                keep &= dates >= low
+            if high is not None:
+                keep &= dates <= high
+            rows = np.flatnonzero(keep)
+
+        buffer = io.BytesIO()
+        buffer.write(header)
+        if len(rows) > 0:
+            # Read each run of consecutive rows with one seek.
+            run_starts = np.flatnonzero(np.diff(rows, prepend=rows[0] - 2) != 1)
+            run_ends = np.append(run_starts[1:], len(rows)) - 1
+            with open(self.csv_file_path, "rb") as file:
+                for run_start, run_end in zip(rows[run_starts], rows[run_ends]):
+                    file.seek(offsets[run_start])
+                    data = file.read(row_ends[run_end] - offsets[run_start])
+                    buffer.write(data)
+                    if not data.endswith(b"\n"):
+                        buffer.write(b"\n")
+        buffer.seek(0)
+        return pd.read_csv(buffer, usecols=usecols)
@@ -1,24 +1,19 @@
 # Operating System imports
 import os
-from dotenv import load_dotenv
-load_dotenv()
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    # The settings can be set in the environment instead of a .env file. 
+    pass
 
 
 import time
 
-from Model.sentiment_analysis import SentimentModel
-
 import pandas as pd
 
-# Import scrapers 
-from Scrapers.reddit import RedditScraper
-from Scrapers.googlenews import GoogleNewsScraper
-
-# Import Graph
-from Graphing.graphs import DataGraphs
-
-# Import Asset data
-from AssetData.asset_data import AssetData
+# The scrapers, pipelines, graphs and models are imported by the functions that use them, so importing this package (e.g. 
+# when pytest collects the tests) does not need every scraping and plotting dependency installed. 
 
 import pprint
 
@@ -31,44 +26,97 @@ google_news_folder = "D:\Datasets\ArticleHeadlines\GoogleNews"
 
 
 def update_googlenews_dataset(search_term: str):
+    from Scrapers.googlenews import GoogleNewsScraper
+
     google = GoogleNewsScraper()
-    articles = google.query_search(search_term, time_frame="1y")
+    # Only query the window since the last refresh, and append the new articles. 
+    new_articles = google.update_articles(search_term, time_frame="1y")
+    print(f"[Google News] {len(new_articles)} new articles added for '{search_term}'.")
+
+    # Score only the articles that do not have sentiment data yet. 
+    google.update_articles_sentiment(search_term)
+
+def update_googlenews_headlines(search_term: str):
+    from Scrapers.googlenews import GoogleNewsScraper
+
+    google = GoogleNewsScraper()
+    # Store the feed metadata and score the titles right away. The bodies are downloaded and scored in the background. 
+    new_articles = google.update_articles(search_term, time_frame="1y", headlines_only=True)
+    print(f"[Google News] {len(new_articles)} new headlines added for '{search_term}'.")
+    google.update_articles_sentiment(search_term)
+    return google.start_backfill(search_term)
+
+def stream_googlenews_dataset(search_term: str):
+    from Pipeline.streaming import SentimentPipeline
 
-    csv_file_path = f"{google_news_folder}\\{search_term}\\{search_term}_gn_headlines.csv"
-    articles.to_csv(csv_file_path, index=False)
+    # Fetch, score and write the new articles in batches, instead of one stage at a time. 
+    pipeline = SentimentPipeline()
+    stats = pipeline.run(search_term, time_frame="1y")
+    print(f"[Google News] {stats['articles']} new articles streamed for '{search_term}'.")
+
+def update_googlenews_watchlist(tickers: list):
+    from Pipeline.jobs import JobRunner
+
+    # Refresh many tickers at once. The fetches run concurrently, and one model scores every ticker. 
+    runner = JobRunner(fetch_workers=8)
+    return runner.run(tickers)
 
 def google_article_staging(search_term: str):
+    from Scrapers.googlenews import GoogleNewsScraper
+
     google = GoogleNewsScraper()
     #
     article_df = google.get_articles(search_term)
 
 def google_article_sentiment_staging(search_term: str):
-    
+    from Scrapers.googlenews import GoogleNewsScraper
+
     google = GoogleNewsScraper()
     google.get_articles_sentiment(search_term)
     #sentiment_df = google.get_total_subject_sentiment(article_subject=search_term)
 
 
 '---------------------------------- Reddit ----------------------------------'
+def update_reddit_dataset(subreddit: str, limit: int = 25):
+    from Scrapers.reddit import RedditScraper
+
+    reddit = RedditScraper()
+    # Posts and comments are scored and stored in batches as they stream in. 
+    return reddit.update_subreddit(subreddit, limit=limit, include_comments=True, time_filter="day")
 
 
 '---------------------------------- Graphs ----------------------------------'
-def plot_sentiment(ticker: str):
+def plot_sentiment(ticker: str, start=None, end=None):
+    # The stored scores are read and merged directly, so plotting never opens the sentiment model or its score cache. 
+    from Storage.datasets import CsvStorage
+    from Analysis.merge import merge_sentiment_asof
+    from Graphing.graphs import DataGraphs
+    from AssetData.asset_data import AssetData
+
     graph = DataGraphs(ticker)
-    google = GoogleNewsScraper()
+    storage = CsvStorage()
     asset = AssetData(ticker)
 
-    # Get price data. 
-    price_df = asset.get_price_data()
-
-    # Get the articles and their sentiment scores. 
-    articles_df = google.get_articles_sentiment(search_term=ticker)
+    # Get price data. Only the plotted range and columns are loaded. 
+    price_df = asset.get_price_data(start=start, end=end, columns=["Date", "Open", "High", "Low", "Close", "Volume"])
+
+    # Get the articles and their sentiment scores. Only the columns the merge and the chart use are loaded. 
+    sentiment_columns = ["publishDate", "bodyNeg", "bodyNeu", "bodyPos", "bodyComp"]
+    try:
+        try:
+            articles_df = storage.read("sentiment", ticker, columns=sentiment_columns + ["publishTime"], start=start, end=end)
+        except (ValueError, KeyError):
+            # Sentiment files written before "publishTime" was stored only have the date. 
+            articles_df = storage.read("sentiment", ticker, columns=sentiment_columns, start=start, end=end)
+    except FileNotFoundError:
+        print(f"[Plot] No sentiment is stored for {ticker}. Run \"update_googlenews_dataset\" first.")
+        return
 
     # Create a merged dataframe that contains price points on days where a news article was published. 
-    merged_df = google.sentiment_model.merge_price_sentiment(articles_df, price_df)
+    merged_df = merge_sentiment_asof(articles_df, price_df)
 
     
-    graph.plot_sentiment(df=merged_df)
+    graph.plot_sentiment(df=merged_df, price_df=price_df)
 
 
 
@@ -79,8 +127,9 @@ def plot_sentiment(ticker: str):
 
 '''-----------------------------------'''
 def text_comparison(text1, text2):
+    from Models.registry import get_sentiment_model
 
-    sentiment = SentimentModel()
+    sentiment = get_sentiment_model()
 
     text1_score = sentiment.analyze_text(text1, neutral_weight=4)
     text2_score = sentiment.analyze_text(text2, neutral_weight=4)
@@ -0,0 +1,80 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from AssetData.asset_data import update_price_data_many
+from AssetData.price_providers import FixturePriceProvider
+from Benchmarks.fixtures import MemoryStorage
+
+
+def make_bars(dates: list, closes: list) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Date": pd.to_datetime(dates),
+        "Open": closes,
+        "High": closes,
+        "Low": closes,
+        "Close": closes,
+        "Volume": [100] * len(dates)
+    })
+
+
+@pytest.fixture
+def folder_path(tmp_path) -> str:
+    return str(tmp_path)
+
+
+def test_partial_last_bar_is_replaced(folder_path):
+    storage = MemoryStorage()
+    # The last bar was stored during the session of 2024-01-03.
+    storage.write("prices", "AAA", make_bars(["2024-01-02", "2024-01-03"], [1.0, 1.5]))
+    make_bars(["2024-01-02", "2024-01-03", "2024-01-04"], [1.0, 2.0, 3.0]).to_csv(f"{folder_path}/AAA.csv", index=False)
+
+    provider = FixturePriceProvider(folder_path)
+    added = update_price_data_many(["AAA"], storage=storage, provider=provider)
+
+    assert provider.calls == [(["AAA"], pd.Timestamp("2024-01-03"))]
+    assert list(added["AAA"]["Close"]) == [2.0, 3.0]
+    stored_df = storage.read("prices", "AAA")
+    assert list(stored_df["Close"]) == [1.0, 2.0, 3.0]
+
+
+def test_unchanged_last_bar_only_appends(folder_path):
+    storage = MemoryStorage()
+    storage.write("prices", "AAA", make_bars(["2024-01-02", "2024-01-03"], [1.0, 2.0]))
+    make_bars(["2024-01-03", "2024-01-04"], [2.0, 3.0]).to_csv(f"{folder_path}/AAA.csv", index=False)
+
+    added = update_price_data_many(["AAA"], storage=storage, provider=FixturePriceProvider(folder_path))
+
+    assert list(added["AAA"]["Close"]) == [3.0]
+    assert list(storage.read("prices", "AAA")["Close"]) == [1.0, 2.0, 3.0]
+
+
+def test_empty_download_is_not_written(folder_path):
+    storage = MemoryStorage()
+    # No fixture for "NEW", and "OLD" has nothing past its stored bars.
+    storage.write("prices", "OLD", make_bars(["2024-01-02"], [1.0]))
+    make_bars(["2023-12-29"], [0.5]).to_csv(f"{folder_path}/OLD.csv", index=False)
+    pd.DataFrame(columns=["Date", "Open", "High", "Low", "Close", "Volume"]).to_csv(f"{folder_path}/NEW.csv", index=False)
+
+    added = update_price_data_many(["NEW", "OLD"], storage=storage, provider=FixturePriceProvider(folder_path))
+
+    assert added == {}
+    assert not storage.exists("prices", "NEW")
+    assert list(storage.read("prices", "OLD")["Close"]) == [1.0]
+
+
+def test_top_up_is_grouped_by_last_date(folder_path):
+    storage = MemoryStorage()
+    storage.write("prices", "AAA", make_bars(["2024-01-02", "2024-01-03"], [1.0, 2.0]))
+    storage.write("prices", "BBB", make_bars(["2024-01-02", "2024-01-03"], [1.0, 2.0]))
+    # "OLD" has not been refreshed for a while, which must not widen the download of the others.
+    storage.write("prices", "OLD", make_bars(["2023-06-01"], [1.0]))
+    for ticker in ["AAA", "BBB"]:
+        make_bars(["2024-01-03", "2024-01-04"], [2.0, 3.0]).to_csv(f"{folder_path}/{ticker}.csv", index=False)
+    make_bars(["2023-06-01", "2023-06-02"], [1.0, 2.0]).to_csv(f"{folder_path}/OLD.csv", index=False)
+
+    provider = FixturePriceProvider(folder_path)
+    added = update_price_data_many(["AAA", "BBB", "OLD"], storage=storage, provider=provider)
+
+    assert provider.calls == [(["OLD"], pd.Timestamp("2023-06-01")), (["AAA", "BBB"], pd.Timestamp("2024-01-03"))]
+    assert {ticker: list(df["Close"]) for ticker, df in added.items()} == {"OLD": [2.0], "AAA": [3.0], "BBB": [3.0]}
@@ -0,0 +1,59 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from Models.chunking import aggregate_chunk_scores, bucket_batches, chunk_token_ids
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_token_ids([1, 2, 3], window=3) == [[1, 2, 3]]
+    # Empty texts still get a chunk, so they still receive a score.
+    assert chunk_token_ids([], window=3) == [[]]
+
+
+def test_chunks_share_the_overlap():
+    chunks = chunk_token_ids(list(range(10)), window=4, overlap=1)
+    assert chunks == [[0, 1, 2, 3], [3, 4, 5, 6], [6, 7, 8, 9]]
+
+
+def test_last_chunk_is_not_only_overlap():
+    chunks = chunk_token_ids(list(range(8)), window=4, overlap=2)
+    assert chunks == [[0, 1, 2, 3], [2, 3, 4, 5], [4, 5, 6, 7]]
+    # Every token is covered, and no chunk is longer than the window.
+    assert sorted(set(token for chunk in chunks for token in chunk)) == list(range(8))
+    assert max(len(chunk) for chunk in chunks) <= 4
+
+
+@pytest.mark.parametrize("window, overlap", [(4, 4), (4, 5), (4, -1), (0, 0)])
+def test_invalid_window_or_overlap(window, overlap):
+    with pytest.raises(ValueError):
+        chunk_token_ids(list(range(10)), window=window, overlap=overlap)
+
+
+def test_batches_stay_under_the_token_budget():
+    lengths = [5, 100, 7, 90, 6, 95, 8]
+    batches = bucket_batches(lengths, max_batch_tokens=200, max_batch_size=3)
+
+    assert sorted(index for batch in batches for index in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= 3
+        assert len(batch) * max(lengths[index] for index in batch) <= 200
+    # The short chunks are batched together, away from the long ones.
+    assert sorted(batches[0]) == [0, 2, 4]
+
+
+def test_weighted_mean_by_chunk_length():
+    probabilities = np.array([[1.0, 0.0, 0.0], [0.0, 0.0, 1.0], [0.0, 1.0, 0.0]])
+    scores = aggregate_chunk_scores(owners=[0, 0, 1], lengths=[3, 1, 10], probabilities=probabilities, text_count=3)
+
+    assert np.allclose(scores[0], [0.75, 0.0, 0.25])
+    assert np.allclose(scores[1], [0.0, 1.0, 0.0])
+    # A text without chunks scores 0.
+    assert np.allclose(scores[2], 0)
+
+
+def test_max_negative_picks_the_most_negative_chunk():
+    probabilities = np.array([[0.2, 0.7, 0.1], [0.6, 0.3, 0.1], [0.1, 0.1, 0.8]])
+    scores = aggregate_chunk_scores(owners=[0, 0, 0], lengths=[1, 1, 1], probabilities=probabilities, text_count=1,
+                                    method="max_negative")
+    assert np.allclose(scores[0], [0.6, 0.3, 0.1])
@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+from Scrapers.dedup import dedupe_entries
+
+
+def make_entry(link: str, title: str, published: str) -> dict:
+    return {"link": link, "title": title, "published": published}
+
+
+def test_same_title_on_nearby_days_is_a_repeat():
+    entries = [make_entry("https://a.com/story", "XYZ stock rises - Outlet A", "Tue, 02 Jan 2024 14:00:00 GMT"),
+               make_entry("https://b.com/story", "XYZ stock rises - Outlet B", "Wed, 03 Jan 2024 09:00:00 GMT")]
+    unique_entries, duplicates = dedupe_entries(entries)
+    assert len(unique_entries) == 1
+    assert duplicates == {1: 0}
+
+
+def test_templated_title_months_apart_is_kept():
+    entries = [make_entry("https://a.com/jan", "XYZ stock rises - Outlet A", "Tue, 02 Jan 2024 14:00:00 GMT"),
+               make_entry("https://a.com/apr", "XYZ stock rises - Outlet A", "Wed, 03 Apr 2024 14:00:00 GMT")]
+    unique_entries, duplicates = dedupe_entries(entries)
+    assert len(unique_entries) == 2
+    assert duplicates == {}
+
+
+def test_same_canonical_url_is_a_repeat_whatever_the_date():
+    entries = [make_entry("https://www.a.com/story/?utm_source=x", "First title", "Tue, 02 Jan 2024 14:00:00 GMT"),
+               make_entry("https://a.com/story", "Second title", "Wed, 03 Apr 2024 14:00:00 GMT")]
+    assert dedupe_entries(entries)[1] == {1: 0}
@@ -0,0 +1,32 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("requests")
+pytest.importorskip("newspaper")
+
+from Scrapers.fetcher import ArticleFetcher
+from Benchmarks.fixtures import ArticleServer, make_articles_df, make_entries
+
+
+@pytest.fixture
+def articles_df() -> pd.DataFrame:
+    return make_articles_df(6, mean_words=120, length_sigma=0, seed=3)
+
+
+@pytest.mark.parametrize("parse_workers", [0, 2])
+def test_fetch_articles_keeps_the_entry_order(articles_df, parse_workers):
+    # Article 1 is slow enough to time out, and the last entry points to a page that does not exist.
+    with ArticleServer(articles_df, delays={0: 0.3, 1: 3}) as server:
+        entries = make_entries(articles_df, base_url=server.base_url)
+        entries.append(dict(entries[-1], link=f"{server.base_url}/missing"))
+        fetcher = ArticleFetcher(max_workers=4, timeout=1, retries=0, parse_workers=parse_workers)
+        try:
+            articles = fetcher.fetch_articles(entries)
+        finally:
+            fetcher.close()
+
+    expected = [entry["link"] for position, entry in enumerate(entries) if position not in (1, len(entries) - 1)]
+    assert [article["url"] for article in articles] == expected
+    # The body is extracted from the page, without the markup.
+    assert articles_df["body"].iloc[0][:100] in articles[0]["body"]
+    assert "<p>" not in articles[0]["body"]
@@ -0,0 +1,67 @@
+import pytest
+
+from Scrapers.http_cache import CachedResponse, HttpCache
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, content: bytes = b"", headers: dict = None):
+        self.status_code = status_code
+        self.content = content
+        self.encoding = "utf-8"
+        self.headers = headers or {}
+
+
+class FakeSession:
+    def __init__(self, responses: list):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url: str, headers: dict = None, timeout: float = None):
+        self.requests.append((url, dict(headers or {})))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    return str(tmp_path / "http_cache.sqlite")
+
+
+def test_stale_response_is_revalidated(db_path):
+    cache = HttpCache(db_path=db_path, ttl=0, offline=False)
+    session = FakeSession([FakeResponse(200, b"<html>page</html>", {"ETag": '"v1"'}), FakeResponse(304)])
+
+    first = cache.fetch(session, "https://example.com/a?utm_source=feed")
+    second = cache.fetch(session, "https://example.com/a")
+
+    assert not first.from_cache
+    # The tracking parameter does not change the key, and the 304 is answered with the stored body.
+    assert second.from_cache and second.text == "<html>page</html>"
+    assert session.requests[1][1] == {"If-None-Match": '"v1"'}
+
+
+def test_fresh_response_is_served_without_a_request(db_path):
+    cache = HttpCache(db_path=db_path, ttl=3600, offline=False)
+    session = FakeSession([FakeResponse(200, b"page")])
+    cache.fetch(session, "https://example.com/a")
+    assert cache.fetch(session, "https://example.com/a").content == b"page"
+    assert len(session.requests) == 1
+
+
+def test_error_responses_are_not_stored(db_path):
+    cache = HttpCache(db_path=db_path, offline=False)
+    response = cache.fetch(FakeSession([FakeResponse(503)]), "https://example.com/a")
+    assert isinstance(response, CachedResponse) and response.status_code == 503
+    assert len(cache) == 0
+
+
+def test_offline_cache_replays_and_never_requests(db_path):
+    online = HttpCache(db_path=db_path, ttl=0, offline=False)
+    online.fetch(FakeSession([FakeResponse(200, b"page")]), "https://example.com/a")
+    online.close()
+
+    offline = HttpCache(db_path=db_path, ttl=0, offline=True)
+    session = FakeSession([])
+    # However old the stored response, it is replayed. Urls that are not cached fail without a request.
+    assert offline.fetch(session, "https://example.com/a").content == b"page"
+    assert offline.fetch(session, "https://example.com/b") is None
+    assert session.requests == []
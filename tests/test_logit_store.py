@@ -0,0 +1,74 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from Models.logit_store import LogitStore
+
+
+def make_chunks(logits: list, owners: list) -> dict:
+    return {
+        "owners": np.array(owners, dtype=np.int64),
+        "offsets": np.zeros(len(owners), dtype=np.int64),
+        "lengths": np.full(len(owners), 10, dtype=np.int64),
+        "logits": np.array(logits, dtype=np.float32)
+    }
+
+
+@pytest.fixture
+def folder_path(tmp_path) -> str:
+    return str(tmp_path / "logits")
+
+
+@pytest.fixture
+def store(folder_path) -> LogitStore:
+    return LogitStore(folder_path=folder_path)
+
+
+def test_shared_text_is_stored_under_every_id(store):
+    # One scored text, shared by two urls.
+    chunks = make_chunks([[0.0, 0.0, 5.0]], owners=[0])
+    store.append([("https://a.com/1", "body"), ("https://b.com/1", "body")], chunks, text_positions=[0, 0])
+
+    assert not store.missing([("https://a.com/1", "body"), ("https://b.com/1", "body")]).any()
+    assert store.missing([("https://a.com/1", "title")]).all()
+    assert len(store.aggregate()) == 2
+
+
+def test_interrupted_append_is_cut_off(store, folder_path):
+    store.append([("https://a.com/1", "body")], make_chunks([[0.0, 0.0, 5.0]], owners=[0]))
+    # A crash after the logits were written, but before their index rows were.
+    with open(store.logits_path, "ab") as file:
+        file.write(np.zeros((2, 3), dtype=np.float16).tobytes())
+
+    reopened = LogitStore(folder_path=folder_path)
+    reopened.append([("https://b.com/1", "body")], make_chunks([[5.0, 0.0, 0.0]], owners=[0]))
+
+    scores_df = reopened.aggregate()
+    assert len(scores_df) == 2
+    # The second text kept its own (negative) logits rather than the leftover rows.
+    assert scores_df["neg"].max() > 0.9
+
+
+def test_rescore_uses_the_cluster_representative(store):
+    store.append([("https://a.com/1", "title"), ("https://a.com/1", "body")],
+                 make_chunks([[5.0, 0.0, 0.0], [5.0, 0.0, 0.0]], owners=[0, 1]))
+    sentiment_df = pd.DataFrame({
+        "url": ["https://a.com/1", "https://b.com/copy"],
+        "clusterId": ["c1", "c1"],
+        "titleNeg": [0.0, 0.0], "titleNeu": [1.0, 1.0], "titlePos": [0.0, 0.0], "titleComp": [0.0, 0.0],
+        "bodyNeg": [0.0, 0.0], "bodyNeu": [1.0, 1.0], "bodyPos": [0.0, 0.0], "bodyComp": [0.0, 0.0]
+    })
+
+    rescored_df = store.rescore_articles(sentiment_df, strict=True)
+    assert (rescored_df["bodyNeg"] > 0.9).all()
+
+
+def test_rescore_reports_missing_logits(store):
+    sentiment_df = pd.DataFrame({
+        "url": ["https://a.com/1"],
+        "titleNeg": [0.0], "titleNeu": [1.0], "titlePos": [0.0], "titleComp": [0.0],
+        "bodyNeg": [np.nan], "bodyNeu": [np.nan], "bodyPos": [np.nan], "bodyComp": [np.nan]
+    })
+    with pytest.raises(KeyError):
+        store.rescore_articles(sentiment_df, strict=True)
@@ -0,0 +1,44 @@
+import datetime as dt
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from Scrapers.scoring import score_article_rows
+from Analysis.merge import merge_sentiment_asof
+
+
+class FixedModel:
+    def analyze_batch(self, texts: list, logit_ids: list = None) -> list:
+        return [{"neg": 0.1, "neu": 0.2, "pos": 0.7, "compound": 0.6} for _ in texts]
+
+
+def make_price_df() -> pd.DataFrame:
+    return pd.DataFrame({
+        "Date": pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-04"]),
+        "Open": [1.0, 2.0, 3.0],
+        "High": [1.0, 2.0, 3.0],
+        "Low": [1.0, 2.0, 3.0],
+        "Close": [1.0, 2.0, 3.0],
+        "Volume": [10, 20, 30]
+    })
+
+
+def test_after_close_article_moves_to_next_session():
+    # 22:00 UTC on 2024-01-02 is 17:00 in New York, after the close.
+    articles_df = pd.DataFrame({
+        "title": ["Late news", "Early news"],
+        "publishDate": [dt.date(2024, 1, 2), dt.date(2024, 1, 2)],
+        "publishTime": [dt.time(22, 0), dt.time(14, 0)],
+        "body": ["late body", "early body"],
+        "summary": ["", ""],
+        "url": ["https://example.com/late", "https://example.com/early"]
+    })
+
+    sentiment_df = score_article_rows(FixedModel(), articles_df)
+    assert "publishTime" in sentiment_df.columns
+
+    merged_df = merge_sentiment_asof(sentiment_df, make_price_df(), aggregate=False)
+    sessions = dict(zip(merged_df["url"], merged_df["Date"]))
+    assert sessions["https://example.com/late"] == pd.Timestamp("2024-01-03")
+    assert sessions["https://example.com/early"] == pd.Timestamp("2024-01-02")
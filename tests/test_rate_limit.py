@@ -0,0 +1,29 @@
+import time
+import email.utils
+import datetime as dt
+
+from Scrapers.rate_limit import parse_rate_limit_reset, parse_retry_after
+
+
+def test_seconds_form():
+    assert parse_retry_after("30", default=1) == 30
+
+
+def test_http_date_form():
+    retry_at = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=120)
+    seconds = parse_retry_after(email.utils.format_datetime(retry_at, usegmt=True), default=1)
+    assert 100 < seconds <= 120
+
+
+def test_missing_or_unreadable_header_uses_default():
+    assert parse_retry_after(None, default=4) == 4
+    assert parse_retry_after("soon", default=4) == 4
+    # A date in the past means the window has already reset.
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", default=4) == 0
+
+
+def test_rate_limit_reset_is_an_epoch():
+    assert 50 < parse_rate_limit_reset(str(int(time.time()) + 60), default=1) <= 60
+    assert parse_rate_limit_reset(str(int(time.time()) - 60), default=1) == 0
+    assert parse_rate_limit_reset(None, default=4) == 4
+    assert parse_rate_limit_reset("soon", default=4) == 4
@@ -0,0 +1,51 @@
+import email.utils
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("requests")
+
+from Scrapers.reddit import RedditScraper
+from Benchmarks.fixtures import MemoryStorage, RedditServer, make_reddit_threads
+
+
+class FixedModel:
+    def analyze_batch(self, texts: list, logit_ids: list = None) -> list:
+        return [{"neg": 0.1, "neu": 0.2, "pos": 0.7, "compound": 0.6} for _ in texts]
+
+
+def make_scraper(server: RedditServer, storage=None) -> RedditScraper:
+    return RedditScraper(base_url=server.base_url, requests_per_minute=60000, storage=storage if storage is not None else MemoryStorage(),
+                         sentiment_model=FixedModel(), timeout=5)
+
+
+def test_iter_items_walks_every_comment():
+    threads = make_reddit_threads(3, comments_per_post=60, seed=1)
+    # Only 5 top level comments per post are inlined, the rest are behind "more" stubs.
+    with RedditServer(threads, top_level_limit=5) as server:
+        rows = list(make_scraper(server).iter_items("Cryptocurrency", limit=3, include_comments=True))
+
+    assert sum(row["kind"] == "post" for row in rows) == 3
+    assert sum(row["kind"] == "comment" for row in rows) == 3 * 60
+    assert len({row["url"] for row in rows}) == len(rows)
+
+
+def test_second_update_stores_nothing():
+    storage = MemoryStorage()
+    with RedditServer(make_reddit_threads(2, comments_per_post=10)) as server:
+        scraper = make_scraper(server, storage=storage)
+        assert scraper.update_subreddit("Cryptocurrency", limit=2) == 2 * 11
+        assert scraper.update_subreddit("Cryptocurrency", limit=2) == 0
+
+    assert len(storage.read("reddit", "Cryptocurrency")) == 22
+    assert len(storage.read("reddit_sentiment", "Cryptocurrency")) == 22
+
+
+def test_rate_limited_requests_are_retried():
+    # An HTTP date that has already passed, so the retry does not wait.
+    retry_after = email.utils.formatdate(0, usegmt=True)
+    with RedditServer(make_reddit_threads(1, comments_per_post=5), rate_limited=2, retry_after=retry_after) as server:
+        stored = make_scraper(server).update_subreddit("Cryptocurrency", limit=1)
+        assert server.rate_limited_responses == 2
+
+    assert stored == 6
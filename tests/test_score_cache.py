@@ -0,0 +1,50 @@
+import pytest
+
+from Models.score_cache import ScoreCache
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    return str(tmp_path / "scores.sqlite")
+
+
+def test_scores_survive_a_reopen(db_path):
+    cache = ScoreCache(db_path=db_path)
+    key = ScoreCache.make_key("model", "Shares  rallied\nafter earnings")
+    cache.put_many({key: (0.1, 0.2, 0.7)})
+    cache.close()
+
+    reopened = ScoreCache(db_path=db_path)
+    # Whitespace does not change the key.
+    assert ScoreCache.make_key("model", "Shares rallied after earnings") == key
+    assert reopened.get_many([key, "missing"]) == {key: (0.1, 0.2, 0.7)}
+    assert ScoreCache.make_key("other model", "Shares rallied after earnings") != key
+
+
+def test_least_recently_used_scores_are_evicted(db_path):
+    cache = ScoreCache(db_path=db_path, memory_size=0, max_entries=10)
+    keys = [ScoreCache.make_key("model", f"text {index}") for index in range(10)]
+    cache.put_many({key: (0.0, 1.0, 0.0) for key in keys})
+    # Read the first key, so it is no longer the least recently used.
+    assert keys[0] in cache.get_many([keys[0]])
+
+    cache.put_many({ScoreCache.make_key("model", "text 10"): (0.0, 1.0, 0.0)})
+
+    assert len(cache) <= 10
+    assert keys[0] in cache.get_many([keys[0]])
+
+
+def test_memory_hits_keep_scores_from_eviction(db_path, monkeypatch):
+    clock = iter(range(1000))
+    monkeypatch.setattr("Models.score_cache.time.time", lambda: next(clock))
+    cache = ScoreCache(db_path=db_path, memory_size=100, max_entries=10)
+    keys = [ScoreCache.make_key("model", f"text {index}") for index in range(10)]
+    cache.put_many({key: (0.0, 1.0, 0.0) for key in keys})
+    # Served from memory, which must still count as a use on disk.
+    assert keys[0] in cache.get_many([keys[0]])
+
+    cache.put_many({ScoreCache.make_key("model", "text 10"): (0.0, 1.0, 0.0)})
+    cache.memory.clear()
+
+    assert len(cache) == 9
+    assert keys[0] in cache.get_many([keys[0]])
@@ -0,0 +1,42 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+requests = pytest.importorskip("requests")
+
+from Models.scoring_server import RemoteSentimentModel, ScoringServer
+
+
+class FixedModel:
+    model_name = "fixed"
+
+    def analyze_batch(self, texts: list, neutral_weight: int = 3, logit_ids: list = None) -> list:
+        if "fail" in texts:
+            raise ValueError("the model could not score the batch")
+        return [{"neg": 0.1, "neu": 0.2, "pos": 0.7, "compound": 0.6} for _ in texts]
+
+
+@pytest.fixture
+def server():
+    server = ScoringServer(FixedModel(), port=0, max_wait=0.001)
+    server.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_remote_scores_match_the_local_format(server):
+    model = RemoteSentimentModel(server_url=server)
+    scores = model.score_texts(["good", "bad"])
+    assert scores.dtype == np.float64
+    assert np.allclose(scores, [[0.1, 0.2, 0.7], [0.1, 0.2, 0.7]])
+
+    with pytest.raises(ValueError):
+        model.score_texts(["good"], return_chunks=True)
+    with pytest.raises(TypeError):
+        model.score_chunks(["good"])
+
+
+def test_bad_payload_is_400_and_model_errors_are_500(server):
+    assert requests.post(f"{server}/score", json={"text": ["good"]}).status_code == 400
+    assert requests.post(f"{server}/score", json={"texts": "good"}).status_code == 400
+    assert requests.post(f"{server}/score", json={"texts": ["fail"]}).status_code == 500
@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import Storage.datasets as datasets
+from Storage.datasets import CsvStorage, ParquetStorage
+
+
+def make_prices(dates: list, closes: list) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Date": pd.to_datetime(dates),
+        "Open": closes,
+        "High": closes,
+        "Low": closes,
+        "Close": closes,
+        "Volume": [100] * len(dates)
+    })
+
+
+@pytest.fixture(params=["csv", "parquet"])
+def storage(request, tmp_path, monkeypatch):
+    if request.param == "csv":
+        # The CSV paths are built from the module's folders.
+        monkeypatch.setattr(datasets, "price_folder", str(tmp_path))
+        monkeypatch.setattr(datasets, "google_news_folder", str(tmp_path))
+        return CsvStorage()
+    pytest.importorskip("pyarrow")
+    return ParquetStorage(root_folder=str(tmp_path))
+
+
+def test_write_append_read(storage):
+    assert not storage.exists("prices", "AAA")
+    storage.write("prices", "AAA", make_prices(["2023-12-29", "2024-01-02"], [1.0, 2.0]))
+    storage.append("prices", "AAA", make_prices(["2024-01-03"], [3.0]))
+
+    assert storage.exists("prices", "AAA")
+    prices_df = storage.read("prices", "AAA")
+    assert list(prices_df["Close"]) == [1.0, 2.0, 3.0]
+    assert list(pd.to_datetime(prices_df["Date"]).dt.year) == [2023, 2024, 2024]
+
+
+def test_write_replaces_the_stored_rows(storage):
+    storage.write("prices", "AAA", make_prices(["2023-12-29", "2024-01-02"], [1.0, 2.0]))
+    storage.write("prices", "AAA", make_prices(["2024-01-03"], [3.0]))
+    assert list(storage.read("prices", "AAA")["Close"]) == [3.0]
+
+
+def test_missing_dataset_raises(storage):
+    with pytest.raises(FileNotFoundError):
+        storage.read("prices", "AAA")
+
+
+def test_parquet_reads_columns_added_by_later_files(tmp_path):
+    pytest.importorskip("pyarrow")
+    storage = ParquetStorage(root_folder=str(tmp_path))
+    rows_df = pd.DataFrame({"title": ["a"], "publishDate": pd.to_datetime(["2024-01-02"]), "url": ["https://a.com/1"]})
+    storage.write("headlines", "AAA", rows_df)
+    storage.append("headlines", "AAA", rows_df.assign(url="https://a.com/2", clusterId="c1"))
+
+    headlines_df = storage.read("headlines", "AAA")
+    clusters = dict(zip(headlines_df["url"], headlines_df["clusterId"].fillna("")))
+    assert clusters == {"https://a.com/1": "", "https://a.com/2": "c1"}
+
+
+def test_parquet_write_leaves_no_temporary_folders(tmp_path):
+    pytest.importorskip("pyarrow")
+    storage = ParquetStorage(root_folder=str(tmp_path))
+    storage.write("prices", "AAA", make_prices(["2024-01-02"], [1.0]))
+    storage.write("prices", "AAA", make_prices(["2024-01-03"], [2.0]))
+    assert os.listdir(storage.get_path("prices")) == ["ticker=AAA"]
+
+
+def test_range_and_column_reads(storage):
+    storage.write("prices", "AAA", make_prices(["2023-12-28", "2023-12-29", "2024-01-02", "2024-01-03"], [1.0, 2.0, 3.0, 4.0]))
+    storage.append("prices", "AAA", make_prices(["2024-01-04"], [5.0]))
+
+    prices_df = storage.read("prices", "AAA", columns=["Close"], start="2023-12-29", end="2024-01-03")
+    assert list(prices_df.columns) == ["Close"]
+    assert list(prices_df["Close"]) == [2.0, 3.0, 4.0]
+    # The appended rows are found by a range read as well.
+    assert list(storage.read("prices", "AAA", start="2024-01-04")["Close"]) == [5.0]
+
+
+def test_csv_range_reads_go_through_the_date_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, "google_news_folder", str(tmp_path))
+    storage = CsvStorage()
+    # Bodies with quoted line breaks span several lines of the file.
+    headlines_df = pd.DataFrame({
+        "title": ["a", "b", "c"],
+        "publishDate": ["2024-01-02", "2024-01-03", "2024-01-04"],
+        "body": ["first\nbody", "second, \"quoted\"\nbody", "third"],
+        "url": ["https://a.com/1", "https://a.com/2", "https://a.com/3"]
+    })
+    storage.write("headlines", "AAA", headlines_df)
+    index_path = f"{storage.get_path('headlines', 'AAA')}.dateidx.npz"
+
+    rows_df = storage.read("headlines", "AAA", columns=["body", "url"], start="2024-01-03", end="2024-01-03")
+    assert os.path.exists(index_path)
+    assert list(rows_df["body"]) == ["second, \"quoted\"\nbody"]
+
+    # Appending extends the index, rewriting the file drops it.
+    storage.append("headlines", "AAA", headlines_df.iloc[[0]].assign(publishDate="2024-01-05", url="https://a.com/4"))
+    assert list(storage.read("headlines", "AAA", columns=["url"], start="2024-01-05")["url"]) == ["https://a.com/4"]
+    storage.write("headlines", "AAA", headlines_df.iloc[[2]])
+    assert not os.path.exists(index_path)
+    assert list(storage.read("headlines", "AAA", columns=["url"], start="2024-01-01")["url"]) == ["https://a.com/3"]
@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from Pipeline.streaming import SentimentPipeline
+
+
+class FakeFetcher:
+    def __init__(self, count: int):
+        self.count = count
+        self.fetched = 0
+
+    def iter_articles(self, entries: list):
+        for index in range(self.count):
+            self.fetched += 1
+            yield index, {"title": f"title {index}", "body": f"body {index}", "url": f"https://example.com/{index}"}
+
+
+class FailingStorage:
+    def append(self, dataset: str, name: str, df: pd.DataFrame):
+        raise OSError("disk full")
+
+
+class FakeScraper:
+    def __init__(self, count: int):
+        self.fetcher = FakeFetcher(count)
+        self.storage = FailingStorage()
+
+    def get_refresh_state(self, search_term: str) -> dict:
+        return {"lastPublishDate": "", "urls": []}
+
+    def search_entries(self, search_term: str, **kwargs) -> list:
+        return [{"link": f"https://example.com/{index}"} for index in range(self.fetcher.count)]
+
+    def score_articles(self, articles_df: pd.DataFrame) -> pd.DataFrame:
+        return pd.DataFrame({"url": articles_df["url"], "score": 0.0})
+
+
+def test_failed_write_stops_the_other_stages():
+    scraper = FakeScraper(count=500)
+    pipeline = SentimentPipeline(scraper=scraper, batch_size=2, queue_batches=1, flush_interval=0.1, join_timeout=5)
+    threads_before = threading.active_count()
+
+    with pytest.raises(OSError):
+        pipeline.run("AAA")
+
+    assert threading.active_count() == threads_before
+    # The fetch stage stopped early instead of reading every article.
+    assert scraper.fetcher.fetched < 500
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+pytest.importorskip("pandas")
+requests = pytest.importorskip("requests")
+
+from Scrapers.twitter import TwitterScraper
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, payload: dict = None, headers: dict = None):
+        self.status_code = status_code
+        self.payload = payload or {}
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+    def json(self) -> dict:
+        return self.payload
+
+
+class FakeSession:
+    def __init__(self, responses: list):
+        self.responses = list(responses)
+        self.headers = {}
+        self.requests = 0
+
+    def get(self, url: str, params: dict = None, timeout: float = None):
+        self.requests += 1
+        return self.responses.pop(0)
+
+
+tweet = {"id": "1", "text": "Shares rallied", "created_at": "2024-01-02T15:30:00.000Z", "author_id": "7",
+         "public_metrics": {"like_count": 3, "retweet_count": 1}}
+
+
+def test_rate_limited_search_waits_for_the_reset(monkeypatch):
+    reset = str(int(time.time()) + 60)
+    session = FakeSession([FakeResponse(429, headers={"x-rate-limit-reset": reset}),
+                           FakeResponse(200, {"data": [tweet], "meta": {}})])
+    scraper = TwitterScraper(bearer_token="token", session=session, storage=object(), sentiment_model=object())
+    penalties = []
+    monkeypatch.setattr(scraper.budget, "penalize", penalties.append)
+
+    tweets_df = scraper.get_tweets("$AAA", limit=10)
+
+    assert session.requests == 2
+    assert list(tweets_df["tweetId"]) == ["1"]
+    assert len(penalties) == 1 and 50 < penalties[0] <= 60
+
+
+def test_rate_limit_gives_up_after_the_retries(monkeypatch):
+    session = FakeSession([FakeResponse(429) for _ in range(3)])
+    scraper = TwitterScraper(bearer_token="token", retries=2, session=session, storage=object(), sentiment_model=object())
+    monkeypatch.setattr(scraper.budget, "penalize", lambda seconds: None)
+
+    with pytest.raises(requests.HTTPError):
+        scraper.get_tweets("$AAA", limit=10)
+    assert session.requests == 3